@@ -4,6 +4,7 @@ from src.nlp.bert_handler import BertHandler
 from src.models.embeddings import EmbeddingGenerator  # Usiamo la classe aggiornata sopra
 from src.algorithms.content_based import ContentBasedRecommender
 from src.services.web_search import WebSearchService
+from src.services.local_search import LocalSearchService
 from src.services.translation import TranslationService
 from src.ui.layout import render_main_page
 
@@ -12,26 +13,41 @@ st.set_page_config(layout="wide", page_title="Movie AI Pro")
 
 @st.cache_resource
 def init_backend():
-    # 1. Dati (Carica da Cache se esiste)
-    df = DataIngestor().load_all()
-
-    # 2. NLP (Carica da Cache se esiste)
-    texts = (df['title'].astype(str) + ". " + df['overview'].astype(str)).tolist()
+    # 1. Dati (Carica da Cache se esiste): solo le colonne usate, le trame restano su disco
+    ingestor = DataIngestor()
+    df = ingestor.load_all(columns=['title', 'genres', 'type', 'source', 'vote_average'])
+    overviews = ingestor.overviews()
 
+    # 2. NLP (Carica da Cache se esiste): legati ai soli testi, un cambio di generi non li ricalcola
     # Qui usiamo la classe EmbeddingGenerator che abbiamo appena modificato
     # (Sostituisce BertHandler diretto per gestire il caching)
     embedder = EmbeddingGenerator(method='bert')
-    embeddings = embedder.fit_transform(texts)
+    embeddings = embedder.load_cached(ingestor.text_version)
+    if embeddings is None:
+        # Le trame si leggono tutte solo quando bisogna (ri)calcolare gli embedding
+        texts = [f"{t}. {o}" for t, o in zip(df['title'].astype(str), overviews.to_list())]
+        embeddings = embedder.fit_transform(texts, titles=df['title'].tolist(), fingerprint=ingestor.text_version)
 
     # 3. Core
-    recsys = ContentBasedRecommender(df, embeddings)
+    # Grafo k-NN in cache/ (memory-map): la Ricerca singola diventa una lettura di riga
+    # Cache dei risultati legata alla versione di catalogo + embedding
+    # La versione degli embedding evita di rileggere tutta la matrice per l'impronta del grafo
+    recsys = ContentBasedRecommender(df, embeddings, knn_k=50, overviews=overviews, fingerprint=embedder.version)
+    recsys.set_version(f"{ingestor.version}_{embedder.version}")
     web = WebSearchService()
     trans = TranslationService()
+    # Indice dei titoli (prefissi + trigrammi), in cache insieme al catalogo
+    search = LocalSearchService(df, version=ingestor.version)
 
-    return df, recsys, web, trans, embeddings
+    return df, recsys, web, trans, embeddings, search, ingestor.version
 
 
 with st.spinner("Avvio Sistema (Controllo Cache)..."):
-    df, recsys, web, trans, embeddings = init_backend()
+    df, recsys, web, trans, embeddings, search, catalog_version = init_backend()
+
+# Catalogo ricostruito o cancellato (es. CSV custom) da un'altra sessione: il backend in cache è superato
+if DataIngestor().version != catalog_version:
+    st.cache_resource.clear()
+    st.rerun()
 
-render_main_page(df, recsys, web, trans, embeddings)
\ No newline at end of file
+render_main_page(df, recsys, web, trans, embeddings, search)
\ No newline at end of file
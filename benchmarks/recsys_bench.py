@@ -0,0 +1,311 @@
+"""
+Benchmark dei percorsi che l'utente aspetta davvero (niente rete, niente GPU):
+raccomandazioni singole e di profilo, ricerca titoli, unione/deduplica delle partizioni
+e caricamento degli embedding dall'archivio, su cataloghi sintetici da 10k a 5M righe.
+
+Uso:
+    python -m benchmarks.recsys_bench --sizes 10000 100000 1000000 --out bench_results.json
+    python -m benchmarks.recsys_bench --sizes 10000 --compare bench_results.json
+
+Per ogni caso: percentili di latenza (ms), throughput e picco di memoria (tracemalloc).
+Con 5M righe conviene ridurre --dim (5M x 384 float32 = 7.7 GB su disco).
+"""
+import os
+import gc
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+from src.algorithms.content_based import ContentBasedRecommender
+from src.models.recommender import MovieRecommender
+from src.models.embedding_store import EmbeddingStore
+from src.services.local_search import LocalSearchService
+from src.data.ingestion import DataIngestor, COLUMNS
+from src.data.columnar import ColumnarCatalog
+
+GENRES = ['Action', 'Adventure', 'Animation', 'Comedy', 'Crime', 'Documentary', 'Drama', 'Family',
+          'Fantasy', 'History', 'Horror', 'Music', 'Mystery', 'Romance', 'Sci-Fi', 'Thriller', 'War']
+SOURCES = ['IMDb Movie', 'Netflix', 'IMDb TV', 'Amazon', 'Rotten Tomatoes', 'Disney+', 'Hulu', 'WikiArchive']
+WORDS = ['night', 'star', 'love', 'dark', 'city', 'king', 'war', 'dream', 'ghost', 'river', 'blood', 'last',
+         'secret', 'house', 'road', 'fire', 'winter', 'shadow', 'island', 'return', 'legend', 'storm', 'heart',
+         'empire', 'garden', 'machine', 'silent', 'golden', 'wild', 'broken', 'lost', 'hunter']
+
+# Righe per blocco durante la generazione degli embedding (memoria costante anche a 5M)
+BLOCK_ROWS = 65536
+# Input di riscaldamento per caso (non cronometrati)
+WARMUP = 3
+
+
+def synthetic_catalog(n, seed=42):
+    """Catalogo sintetico con le colonne di DataIngestor (titoli unici, generi multipli)"""
+    rng = np.random.default_rng(seed)
+    words = np.array(WORDS, dtype=object)
+    title_words = words[rng.integers(0, len(words), size=(n, 3))]
+    titles = (pd.Series(title_words[:, 0]).str.title() + ' ' + title_words[:, 1] + ' ' + title_words[:, 2]
+              + ' ' + pd.Series(np.arange(n)).astype(str))
+
+    combos = np.array(['|'.join(sorted(set(rng.choice(GENRES, size=rng.integers(1, 4)))))
+                       for _ in range(256)], dtype=object)
+    overview_words = words[rng.integers(0, len(words), size=(n, 12))]
+    overviews = pd.Series(overview_words[:, 0])
+    for j in range(1, overview_words.shape[1]):
+        overviews = overviews + ' ' + overview_words[:, j]
+
+    return pd.DataFrame({
+        'title': titles,
+        'overview': overviews,
+        'genres': combos[rng.integers(0, len(combos), size=n)],
+        'type': np.where(rng.random(n) < 0.7, 'Movie', 'TV Show'),
+        'source': np.array(SOURCES, dtype=object)[rng.integers(0, len(SOURCES), size=n)],
+        'vote_average': rng.uniform(0, 10, size=n).round(1),
+    })
+
+
+def synthetic_embeddings(n, dim, path, seed=42, n_clusters=256):
+    """Embedding normalizzati e raggruppati in cluster, scritti a blocchi in un .npy (memory-map)"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((n_clusters, dim)).astype(np.float32)
+    out = np.lib.format.open_memmap(path, mode='w+', dtype=np.float32, shape=(n, dim))
+    for start in range(0, n, BLOCK_ROWS):
+        stop = min(start + BLOCK_ROWS, n)
+        block = centers[rng.integers(0, n_clusters, size=stop - start)]
+        block += 0.8 * rng.standard_normal(block.shape).astype(np.float32)
+        block /= np.linalg.norm(block, axis=1, keepdims=True)
+        out[start:stop] = block
+    out.flush()
+    del out
+    return np.load(path, mmap_mode='r')
+
+
+def partitions_with_duplicates(df, n_parts=8, dup_fraction=0.1, seed=42):
+    """Il catalogo diviso in partizioni (una per sorgente) con una quota di titoli ripetuti"""
+    rng = np.random.default_rng(seed)
+    shuffled = df.sample(frac=1.0, random_state=seed)
+    bounds = np.linspace(0, len(df), n_parts + 1).astype(int)
+    parts = [shuffled.iloc[a:b] for a, b in zip(bounds[:-1], bounds[1:])]
+    dups = df.iloc[rng.choice(len(df), size=int(len(df) * dup_fraction), replace=False)]
+    return parts + [dups]
+
+
+def summarize(latencies, total, peak_bytes):
+    lat_ms = np.asarray(latencies) * 1000
+    return {
+        'count': len(lat_ms),
+        'mean_ms': float(lat_ms.mean()),
+        'p50_ms': float(np.percentile(lat_ms, 50)),
+        'p90_ms': float(np.percentile(lat_ms, 90)),
+        'p99_ms': float(np.percentile(lat_ms, 99)),
+        'max_ms': float(lat_ms.max()),
+        'throughput_per_s': len(lat_ms) / total if total > 0 else float('inf'),
+        'peak_mb': peak_bytes / 1024 ** 2,
+    }
+
+
+def measure(fn, inputs, warmup=WARMUP, memory_samples=20, reset=None):
+    """
+    I primi `warmup` input servono solo a scaldare (non vengono cronometrati), poi la latenza
+    di fn(x) su ogni input restante e il picco di memoria su alcuni di essi con tracemalloc
+    (in un passaggio separato: il tracciamento rallenta le allocazioni e falserebbe i tempi).
+    reset(): svuota le cache interne prima di ogni passaggio, così nessun input è già calcolato.
+    """
+    warm, timed = inputs[:warmup], inputs[warmup:]
+    for x in warm:
+        fn(x)
+
+    if reset is not None: reset()
+    gc.collect()
+    latencies = np.empty(len(timed))
+    start = time.perf_counter()
+    for i, x in enumerate(timed):
+        t = time.perf_counter()
+        fn(x)
+        latencies[i] = time.perf_counter() - t
+    total = time.perf_counter() - start
+
+    if reset is not None: reset()
+    tracemalloc.start()
+    for x in timed[:memory_samples]:
+        fn(x)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return summarize(latencies, total, peak)
+
+
+def measure_once(fn, repeat=3):
+    """Operazioni pesanti (costruzione, unione, caricamento): poche ripetizioni, memoria sulla prima"""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    latencies = [time.perf_counter() - start]
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    for _ in range(repeat - 1):
+        del result
+        gc.collect()
+        start = time.perf_counter()
+        result = fn()
+        latencies.append(time.perf_counter() - start)
+    return summarize(latencies, sum(latencies), peak), result
+
+
+def search_queries(titles, n, rng):
+    """Mix di query da autocompletamento: prefissi, parole interne e refusi"""
+    queries = []
+    for t in rng.choice(titles, size=n):
+        words = t.split()
+        kind = rng.integers(0, 3)
+        if kind == 0:
+            queries.append(t[:rng.integers(3, 8)])
+        elif kind == 1:
+            queries.append(words[rng.integers(1, len(words) - 1)])
+        else:
+            pos = rng.integers(1, len(words[0]))
+            queries.append(words[0][:pos] + words[0][pos + 1:] + ' ' + words[1])
+    return queries
+
+
+def run_size(n, args, workdir):
+    rng = np.random.default_rng(args.seed)
+    results = {}
+
+    def record(case, stats):
+        results[case] = stats
+        print(f"   {case:<28} p50 {stats['p50_ms']:9.2f} ms  p99 {stats['p99_ms']:9.2f} ms  "
+              f"{stats['throughput_per_s']:9.1f}/s  picco {stats['peak_mb']:8.1f} MB")
+
+    print(f"🧪 CATALOGO SINTETICO: {n} righe, {args.dim} dimensioni")
+    df = synthetic_catalog(n, seed=args.seed)
+    embeddings = synthetic_embeddings(n, args.dim, os.path.join(workdir, "embeddings.npy"), seed=args.seed)
+    cache_dir = os.path.join(workdir, "cache")
+
+    # --- Ingestione: unione + deduplica delle partizioni, scrittura e lettura del catalogo colonnare ---
+    frames = partitions_with_duplicates(df[COLUMNS], seed=args.seed)
+    stats, merged = measure_once(lambda: DataIngestor.merge(frames), repeat=args.repeat)
+    record('ingestion_merge_dedupe', stats)
+    catalog = ColumnarCatalog(os.path.join(workdir, "catalog"))
+    stats, _ = measure_once(lambda: catalog.write(merged), repeat=args.repeat)
+    record('catalog_write', stats)
+    stats, _ = measure_once(lambda: catalog.read(['title', 'genres', 'type', 'source', 'vote_average']),
+                            repeat=args.repeat)
+    record('catalog_read', stats)
+    del frames, merged
+
+    # --- Archivio embedding: apertura in memory-map e prima scansione completa ---
+    store = EmbeddingStore(cache_dir, method='bench', model_name=f"synthetic-{args.dim}")
+    store.save(embeddings, f"n{n}")
+    stats, _ = measure_once(lambda: store.load(f"n{n}"), repeat=args.repeat)
+    record('embedding_cache_load', stats)
+
+    def scan():
+        data = store.load(f"n{n}")
+        return sum(float(data[s:s + BLOCK_ROWS, 0].sum()) for s in range(0, len(data), BLOCK_ROWS))
+    stats, _ = measure_once(scan, repeat=args.repeat)
+    record('embedding_cache_scan', stats)
+
+    # --- Raccomandazioni (cache dei risultati disattivata: si misura il calcolo) ---
+    data = store.load(f"n{n}")
+    stats, recsys = measure_once(lambda: ContentBasedRecommender(df, data, cache_dir=cache_dir,
+                                                                 result_cache_size=0), repeat=1)
+    record('recommender_build', stats)
+
+    # WARMUP input in più, scartati dalle misure
+    titles = df['title'].to_numpy()
+    singles = list(rng.choice(titles, size=args.queries + WARMUP))
+    record('recommend_single', measure(lambda t: recsys.recommend_single(t, top_n=10), singles))
+
+    profiles = [list(rng.choice(titles, size=rng.integers(3, 11), replace=False))
+                for _ in range(args.queries + WARMUP)]
+    record('recommend_profile', measure(lambda p: recsys.recommend_profile(p, top_n=10), profiles))
+    # 'max' usa i punteggi per titolo in cache nel ProfileScorer: svuotati a ogni passaggio
+    record('recommend_profile_max', measure(lambda p: recsys.recommend_profile(p, top_n=10, aggregation='max'),
+                                            profiles, reset=recsys.profiles.clear))
+    del recsys
+
+    legacy = MovieRecommender(df, data)
+    filter_types = ["All", "Movies Only", "TV Shows Only"]
+    requests = [(p, filter_types[i % len(filter_types)]) for i, p in enumerate(profiles)]
+    record('get_profile_recommendations',
+           measure(lambda r: legacy.get_profile_recommendations(r[0], filter_type=r[1], top_n=10), requests))
+    del legacy
+
+    # --- Ricerca titoli (indice di prefissi + trigrammi) ---
+    stats, search = measure_once(lambda: LocalSearchService(df), repeat=1)
+    record('title_index_build', stats)
+    queries = search_queries(titles, args.queries + WARMUP, rng)
+    record('local_search', measure(search.search, queries))
+    record('local_suggest', measure(search.suggest, queries))
+
+    del data, embeddings
+    return results
+
+
+def compare(current, previous, label):
+    """Variazione della p50 rispetto a un'esecuzione precedente (stesse dimensioni e casi)"""
+    print(f"📊 CONFRONTO CON {label} (p50)")
+    for size, cases in current.items():
+        for case, stats in cases.items():
+            old = previous.get(size, {}).get(case)
+            if old is None or old['p50_ms'] <= 0: continue
+            ratio = stats['p50_ms'] / old['p50_ms']
+            flag = "⚠️" if ratio > 1.2 else "  "
+            print(f"{flag} {size:>9} {case:<28} {old['p50_ms']:9.2f} -> {stats['p50_ms']:9.2f} ms ({ratio:.2f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del sistema di raccomandazione su cataloghi sintetici")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--dim', type=int, default=384)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--out', default="bench_results.json")
+    parser.add_argument('--compare', default=None, help="JSON di un'esecuzione precedente")
+    parser.add_argument('--workdir', default=None, help="Cartella per i file temporanei (default: temp di sistema)")
+    args = parser.parse_args()
+
+    # Letto subito: --compare può indicare lo stesso file che verrà sovrascritto da --out
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)['results']
+
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'dim': args.dim,
+            'queries': args.queries,
+            'seed': args.seed,
+        },
+        'results': {},
+    }
+
+    for n in args.sizes:
+        workdir = tempfile.mkdtemp(prefix=f"recsys_bench_{n}_", dir=args.workdir)
+        try:
+            report['results'][str(n)] = run_size(n, args, workdir)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+        # Salvataggio dopo ogni dimensione: i risultati parziali restano anche se una run lunga si interrompe
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Risultati salvati in {args.out}")
+
+    if previous is not None:
+        compare(report['results'], previous, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,547 @@
+import os
+import glob
+import hashlib
+import numpy as np
+import time
+import scipy.sparse as sp
+from .reduction import fit_pca, random_projection, project
+from .similarity import SimilarityEngine
+
+BLOCK_ROWS = 65536
+
+
+def matrix_fingerprint(matrix):
+    """Impronta (sha1) di forma, dtype e contenuto di una matrice"""
+    h = hashlib.sha1()
+    h.update(str((matrix.shape, str(matrix.dtype))).encode())
+    if sp.issparse(matrix):
+        m = sp.csr_matrix(matrix)
+        for arr in (m.data, m.indices, m.indptr):
+            h.update(np.ascontiguousarray(arr).tobytes())
+        return h.hexdigest()[:16]
+    for start in range(0, matrix.shape[0], BLOCK_ROWS):
+        h.update(np.ascontiguousarray(matrix[start:start + BLOCK_ROWS]).tobytes())
+    return h.hexdigest()[:16]
+
+
+def assign_clusters(matrix, centroids):
+    """Centroide più vicino (prodotto scalare) per ogni riga, calcolato a blocchi"""
+    labels = np.empty(matrix.shape[0], dtype=np.int32)
+    for start in range(0, matrix.shape[0], BLOCK_ROWS):
+        block = np.asarray(matrix[start:start + BLOCK_ROWS], dtype=np.float32)
+        labels[start:start + BLOCK_ROWS] = np.argmax(block @ centroids.T, axis=1)
+    return labels
+
+
+def kmeans(matrix, n_clusters, n_iter=20, sample_size=100000, seed=42, spherical=True):
+    """
+    K-means (sferico di default) addestrato su un campione della matrice.
+    Restituisce i centroidi (n_clusters x dim, float32).
+    """
+    rng = np.random.default_rng(seed)
+    n = matrix.shape[0]
+    sample_idx = rng.choice(n, size=min(n, sample_size), replace=False)
+    data = np.asarray(matrix[np.sort(sample_idx)], dtype=np.float32)
+    n_clusters = min(n_clusters, len(data))
+
+    centroids = data[rng.choice(len(data), size=n_clusters, replace=False)].copy()
+    for _ in range(n_iter):
+        if spherical:
+            labels = np.argmax(data @ centroids.T, axis=1)
+        else:
+            # ||x - c||^2 = ||x||^2 - 2 x.c + ||c||^2 (il primo termine non cambia l'argmin)
+            labels = np.argmin((centroids ** 2).sum(axis=1) - 2 * data @ centroids.T, axis=1)
+
+        # Somme per cluster con una matrice one-hot sparsa (molto più veloce di np.add.at)
+        onehot = sp.csr_matrix((np.ones(len(data), dtype=np.float32), (labels, np.arange(len(data)))),
+                               shape=(n_clusters, len(data)))
+        sums = np.asarray(onehot @ data, dtype=np.float32)
+        counts = np.bincount(labels, minlength=n_clusters)
+
+        empty = counts == 0
+        sums[~empty] /= counts[~empty, None]
+        # Cluster vuoti: ripartono da un punto a caso
+        sums[empty] = data[rng.choice(len(data), size=int(empty.sum()))]
+        centroids = sums
+
+        if spherical:
+            norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            centroids = centroids / norms
+
+    return centroids.astype(np.float32)
+
+
+class ExactIndex:
+    """Ricerca esatta (brute force) sul motore di similarità: è anche il fallback degli indici ANN"""
+    kind = 'exact'
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def search(self, query, k, exclude=None):
+        return self.engine.search(query, k, exclude=exclude)
+
+
+class IVFIndex:
+    """
+    Indice ANN a file invertiti (IVF): il catalogo viene diviso in `n_lists` cluster
+    e ogni query visita solo gli `n_probe` cluster più vicini.
+    - n_lists: più liste = cluster più piccoli = query più veloci
+    - n_probe: più liste visitate = recall più alta ma query più lente
+    """
+    kind = 'ivf'
+
+    def __init__(self, engine, n_lists=None, n_probe=8, n_iter=20, seed=42):
+        self.engine = engine
+        self.n_lists = n_lists or max(1, int(4 * np.sqrt(len(engine))))
+        self.n_probe = n_probe
+        self.n_iter = n_iter
+        self.seed = seed
+        self.exact = ExactIndex(engine)
+
+        self.centroids = None
+        self.order = None  # Id delle righe ordinati per lista
+        self.offsets = None  # Inizio/fine di ogni lista dentro `order`
+
+    def build(self):
+        matrix = self.engine.matrix
+        self.centroids = kmeans(matrix, self.n_lists, n_iter=self.n_iter, seed=self.seed)
+        self.n_lists = len(self.centroids)
+
+        labels = assign_clusters(matrix, self.centroids)
+        self.order = np.argsort(labels, kind='stable').astype(np.int32)
+        self.offsets = np.zeros(self.n_lists + 1, dtype=np.int64)
+        np.cumsum(np.bincount(labels, minlength=self.n_lists), out=self.offsets[1:])
+        return self
+
+    def save(self, path):
+        np.savez(path, centroids=self.centroids, order=self.order, offsets=self.offsets)
+
+    def load(self, path):
+        data = np.load(path)
+        self.centroids = data['centroids']
+        self.order = data['order']
+        self.offsets = data['offsets']
+        self.n_lists = len(self.centroids)
+        return self
+
+    def cache_key(self):
+        return f"ivf{self.n_lists}_it{self.n_iter}_s{self.seed}"
+
+    def _candidates(self, q):
+        n_probe = min(self.n_probe, self.n_lists)
+        lists = np.argpartition(-(self.centroids @ q), n_probe - 1)[:n_probe]
+        return np.concatenate([self.order[self.offsets[l]:self.offsets[l + 1]] for l in lists])
+
+    def search(self, query, k, exclude=None):
+        if self.n_probe >= self.n_lists:
+            return self.exact.search(query, k, exclude=exclude)
+
+        q = self.engine.normalize(query)
+        cand = self._candidates(q)
+        if exclude is not None and len(exclude):
+            cand = cand[~np.isin(cand, exclude)]
+
+        # Troppo pochi candidati nelle liste visitate: ricerca esatta
+        if len(cand) < k:
+            return self.exact.search(query, k, exclude=exclude)
+
+        scores = self.engine.rows(cand) @ q
+        top = self.engine.top_k(scores, k)
+        return cand[top], scores[top]
+
+
+class TwoStageIndex:
+    """
+    Ricerca in due passi:
+    1. scansione della matrice ridotta (PCA o proiezione casuale, es. 64 dimensioni)
+       per trovare `n_candidates` candidati: ~6x meno byte letti per query
+    2. riordinamento dei soli candidati con gli embedding completi (punteggi esatti)
+    - dim: dimensioni della matrice ridotta
+    - n_candidates: più candidati = recall più alta ma riordinamento più costoso
+    """
+    kind = 'two_stage'
+
+    def __init__(self, engine, dim=64, n_candidates=300, method='pca', seed=42):
+        if method not in ('pca', 'random'):
+            raise ValueError(f"Riduzione sconosciuta: {method} (usa 'pca' o 'random')")
+        self.engine = engine
+        self.dim = min(dim, engine.dim)
+        self.n_candidates = n_candidates
+        self.method = method
+        self.seed = seed
+        self.exact = ExactIndex(engine)
+
+        self.components = None
+        self.mean = None
+        self.reduced = None  # Catalogo proiettato (n x dim, float32)
+
+    def build(self):
+        matrix = self.engine.matrix
+        if self.method == 'pca':
+            self.components, self.mean = fit_pca(matrix, self.dim, seed=self.seed)
+        else:
+            self.components, self.mean = random_projection(self.engine.dim, self.dim, seed=self.seed)
+        self.reduced = project(matrix, self.components, self.mean)
+        return self
+
+    def save(self, path):
+        np.savez(path, components=self.components, mean=self.mean, reduced=self.reduced)
+
+    def load(self, path):
+        data = np.load(path)
+        self.components = data['components']
+        self.mean = data['mean']
+        self.reduced = data['reduced']
+        self.dim = len(self.components)
+        return self
+
+    def cache_key(self):
+        return f"2s{self.method}{self.dim}_s{self.seed}"
+
+    def search(self, query, k, exclude=None):
+        if self.n_candidates >= len(self.engine) or k >= self.n_candidates:
+            return self.exact.search(query, k, exclude=exclude)
+
+        q = self.engine.normalize(query)
+        # La media si sottrae solo dal catalogo: per una query fissata sposta tutti i punteggi
+        # della stessa costante q.media, quindi l'ordinamento non cambia
+        approx = self.reduced @ (self.components @ q)
+        cand = self.engine.top_k(approx, self.n_candidates, exclude)
+
+        scores = self.engine.rows(cand) @ q
+        top = self.engine.top_k(scores, k)
+        return cand[top], scores[top]
+
+
+class ProductQuantizer:
+    """
+    Codec product quantization: ogni vettore viene diviso in `n_subspaces` sottovettori
+    e ognuno è sostituito dall'indice (uint8) del centroide più vicino nel suo sottospazio.
+    384 float32 (1536 byte) -> 48 codici da 1 byte: 32x meno memoria.
+    Lo scoring è asimmetrico (ADC): la query resta in float32 e si confronta con i centroidi
+    tramite una tabella (n_subspaces x n_centroids) calcolata una volta per query.
+    """
+
+    def __init__(self, n_subspaces=48, n_centroids=256, n_iter=20, sample_size=25000, seed=42):
+        if n_centroids > 256:
+            raise ValueError("n_centroids deve essere <= 256 (codici uint8)")
+        self.n_subspaces = n_subspaces
+        self.n_centroids = n_centroids
+        self.n_iter = n_iter
+        self.sample_size = sample_size
+        self.seed = seed
+        self.codebooks = None  # n_subspaces x n_centroids x sub_dim
+
+    @property
+    def sub_dim(self):
+        return self.codebooks.shape[2]
+
+    def _split(self, block):
+        return block.reshape(len(block), self.n_subspaces, -1)
+
+    def train(self, matrix):
+        dim = matrix.shape[1]
+        if dim % self.n_subspaces:
+            raise ValueError(f"La dimensione {dim} non è divisibile per n_subspaces={self.n_subspaces}")
+
+        # ~100 punti per centroide bastano: il campione tiene basso il costo dei k-means per sottospazio
+        rng = np.random.default_rng(self.seed)
+        n = matrix.shape[0]
+        sample_idx = np.sort(rng.choice(n, size=min(n, self.sample_size), replace=False))
+        sample = self._split(np.asarray(matrix[sample_idx], dtype=np.float32))
+
+        codebooks = np.zeros((self.n_subspaces, self.n_centroids, dim // self.n_subspaces), dtype=np.float32)
+        for m in range(self.n_subspaces):
+            # K-means euclideo: i sottovettori non hanno norma unitaria
+            centroids = kmeans(sample[:, m], self.n_centroids, n_iter=self.n_iter, seed=self.seed + m,
+                               spherical=False)
+            codebooks[m, :len(centroids)] = centroids
+        self.codebooks = codebooks
+        return self
+
+    def encode(self, matrix):
+        """
+        Codici uint8 calcolati a blocchi, salvati per sottospazio (n_subspaces x n):
+        lo scoring legge una colonna contigua di codici alla volta.
+        """
+        codes = np.empty((self.n_subspaces, matrix.shape[0]), dtype=np.uint8)
+        sq_norms = (self.codebooks ** 2).sum(axis=2)  # n_subspaces x n_centroids
+        # Blocco di distanze (righe x sottospazi x centroidi) limitato a ~64 MB
+        rows = max(1, (16 << 20) // (self.n_subspaces * self.n_centroids))
+        for start in range(0, matrix.shape[0], rows):
+            block = self._split(np.asarray(matrix[start:start + rows], dtype=np.float32))
+            # ||x - c||^2 = ||x||^2 - 2 x.c + ||c||^2 (il primo termine non cambia l'argmin)
+            dots = np.matmul(block.transpose(1, 0, 2), self.codebooks.transpose(0, 2, 1))
+            codes[:, start:start + rows] = np.argmin(sq_norms[:, None, :] - 2 * dots, axis=2)
+        return codes
+
+    def decode(self, codes):
+        """Ricostruzione approssimata (float32) dei vettori"""
+        return self.codebooks[np.arange(self.n_subspaces)[:, None], codes].transpose(1, 0, 2).reshape(codes.shape[1], -1)
+
+    def lookup_table(self, q):
+        """Prodotto scalare tra ogni sottovettore della query e ogni centroide (n_subspaces x n_centroids)"""
+        return np.einsum('md,mcd->mc', q.reshape(self.n_subspaces, -1), self.codebooks)
+
+    def scores(self, table, codes):
+        """Punteggi ADC: per ogni sottospazio si somma il valore di tabella indicato dal codice"""
+        out = np.zeros(codes.shape[1], dtype=np.float32)
+        for m in range(self.n_subspaces):
+            out += np.take(table[m], codes[m])
+        return out
+
+
+class PQIndex:
+    """
+    Generatore di candidati con product quantization: la scansione del catalogo legge solo
+    i codici uint8 (16-32x meno byte della matrice float32) invece di tutte le righe.
+    Qui la matrice resta in memoria per gli altri percorsi (grafo k-NN, profili 'max', filtri)
+    e per il riordino qui sotto; per tenere SOLO i codici si usa PQEngine (codes_only).
+    - n_subspaces: più sottospazi = codici più lunghi = punteggi più precisi
+    - n_rerank: i migliori n_rerank candidati ADC vengono riordinati leggendo le loro righe
+      complete (recall quasi esatta, n_rerank righe lette per query);
+      0 = solo codici, nessuna lettura della matrice ma recall più bassa
+    """
+    kind = 'pq'
+
+    def __init__(self, engine, n_subspaces=48, n_centroids=256, n_rerank=100, n_iter=20, seed=42):
+        self.engine = engine
+        self.n_rerank = n_rerank
+        self.quantizer = ProductQuantizer(n_subspaces, n_centroids, n_iter=n_iter, seed=seed)
+        self.exact = ExactIndex(engine)
+        self.codes = None  # n_subspaces x n, uint8
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes + self.quantizer.codebooks.nbytes
+
+    def build(self):
+        self.quantizer.train(self.engine.matrix)
+        self.codes = self.quantizer.encode(self.engine.matrix)
+        return self
+
+    def save(self, path):
+        np.savez(path, codebooks=self.quantizer.codebooks, codes=self.codes)
+
+    def load(self, path):
+        data = np.load(path)
+        self.quantizer.codebooks = data['codebooks']
+        self.codes = data['codes']
+        return self
+
+    def cache_key(self):
+        q = self.quantizer
+        return f"pq{q.n_subspaces}x{q.n_centroids}_it{q.n_iter}_s{q.seed}"
+
+    def search(self, query, k, exclude=None):
+        q = self.engine.normalize(query)
+        scores = self.quantizer.scores(self.quantizer.lookup_table(q), self.codes)
+        if self.n_rerank <= k:
+            top = self.engine.top_k(scores, k, exclude)
+            return top, scores[top]
+
+        cand = self.engine.top_k(scores, self.n_rerank, exclude)
+        exact = self.engine.rows(cand) @ q
+        top = self.engine.top_k(exact, k)
+        return cand[top], exact[top]
+
+
+class _NormalizedRows:
+    """Vista sugli embedding che normalizza solo le righe lette (nessuna copia normalizzata intera)"""
+
+    def __init__(self, matrix):
+        self.matrix = matrix
+        self.shape = matrix.shape
+
+    def __getitem__(self, idx):
+        block = np.asarray(self.matrix[idx], dtype=np.float32)
+        norms = np.linalg.norm(block, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return block / norms
+
+
+class PQEngine(SimilarityEngine):
+    """
+    Motore di similarità sui soli codici PQ (codes_only): nessuna matrice float in memoria,
+    solo n x n_subspaces byte di codici + i codebook.
+    - score / score_many / ricerca con filtri: punteggi ADC divisi per la norma del vettore ricostruito
+      (coseno con la ricostruzione)
+    - rows / vector: vettori ricostruiti dai codici (quantizer.decode), normalizzati
+    Stessa interfaccia di SimilarityEngine: grafo k-NN, profili e filtri lo usano invariati.
+    """
+
+    def __init__(self, quantizer, codes, norms=None):
+        self.dtype = np.dtype(np.float32)
+        self.sparse = False
+        self.matrix = None  # Nessuna matrice float: chi legge righe passa da rows()
+        self.quantizer = quantizer
+        self.codes = codes  # n_subspaces x n, uint8
+        if norms is None:
+            norms = np.empty(codes.shape[1], dtype=np.float32)
+            for start in range(0, codes.shape[1], BLOCK_ROWS):
+                block = quantizer.decode(codes[:, start:start + BLOCK_ROWS])
+                norms[start:start + BLOCK_ROWS] = np.linalg.norm(block, axis=1)
+            norms[norms == 0] = 1.0
+        self.norms = norms
+
+    def __len__(self):
+        return self.codes.shape[1]
+
+    @property
+    def dim(self):
+        return self.quantizer.n_subspaces * self.quantizer.sub_dim
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes + self.norms.nbytes + self.quantizer.codebooks.nbytes
+
+    @staticmethod
+    def cache_key(n_subspaces=48, n_centroids=256, n_iter=20, seed=42):
+        return f"pqcodes{n_subspaces}x{n_centroids}_it{n_iter}_s{seed}"
+
+    @classmethod
+    def build(cls, embeddings, n_subspaces=48, n_centroids=256, n_iter=20, seed=42):
+        """Addestra il quantizzatore e codifica gli embedding a blocchi, normalizzati al volo"""
+        matrix = _NormalizedRows(embeddings)
+        quantizer = ProductQuantizer(n_subspaces, n_centroids, n_iter=n_iter, seed=seed).train(matrix)
+        return cls(quantizer, quantizer.encode(matrix))
+
+    def save(self, path):
+        np.savez(path, codebooks=self.quantizer.codebooks, codes=self.codes, norms=self.norms)
+
+    @classmethod
+    def load(cls, path, n_subspaces=48, n_centroids=256, n_iter=20, seed=42):
+        data = np.load(path)
+        quantizer = ProductQuantizer(n_subspaces, n_centroids, n_iter=n_iter, seed=seed)
+        quantizer.codebooks = data['codebooks']
+        return cls(quantizer, data['codes'], data['norms'])
+
+    def rows(self, idx):
+        """Righe ricostruite dai codici e normalizzate (float32)"""
+        idx = np.asarray(idx, dtype=np.int64)
+        if idx.size == 0: return np.empty((*idx.shape, self.dim), dtype=np.float32)
+        vecs = self.quantizer.decode(self.codes[:, idx.ravel()]) / self.norms[idx.ravel(), None]
+        return vecs.reshape(*idx.shape, -1)
+
+    def _adc(self, q, codes, norms):
+        return self.quantizer.scores(self.quantizer.lookup_table(q), codes) / norms
+
+    def score(self, query):
+        return self._adc(self.normalize(query), self.codes, self.norms)
+
+    def _block_scores(self, block_rows, q):
+        return self._adc(q, self.codes[:, block_rows], self.norms[block_rows])
+
+    def score_many(self, queries):
+        """Una tabella ADC per query: il costo è una passata sui codici per ogni query"""
+        q = np.asarray(queries, dtype=np.float32)
+        scores = np.empty((len(q), len(self)), dtype=np.float32)
+        for r in range(len(q)):
+            scores[r] = self.score(q[r])
+        return scores
+
+
+def build_pq_engine(embeddings, cache_dir="cache", fingerprint=None, **params):
+    """
+    PQEngine (solo codici) costruito dagli embedding o ricaricato da cache/.
+    `embeddings` può essere il memory-map dello store: viene letto a blocchi e non resta in memoria.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    key = PQEngine.cache_key(**params)
+    path = os.path.join(cache_dir, f"ann_{key}_{fingerprint or matrix_fingerprint(embeddings)}.npz")
+    if os.path.exists(path):
+        print(f"⚡ CODICI PQ CACHED: {path}")
+        return PQEngine.load(path, **params)
+
+    print(f"🏗️ COSTRUZIONE CODICI PQ SU {embeddings.shape[0]} righe...")
+    engine = PQEngine.build(embeddings, **params)
+    engine.save(path)
+    prune_index_files(cache_dir, key, keep=path)
+    return engine
+
+
+INDEX_TYPES = {
+    'exact': ExactIndex,
+    'ivf': IVFIndex,
+    'two_stage': TwoStageIndex,
+    'pq': PQIndex,
+}
+
+
+def index_recall(index, engine, query_idx, k=10):
+    """
+    Recall@k dell'indice rispetto alla ricerca esatta, usando come query le righe `query_idx`
+    (la riga stessa è esclusa). Restituisce anche i tempi medi per query in millisecondi.
+    """
+    hits = total = 0
+    exact_time = index_time = 0.0
+    for i in query_idx:
+        q = engine.vector(i)
+        start = time.perf_counter()
+        truth, _ = engine.search(q, k, exclude=[i])
+        exact_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        found, _ = index.search(q, k, exclude=[i])
+        index_time += time.perf_counter() - start
+
+        hits += len(np.intersect1d(truth, found))
+        total += len(truth)
+
+    n = max(1, len(query_idx))
+    return {
+        'index': index.kind,
+        'queries': len(query_idx),
+        f'recall@{k}': hits / total if total else 0,
+        'exact_ms': 1000 * exact_time / n,
+        'index_ms': 1000 * index_time / n,
+    }
+
+
+def build_index(kind, engine, cache_dir="cache", fingerprint=None, **params):
+    """
+    Costruisce (o ricarica da cache/) l'indice richiesto sul motore di similarità.
+    Il file in cache è legato a `fingerprint` (default: impronta della matrice normalizzata,
+    che richiede di leggerla tutta): quando cambia, le versioni precedenti dello stesso
+    indice (stessa cache_key) vengono cancellate.
+    """
+    if kind not in INDEX_TYPES:
+        raise ValueError(f"Indice sconosciuto: {kind} (disponibili: {list(INDEX_TYPES)})")
+
+    if kind != 'exact' and engine.sparse:
+        # Gli indici ANN lavorano su vettori densi: con TF-IDF sparso si resta sulla ricerca esatta
+        print(f"⚠️ Indice {kind} non disponibile su matrice sparsa: uso la ricerca esatta")
+        kind, params = 'exact', {}
+
+    index = INDEX_TYPES[kind](engine, **params)
+    if kind == 'exact':
+        return index
+
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, f"ann_{index.cache_key()}_{fingerprint or matrix_fingerprint(engine.matrix)}.npz")
+    if os.path.exists(path):
+        print(f"⚡ INDICE ANN CACHED: {path}")
+        return index.load(path)
+
+    print(f"🏗️ COSTRUZIONE INDICE ANN ({kind}) SU {len(engine)} righe...")
+    index.build()
+    index.save(path)
+    prune_index_files(cache_dir, index.cache_key(), keep=path)
+    return index
+
+
+def prune_index_files(cache_dir, cache_key, keep):
+    """Cancella gli ann_<cache_key>_*.npz diversi da `keep` (impronte di matrici superate)"""
+    removed = 0
+    for old in glob.glob(os.path.join(cache_dir, f"ann_{glob.escape(cache_key)}_*.npz")):
+        if os.path.abspath(old) == os.path.abspath(keep): continue
+        try:
+            os.remove(old)
+            removed += 1
+        except OSError:
+            # Già rimosso da un altro processo o ancora aperto (Windows): si riprova al prossimo build
+            pass
+    if removed: print(f"🧹 Indice ANN: rimosse {removed} versioni vecchie ({cache_key})")
+    return removed
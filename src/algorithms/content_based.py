@@ -1,66 +1,233 @@
+import hashlib
 import pandas as pd
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
+import scipy.sparse as sp
+from .similarity import SimilarityEngine
+from .ann_index import ExactIndex, build_index, build_pq_engine, index_recall, matrix_fingerprint
+from .knn_graph import KnnGraph
+from .profile import ProfileScorer, AGGREGATIONS
+from .filters import FilterIndex
+from .results import Recommendations
+from .result_cache import ResultCache, filters_key
 
 
 class ContentBasedRecommender:
-    def __init__(self, df, embeddings):
+    # Con un indice ANN i filtri che ammettono almeno questa quota del catalogo si applicano ai
+    # candidati dell'indice; quelli più selettivi usano la ricerca esatta sulle sole righe ammesse
+    ANN_FILTER_MIN_FRACTION = 0.05
+
+    def __init__(self, df, embeddings, dtype=np.float32, index='exact', index_params=None, cache_dir="cache",
+                 knn_k=None, overviews=None, profile_aggregation='mean', version=None, result_cache_size=512,
+                 fingerprint=None):
+        """
+        index_params={'codes_only': True} con index='pq': in memoria restano solo i codici PQ
+        (nessuna matrice float); ricerca, filtri, profili e grafo usano punteggi ADC e righe ricostruite.
+        fingerprint: versione degli embedding se già nota (es. EmbeddingGenerator.version), per i file
+        in cache/ (indice, codici PQ, grafo); senza, la matrice viene letta tutta per calcolarne l'hash.
+        """
         self.df = df.reset_index(drop=True)
-        self.embeddings = embeddings
+        # Trame in lettura pigra (catalogo colonnare) se il DataFrame non le contiene
+        self.overviews = overviews
+        params = dict(index_params or {})
+        codes_only = index == 'pq' and params.pop('codes_only', False) and not sp.issparse(embeddings)
+
+        if codes_only:
+            # Senza matrice non c'è nulla da riordinare: la ricerca è la scansione ADC dei codici
+            params.pop('n_rerank', None)
+            self.embeddings = None
+            self.fingerprint = self._fingerprint(fingerprint, embeddings, 'pq_codes')
+            self.engine = build_pq_engine(embeddings, cache_dir=cache_dir, fingerprint=self.fingerprint, **params)
+            self.index = ExactIndex(self.engine)
+        else:
+            self.embeddings = embeddings
+            # Embedding normalizzati una volta sola (float32 o float16)
+            self.engine = SimilarityEngine(embeddings, dtype=dtype)
+            self.fingerprint = None
+            if fingerprint is not None or index != 'exact' or knn_k:
+                self.fingerprint = self._fingerprint(fingerprint, self.engine.matrix, self.engine.dtype.name)
+            # Backend di ricerca: 'exact' (brute force) oppure approssimato ('ivf', 'two_stage', 'pq'), persistito in cache/
+            self.index = build_index(index, self.engine, cache_dir=cache_dir, fingerprint=self.fingerprint, **params)
         # Creiamo un indice tutto minuscolo per la ricerca esatta veloce
         self.indices = pd.Series(self.df.index, index=self.df['title'].str.lower()).drop_duplicates()
 
-    def recommend_single(self, title, top_n=5):
+        # Partizioni per tipo / piattaforma / genere (filtri applicati prima dello scoring)
+        self.filters = FilterIndex(self.df)
+
+        # Profili con più preferiti: punteggi per titolo in cache, aggiornati in modo incrementale
+        self.profiles = ProfileScorer(self.engine, aggregation=profile_aggregation)
+
+        # Risultati già calcolati (Streamlit ripete le stesse richieste a ogni rerun), validi
+        # solo per questa versione di catalogo + embedding
+        self.results = ResultCache(max_size=result_cache_size, version=version)
+
+        # Grafo k-NN precalcolato (opzionale): ricostruito solo se cambiano catalogo o embedding
+        self.graph = None
+        if knn_k:
+            self.graph = KnnGraph.load_or_build(self.engine, self.df['title'].values, k=knn_k, cache_dir=cache_dir,
+                                                fingerprint=self.fingerprint)
+
+    @staticmethod
+    def _fingerprint(fingerprint, matrix, mode):
+        """Impronta degli embedding per i file in cache/, distinta per modalità (dtype o solo codici)"""
+        base = fingerprint if fingerprint is not None else matrix_fingerprint(matrix)
+        return hashlib.sha1(f"{base}|{mode}".encode()).hexdigest()[:16]
+
+    def _lookup(self, title):
+        """Tutte le righe il cui titolo (minuscolo) coincide con `title`"""
+        ix = self.indices.get(title.lower())
+        if ix is None: return []
+        if isinstance(ix, pd.Series): return ix.tolist()
+        return [ix]
+
+    def _rows(self, top_idx, scores):
+        # Solo indici + punteggi: le colonne da mostrare si leggono quando la UI le usa
+        return Recommendations(self.df, top_idx, scores, overviews=self.overviews)
+
+    def _search(self, query, top_n, exclude, filters):
+        """Ricerca sull'indice; con i filtri, candidati dell'indice filtrati o ricerca sulle righe ammesse"""
+        rows = self.filters.rows(**filters) if filters else None
+        if rows is None:
+            return self.index.search(query, top_n, exclude=exclude)
+        if self.index.kind != 'exact' and len(rows) >= self.ANN_FILTER_MIN_FRACTION * len(self.engine):
+            hit = self._search_masked(query, rows, top_n, exclude)
+            if hit is not None: return hit
+        return self.engine.search_subset(query, rows, top_n, exclude=exclude)
+
+    def _search_masked(self, query, rows, top_n, exclude):
+        """Candidati dell'indice ANN (in proporzione alla selettività del filtro) ristretti alle righe ammesse"""
+        k = int(np.ceil(2 * top_n * len(self.engine) / len(rows)))
+        ids, scores = self.index.search(query, k, exclude=exclude)
+        pos = np.minimum(np.searchsorted(rows, ids), len(rows) - 1)
+        keep = rows[pos] == ids
+        # Troppo pochi candidati ammessi: il chiamante ripiega sulla ricerca esatta
+        if keep.sum() < top_n: return None
+        return ids[keep][:top_n], scores[keep][:top_n]
+
+    def set_version(self, version):
+        """Versione di catalogo/embedding (es. DataIngestor.version + EmbeddingGenerator.version)"""
+        self.results.set_version(version)
+
+    def recommend_single(self, title, top_n=5, filters=None):
+        """filters: es. {'type': 'Movie', 'source': 'Netflix', 'genre': 'Horror'}"""
+        key = ('single', str(title).lower(), top_n, filters_key(filters))
+        return self.results.get_or_compute(key, lambda: self._recommend_single(title, top_n, filters))
+
+    def _recommend_single(self, title, top_n, filters):
         # Cerca nel dizionario lower-case
-        idx = self.indices.get(title.lower())
+        ids = self._lookup(title)
+        if not ids: return None
+        idx = ids[0]
 
-        if idx is None: return None
-        if isinstance(idx, pd.Series): idx = idx.iloc[0]
+        # Prima il grafo precalcolato (lettura di una riga), poi la ricerca completa
+        if self.graph is not None and not filters:
+            hit = self.graph.lookup(idx, top_n, exclude=ids)
+            if hit is not None: return self._rows(*hit)
 
-        target = self.embeddings[idx].reshape(1, -1)
-        scores = cosine_similarity(target, self.embeddings).flatten()
+        # Escludiamo il film stesso (e gli omonimi) invece di scartare il primo risultato
+        top_idx, scores = self._search(self.engine.vector(idx), top_n, ids, filters)
+        return self._rows(top_idx, scores)
 
-        # Ordina
-        top_idx = scores.argsort()[-(top_n + 1):-1][::-1]
+    def recommend_profile(self, titles, top_n=5, filters=None, aggregation=None, weights=None):
+        """
+        aggregation: 'mean' (default, centroide dei preferiti), 'weighted' (con `weights`, uno per
+        titolo) o 'max' (preferito più vicino). Tutte passano per l'indice configurato.
+        """
+        if weights is not None and len(weights) != len(titles):
+            raise ValueError(f"Servono un peso per titolo: {len(weights)} pesi per {len(titles)} titoli")
+        aggregation = aggregation or self.profiles.aggregation
+        if aggregation not in AGGREGATIONS:
+            raise ValueError(f"Aggregazione sconosciuta: {aggregation} (disponibili: {list(AGGREGATIONS)})")
 
-        res = []
-        for i in top_idx:
-            row = self.df.iloc[i].to_dict()
-            row['score'] = scores[i]
-            res.append(row)
-        return pd.DataFrame(res)
+        # L'ordine dei preferiti non cambia il risultato, le ripetizioni sì (un titolo ripetuto
+        # pesa di più nel centroide): la chiave è il multinsieme ordinato delle coppie (titolo, peso)
+        pairs = zip(titles, weights if weights is not None else [1.0] * len(titles))
+        key = ('profile', tuple(sorted((str(t).lower(), float(w)) for t, w in pairs)), top_n,
+               filters_key(filters), aggregation)
+        return self.results.get_or_compute(
+            key, lambda: self._recommend_profile(titles, top_n, filters, aggregation, weights))
 
-    def recommend_profile(self, titles, top_n=5):
-        # Ottieni gli indici validi
+    def _recommend_profile(self, titles, top_n, filters, aggregation, weights):
+        # Ottieni gli indici validi (più tutte le righe omonime da escludere)
         valid_idxs = []
-        for t in titles:
-            ix = self.indices.get(t.lower())
-            if ix is not None:
-                if isinstance(ix, pd.Series): ix = ix.iloc[0]
-                valid_idxs.append(ix)
+        valid_weights = []
+        excluded = []
+        for pos, t in enumerate(titles):
+            ids = self._lookup(t)
+            if ids:
+                valid_idxs.append(ids[0])
+                valid_weights.append(1.0 if weights is None or aggregation != 'weighted' else weights[pos])
+                excluded.extend(ids)
 
         if not valid_idxs: return None
 
-        # Calcola Media Vettoriale
-        user_vec = np.mean(self.embeddings[valid_idxs], axis=0).reshape(1, -1)
-        scores = cosine_similarity(user_vec, self.embeddings).flatten()
+        # Non raccomandare ciò che l'utente ha già selezionato
+        if aggregation == 'max':
+            top_idx, scores = self._profile_max(valid_idxs, top_n, excluded, filters)
+        else:
+            # Media (pesata) delle similarità = similarità col centroide dei preferiti normalizzati
+            w = np.asarray(valid_weights, dtype=np.float32)
+            user_vec = self.engine.rows(np.asarray(valid_idxs, dtype=np.int64)).T @ w / w.sum()
+            top_idx, scores = self._search(user_vec, top_n, excluded, filters)
+        return self._rows(top_idx, scores)
+
+    def _profile_max(self, ids, top_n, exclude, filters):
+        """
+        'max' sull'indice configurato: il top-k del massimo è contenuto nell'unione dei top-k
+        dei singoli preferiti (grafo o indice). Con l'indice esatto senza grafo, o con i filtri,
+        si usano i punteggi in cache del ProfileScorer.
+        """
+        if filters or (self.graph is None and self.index.kind == 'exact'):
+            rows = self.filters.rows(**filters) if filters else None
+            return self.profiles.search(ids, top_n, exclude=exclude, rows=rows, aggregation='max')
 
-        top_idx = scores.argsort()[::-1]
+        best = {}
+        for idx in ids:
+            hit = self.graph.lookup(idx, top_n, exclude=exclude) if self.graph is not None else None
+            if hit is None:
+                hit = self.index.search(self.engine.vector(idx), top_n, exclude=exclude)
+            for i, score in zip(*hit):
+                if score > best.get(int(i), -np.inf):
+                    best[int(i)] = score
+        top = sorted(best, key=best.get, reverse=True)[:top_n]
+        return np.array(top, dtype=np.int64), np.array([best[i] for i in top], dtype=np.float32)
 
-        res = []
-        # Lista di titoli input in minuscolo per esclusione
-        input_lower = [t.lower() for t in titles]
+    def index_recall(self, n_queries=200, k=10, seed=42):
+        """
+        Recall@k del backend di ricerca rispetto alla ricerca esatta su titoli a caso del catalogo.
+        Con codes_only il riferimento è la stessa scansione ADC (la matrice float non c'è).
+        """
+        rng = np.random.default_rng(seed)
+        query_idx = rng.choice(len(self.engine), size=min(n_queries, len(self.engine)), replace=False)
+        report = index_recall(self.index, self.engine, query_idx, k=k)
+        print(f"🎯 RECALL@{k} ({report['index']}): {report[f'recall@{k}']:.3f} "
+              f"- {report['index_ms']:.2f} ms vs {report['exact_ms']:.2f} ms esatta")
+        return report
 
-        count = 0
-        for i in top_idx:
-            curr_title = self.df.iloc[i]['title']
-            # Non raccomandare ciò che l'utente ha già selezionato
-            if curr_title.lower() in input_lower: continue
+    def recommend_many(self, titles, top_n=5, memory_budget_mb=None):
+        """
+        Raccomandazioni per molti titoli in un colpo solo (valutazione offline, warm-up cache).
+        Le query vengono valutate a blocchi con un prodotto matrice-matrice.
+        Restituisce tre array allineati ai titoli in input:
+        - query_idx (n,): riga del titolo nel catalogo, -1 se non trovato
+        - neighbours (n x top_n, int32): righe raccomandate, -1 se mancanti
+        - scores (n x top_n, float32): similarità, NaN se mancanti
+        """
+        query_idx = np.full(len(titles), -1, dtype=np.int64)
+        excluded = []
+        for pos, t in enumerate(titles):
+            ids = self._lookup(str(t))
+            if ids:
+                query_idx[pos] = ids[0]
+            excluded.append(ids)
 
-            row = self.df.iloc[i].to_dict()
-            row['score'] = scores[i]
-            res.append(row)
-            count += 1
-            if count >= top_n: break
+        found = np.flatnonzero(query_idx >= 0)
+        neighbours = np.full((len(titles), top_n), -1, dtype=np.int32)
+        scores = np.full((len(titles), top_n), np.nan, dtype=np.float32)
+        if len(found) == 0: return query_idx, neighbours, scores
 
-        return pd.DataFrame(res)
\ No newline at end of file
+        ids, sc = self.engine.search_many(self.engine.rows(query_idx[found]), top_n,
+                                          exclude=[excluded[p] for p in found],
+                                          memory_budget_mb=memory_budget_mb)
+        neighbours[found, :ids.shape[1]] = ids
+        scores[found, :sc.shape[1]] = sc
+        return query_idx, neighbours, scores
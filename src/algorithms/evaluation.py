@@ -0,0 +1,115 @@
+import os
+import re
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from concurrent.futures import ThreadPoolExecutor
+
+
+def genre_matrix(genres, sep=r"\s*[|,]\s*"):
+    """
+    Matrice multi-hot sparsa (CSR, titoli x generi) dalla colonna `genres`.
+    Ogni stringa distinta viene divisa una sola volta ("Action|Sci-Fi", "Dramas, Comedies").
+    Restituisce (matrice, lista dei generi).
+    """
+    codes, uniques = pd.factorize(pd.Series(genres).astype(object).where(pd.notna(genres), ""))
+    splitter = re.compile(sep)
+
+    vocab = {}
+    rows, cols = [], []
+    for u, text in enumerate(uniques):
+        for g in {g for g in splitter.split(str(text)) if g and g.lower() not in ('nan', 'none', 'unknown')}:
+            rows.append(u)
+            cols.append(vocab.setdefault(g, len(vocab)))
+
+    per_unique = sp.csr_matrix((np.ones(len(rows), dtype=np.float32), (rows, cols)),
+                               shape=(len(uniques), len(vocab)))
+    # Riga di ogni titolo = riga della sua stringa di generi
+    return per_unique[codes], list(vocab)
+
+
+def genre_hits(G, query_idx, neighbours):
+    """
+    Per ogni coppia (query, raccomandazione) True se condividono almeno un genere.
+    neighbours: q x k con -1 dove manca il risultato. Restituisce (hits q x k, valid q x k).
+    """
+    valid = neighbours >= 0
+    q = np.repeat(query_idx, neighbours.shape[1])[valid.ravel()]
+    r = neighbours.ravel()[valid.ravel()]
+    hits = np.zeros(neighbours.shape, dtype=bool)
+    hits[valid] = np.asarray(G[q].multiply(G[r]).sum(axis=1)).ravel() > 0
+    return hits, valid
+
+
+def intra_list_similarity(engine, neighbours):
+    """Similarità coseno media tra le coppie di raccomandazioni di ogni lista (q,)"""
+    k = neighbours.shape[1]
+    if k < 2: return np.zeros(len(neighbours), dtype=np.float32)
+    valid = neighbours >= 0
+    safe = np.where(valid, neighbours, 0)
+    n = valid.sum(axis=1)
+    pairs = n * (n - 1)
+
+    if engine.sparse:
+        matrix = engine.matrix
+        # TF-IDF: prodotto riga per riga su ogni coppia di posizioni, senza densificare
+        off_diag = np.zeros(len(neighbours), dtype=np.float64)
+        for a in range(k):
+            for b in range(a + 1, k):
+                dots = np.asarray(matrix[safe[:, a]].multiply(matrix[safe[:, b]]).sum(axis=1)).ravel()
+                off_diag += 2 * dots * (valid[:, a] & valid[:, b])
+    else:
+        # Righe lette dal motore: anche senza matrice float (solo codici PQ)
+        vecs = engine.rows(safe)
+        vecs[~valid] = 0
+        sims = np.einsum('qid,qjd->qij', vecs, vecs)
+        off_diag = sims.sum(axis=(1, 2)) - np.einsum('qii->q', sims)
+    return np.where(pairs > 0, off_diag / np.maximum(pairs, 1), 0).astype(np.float32)
+
+
+class CatalogEvaluator:
+    """
+    Valutazione dell'intero catalogo (o di un campione) a blocchi vettoriali:
+    - genre precision@k: quota di raccomandazioni con almeno un genere in comune con la query
+    - coverage: quota del catalogo che compare in almeno una lista
+    - intra-list similarity: similarità media tra le raccomandazioni della stessa lista
+    I blocchi girano in parallelo su più thread (numpy/BLAS rilasciano il GIL).
+    """
+
+    def __init__(self, engine, genres, k=5, block_size=2048, n_jobs=None):
+        self.engine = engine
+        self.G, self.genres = genre_matrix(genres)
+        self.k = k
+        self.block_size = block_size
+        # Ogni thread tiene un blocco di punteggi (budget di search_many): pochi thread bastano
+        self.n_jobs = n_jobs or min(4, os.cpu_count() or 1)
+
+    def _evaluate_block(self, query_idx):
+        neighbours, _ = self.engine.search_many(self.engine.rows(query_idx), self.k,
+                                                exclude=[[i] for i in query_idx])
+        hits, valid = genre_hits(self.G, query_idx, neighbours)
+        ils = intra_list_similarity(self.engine, neighbours)
+        return int(hits.sum()), int(valid.sum()), float(ils.sum()), np.unique(neighbours[valid])
+
+    def evaluate(self, query_idx=None):
+        """Metriche su query_idx (default: tutto il catalogo)"""
+        if query_idx is None:
+            query_idx = np.arange(len(self.engine))
+        query_idx = np.asarray(query_idx, dtype=np.int64)
+        blocks = [query_idx[s:s + self.block_size] for s in range(0, len(query_idx), self.block_size)]
+
+        with ThreadPoolExecutor(max_workers=self.n_jobs) as pool:
+            results = list(pool.map(self._evaluate_block, blocks))
+
+        hits = sum(r[0] for r in results)
+        total = sum(r[1] for r in results)
+        covered = np.zeros(len(self.engine), dtype=bool)
+        for r in results:
+            covered[r[3]] = True
+
+        return {
+            'queries': len(query_idx),
+            f'genre_precision@{self.k}': hits / total if total > 0 else 0,
+            'coverage': float(covered.mean()) if len(covered) else 0,
+            'intra_list_similarity': sum(r[2] for r in results) / len(query_idx) if len(query_idx) else 0,
+        }
@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+from collections import OrderedDict
+from .evaluation import genre_matrix
+
+
+class FilterIndex:
+    """
+    Partizioni precalcolate di id di riga (int32 ordinati) per `type`, `source` e genere.
+    Un filtro ("Movies Only", una piattaforma, un genere) diventa la lista delle righe ammesse,
+    su cui il motore calcola il top-k senza copiare o ordinare il DataFrame.
+    """
+
+    # Combinazioni di filtri già risolte (le stesse si ripetono a ogni rerun)
+    MAX_CACHED = 64
+
+    def __init__(self, df, columns=('type', 'source')):
+        self.n_rows = len(df)
+        self.partitions = {}
+        for col in columns:
+            codes, uniques = pd.factorize(df[col].astype(object))
+            order = np.argsort(codes, kind='stable').astype(np.int32)
+            bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+            self.partitions[col] = {str(v): order[bounds[i]:bounds[i + 1]] for i, v in enumerate(uniques)}
+
+        # Generi: una colonna della matrice multi-hot (CSC) = righe di quel genere
+        G, names = genre_matrix(df['genres'])
+        G = G.tocsc()
+        self.partitions['genre'] = {g: G.indices[G.indptr[j]:G.indptr[j + 1]].astype(np.int32)
+                                    for j, g in enumerate(names)}
+        self._cache = OrderedDict()
+
+    def values(self, col):
+        return sorted(self.partitions[col])
+
+    def _rows_for(self, col, value):
+        values = [value] if isinstance(value, str) else list(value)
+        parts = [self.partitions[col].get(str(v), np.empty(0, dtype=np.int32)) for v in values]
+        if len(parts) == 1: return parts[0]
+        return np.unique(np.concatenate(parts))
+
+    def rows(self, **filters):
+        """
+        Righe ammesse: valori diversi della stessa colonna in OR, colonne diverse in AND.
+        Es. rows(type='Movie', genre=['Horror', 'Thriller']). None = nessun filtro.
+        """
+        active = tuple(sorted((c, v if isinstance(v, str) else tuple(v))
+                              for c, v in filters.items() if v is not None))
+        if not active: return None
+
+        if active in self._cache:
+            self._cache.move_to_end(active)
+            return self._cache[active]
+
+        rows = None
+        for col, value in active:
+            if col not in self.partitions:
+                raise KeyError(f"Filtro non supportato: {col} (disponibili: {list(self.partitions)})")
+            part = self._rows_for(col, value)
+            rows = part if rows is None else np.intersect1d(rows, part, assume_unique=True)
+
+        self._cache[active] = rows
+        if len(self._cache) > self.MAX_CACHED:
+            self._cache.popitem(last=False)
+        return rows
@@ -0,0 +1,110 @@
+import os
+import json
+import hashlib
+import numpy as np
+from .ann_index import matrix_fingerprint
+
+
+def catalog_fingerprint(titles, embedding_fingerprint):
+    """Impronta di catalogo (titoli in ordine) + embedding: cambia se cambia uno dei due"""
+    h = hashlib.sha1(embedding_fingerprint.encode())
+    for t in titles:
+        h.update(str(t).encode('utf-8', 'replace'))
+        h.update(b'\0')
+    return h.hexdigest()[:16]
+
+
+class KnnGraph:
+    """
+    Grafo k-NN precalcolato: per ogni titolo i K vicini (int32) e i punteggi (float16).
+    Salvato in cache/ come .npy + manifest JSON e riaperto in memory-map all'avvio,
+    così una raccomandazione singola diventa la lettura di una riga.
+    """
+
+    def __init__(self, neighbours, scores, fingerprint):
+        self.neighbours = neighbours
+        self.scores = scores
+        self.fingerprint = fingerprint
+
+    @property
+    def k(self):
+        return self.neighbours.shape[1]
+
+    @staticmethod
+    def paths(cache_dir, name="knn_graph"):
+        base = os.path.join(cache_dir, name)
+        return f"{base}_ids.npy", f"{base}_scores.npy", f"{base}.json"
+
+    @classmethod
+    def build(cls, engine, k, fingerprint, memory_budget_mb=None):
+        """Calcolo offline: tutte le righe come query, a blocchi con search_many"""
+        n = len(engine)
+        neighbours = np.full((n, k), -1, dtype=np.int32)
+        scores = np.zeros((n, k), dtype=np.float16)
+
+        # Blocchi di query per stampare l'avanzamento; search_many rispetta comunque il budget
+        step = 4096
+        for start in range(0, n, step):
+            stop = min(start + step, n)
+            ids, sc = engine.search_many(engine.rows(np.arange(start, stop)), k,
+                                         exclude=[[i] for i in range(start, stop)],
+                                         memory_budget_mb=memory_budget_mb)
+            neighbours[start:stop, :ids.shape[1]] = ids
+            scores[start:stop, :sc.shape[1]] = np.nan_to_num(sc)
+            print(f"🕸️ Grafo k-NN: {stop}/{n}")
+
+        return cls(neighbours, scores, fingerprint)
+
+    def save(self, cache_dir, name="knn_graph"):
+        ids_path, scores_path, manifest_path = self.paths(cache_dir, name)
+        # Scrittura su file temporaneo + rename: chi ha già il vecchio file in memory-map non si rompe
+        for path, arr in ((ids_path, self.neighbours), (scores_path, self.scores)):
+            with open(path + ".tmp", 'wb') as f:
+                np.save(f, arr)
+            os.replace(path + ".tmp", path)
+        # Il manifest si scrive per ultimo: se manca, il grafo è incompleto
+        with open(manifest_path, 'w') as f:
+            json.dump({'fingerprint': self.fingerprint, 'k': self.k, 'rows': len(self.neighbours)}, f)
+
+    @classmethod
+    def load(cls, cache_dir, fingerprint, name="knn_graph"):
+        """Apre il grafo in memory-map; None se manca o se è stato costruito su dati diversi"""
+        ids_path, scores_path, manifest_path = cls.paths(cache_dir, name)
+        if not os.path.exists(manifest_path): return None
+        try:
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+            if manifest.get('fingerprint') != fingerprint: return None
+            return cls(np.load(ids_path, mmap_mode='r'), np.load(scores_path, mmap_mode='r'), fingerprint)
+        except (OSError, ValueError):
+            return None
+
+    @classmethod
+    def load_or_build(cls, engine, titles, k=50, cache_dir="cache", name="knn_graph", fingerprint=None):
+        """fingerprint: impronta degli embedding se già nota (default: hash di tutta engine.matrix)"""
+        fingerprint = catalog_fingerprint(titles, fingerprint or matrix_fingerprint(engine.matrix))
+        graph = cls.load(cache_dir, fingerprint, name)
+        if graph is not None and graph.k >= k:
+            print(f"⚡ GRAFO K-NN CACHED: {cls.paths(cache_dir, name)[0]}")
+            return graph
+
+        print(f"🏗️ COSTRUZIONE GRAFO K-NN (k={k}) SU {len(engine)} titoli...")
+        os.makedirs(cache_dir, exist_ok=True)
+        cls.build(engine, k, fingerprint).save(cache_dir, name)
+        return cls.load(cache_dir, fingerprint, name)
+
+    def lookup(self, idx, top_n, exclude=None):
+        """
+        Vicini della riga idx (già ordinati). Restituisce None se, tolte le esclusioni,
+        la riga non contiene abbastanza vicini (il chiamante farà la ricerca completa).
+        """
+        ids = np.asarray(self.neighbours[idx])
+        scores = np.asarray(self.scores[idx], dtype=np.float32)
+
+        keep = ids >= 0
+        if exclude is not None and len(exclude):
+            keep &= ~np.isin(ids, exclude)
+        ids, scores = ids[keep], scores[keep]
+
+        if len(ids) < top_n: return None
+        return ids[:top_n], scores[:top_n]
@@ -1,17 +1,15 @@
+from .evaluation import genre_matrix, genre_hits
+
+
 def calculate_genre_overlap(df, recommender, n_samples=50):
     samples = df.sample(min(n_samples, len(df)))
-    matches = 0
-    total = 0
-
-    for _, row in samples.iterrows():
-        recs = recommender.recommend_single(row['title'])
-        if recs is None: continue
+    # Tutte le query in un solo passaggio batch invece di una recommend_single per titolo
+    query_idx, neighbours, _ = recommender.recommend_many(samples['title'].tolist())
+    found = query_idx >= 0
 
-        src_genres = set(str(row['genres']).split('|'))
-        for _, rec in recs.iterrows():
-            rec_genres = set(str(rec['genres']).split('|'))
-            if not src_genres.isdisjoint(rec_genres):
-                matches += 1
-            total += 1
+    # Generi divisi una volta sola in una matrice multi-hot, confronto vettoriale
+    G, _ = genre_matrix(recommender.df['genres'])
+    hits, valid = genre_hits(G, query_idx[found], neighbours[found])
+    total = valid.sum()
 
-    return matches / total if total > 0 else 0
\ No newline at end of file
+    return hits.sum() / total if total > 0 else 0
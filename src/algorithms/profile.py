@@ -0,0 +1,125 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+
+AGGREGATIONS = ('max', 'mean', 'weighted')
+
+
+class ProfileScorer:
+    """
+    Punteggi di un profilo con più preferiti senza fonderli in un solo vettore medio:
+    - ogni preferito viene confrontato con tutto il catalogo (un solo GEMM per i titoli nuovi)
+    - 'max': vale la similarità col preferito più vicino (horror E documentari, non una via di mezzo)
+    - 'mean' / 'weighted': media (pesata) delle similarità
+    I vettori di punteggio dei singoli titoli restano in cache e l'aggregato del profilo precedente
+    viene aggiornato: aggiungere o togliere un preferito non ricalcola tutto da capo.
+    """
+
+    # Memoria massima (MB) per i vettori di punteggio in cache (ognuno è lungo quanto il catalogo)
+    MEMORY_BUDGET_MB = 256
+
+    def __init__(self, engine, aggregation='max'):
+        if aggregation not in AGGREGATIONS:
+            raise ValueError(f"Aggregazione sconosciuta: {aggregation} (disponibili: {list(AGGREGATIONS)})")
+        self.engine = engine
+        self.aggregation = aggregation
+        self._items = OrderedDict()  # id -> similarità con tutto il catalogo (float32)
+        self._state = None  # Ultimo profilo: aggregazione, pesi e vettore accumulato
+        # Il recommender è condiviso tra le sessioni Streamlit
+        self._lock = threading.Lock()
+
+    def clear(self):
+        """Svuota i punteggi in cache e l'ultimo profilo"""
+        with self._lock:
+            self._items.clear()
+            self._state = None
+
+    def item_scores(self, ids):
+        """{id: punteggi} per i titoli richiesti; quelli mancanti si calcolano insieme"""
+        missing = [i for i in ids if i not in self._items]
+        if missing:
+            block = self.engine.score_many(self.engine.rows(np.asarray(missing, dtype=np.int64)))
+            for i, scores in zip(missing, block):
+                self._items[i] = scores
+
+        out = {}
+        for i in ids:
+            self._items.move_to_end(i)
+            out[i] = self._items[i]
+        max_items = max(len(ids), self.MEMORY_BUDGET_MB * 1024 ** 2 // (4 * max(1, len(self.engine))))
+        while len(self._items) > max_items:
+            self._items.popitem(last=False)
+        return out
+
+    def _full(self, aggregation, weights, vecs):
+        if aggregation == 'max':
+            return np.max(np.stack([vecs[i] for i in weights]), axis=0)
+        total = np.zeros(len(self.engine), dtype=np.float32)
+        for i, w in weights.items():
+            total += w * vecs[i]
+        return total
+
+    def scores(self, ids, weights=None, aggregation=None):
+        """
+        Punteggio di ogni riga del catalogo per il profilo `ids`.
+        weights: un peso per id (usato solo da 'weighted', default 1).
+        Restituisce un nuovo array: si può modificare (es. top_k) senza toccare la cache.
+        """
+        aggregation = aggregation or self.aggregation
+        if aggregation not in AGGREGATIONS:
+            raise ValueError(f"Aggregazione sconosciuta: {aggregation} (disponibili: {list(AGGREGATIONS)})")
+        if weights is None or aggregation != 'weighted':
+            weights = [1.0] * len(ids)
+        weights = {int(i): float(w) for i, w in zip(ids, weights)}
+        if not weights: return None
+
+        with self._lock:
+            total = self._update(aggregation, weights)
+
+        if aggregation == 'max':
+            return total.copy()
+        return total / sum(weights.values())
+
+    def _update(self, aggregation, weights):
+        """Vettore accumulato (massimo o somma pesata) del profilo, partendo da quello precedente"""
+        vecs = self.item_scores(list(weights))
+        prev = self._state
+        total = None
+        if prev is not None and prev['aggregation'] == aggregation:
+            old = prev['weights']
+            added = [i for i in weights if old.get(i) != weights[i]]
+            removed = [i for i in old if weights.get(i) != old[i]]
+            if aggregation == 'max':
+                # Il massimo si aggiorna solo aggiungendo: togliere un titolo richiede lo stack dei rimasti
+                if not removed:
+                    total = prev['total'].copy()
+                    for i in added:
+                        np.maximum(total, vecs[i], out=total)
+            elif all(i in self._items for i in removed):
+                total = prev['total'].copy()
+                for i in removed:
+                    total -= old[i] * self._items[i]
+                for i in added:
+                    total += weights[i] * vecs[i]
+
+        if total is None:
+            total = self._full(aggregation, weights, vecs)
+        self._state = {'aggregation': aggregation, 'weights': weights, 'total': total}
+        return total
+
+    def search(self, ids, k, exclude=None, rows=None, weights=None, aggregation=None):
+        """
+        Top-k per il profilo. `exclude`: righe da non restituire (maschera, niente confronti tra titoli);
+        `rows`: righe ammesse dai filtri (None = tutto il catalogo).
+        """
+        scores = self.scores(ids, weights=weights, aggregation=aggregation)
+        if scores is None: return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        if exclude is not None and len(exclude):
+            scores[np.asarray(exclude, dtype=np.int64)] = -np.inf
+        if rows is None:
+            top = self.engine.top_k(scores, k)
+            return top, scores[top]
+
+        sub = scores[rows]
+        top = self.engine.top_k(sub, k)
+        return rows[top], sub[top]
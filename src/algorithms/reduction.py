@@ -0,0 +1,37 @@
+import numpy as np
+
+BLOCK_ROWS = 65536
+
+
+def fit_pca(matrix, dim, sample_size=100000, seed=42):
+    """
+    PCA addestrata su un campione della matrice.
+    Restituisce (componenti dim x d, media d): la proiezione è (x - media) @ componenti.T
+    """
+    rng = np.random.default_rng(seed)
+    n = matrix.shape[0]
+    sample_idx = np.sort(rng.choice(n, size=min(n, sample_size), replace=False))
+    data = np.asarray(matrix[sample_idx], dtype=np.float32)
+
+    mean = data.mean(axis=0)
+    # Autovettori della covarianza (d x d): costa poco anche con molti campioni
+    cov = (data - mean).T @ (data - mean) / max(1, len(data) - 1)
+    eigvals, eigvecs = np.linalg.eigh(cov)
+    components = eigvecs[:, np.argsort(eigvals)[::-1][:dim]].T
+    return np.ascontiguousarray(components, dtype=np.float32), mean.astype(np.float32)
+
+
+def random_projection(in_dim, dim, seed=42):
+    """Proiezione casuale gaussiana (Johnson-Lindenstrauss): nessun addestramento, media nulla"""
+    rng = np.random.default_rng(seed)
+    components = rng.standard_normal((dim, in_dim)).astype(np.float32) / np.sqrt(dim)
+    return components, np.zeros(in_dim, dtype=np.float32)
+
+
+def project(matrix, components, mean):
+    """Matrice ridotta (n x dim, float32) calcolata a blocchi"""
+    out = np.empty((matrix.shape[0], components.shape[0]), dtype=np.float32)
+    for start in range(0, matrix.shape[0], BLOCK_ROWS):
+        block = np.asarray(matrix[start:start + BLOCK_ROWS], dtype=np.float32)
+        out[start:start + BLOCK_ROWS] = (block - mean) @ components.T
+    return out
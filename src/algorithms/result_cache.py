@@ -0,0 +1,78 @@
+import threading
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+def filters_key(filters):
+    """Chiave stabile per un dizionario di filtri (liste e valori singoli, None ignorati)"""
+    if not filters: return ()
+    items = []
+    for col, value in filters.items():
+        if value is None: continue
+        if isinstance(value, (list, tuple, set)):
+            value = tuple(sorted(str(v) for v in value))
+        items.append((col, value))
+    return tuple(sorted(items))
+
+
+class ResultCache:
+    """
+    Cache LRU dei risultati delle raccomandazioni (Streamlit riesegue lo script a ogni click).
+    Ogni voce vale per una sola versione di catalogo + embedding: quando la versione cambia
+    la cache si svuota da sola. Tiene il conto di hit e miss.
+    """
+
+    def __init__(self, max_size=512, version=None):
+        self.max_size = max_size
+        self.version = version
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def set_version(self, version):
+        """Nuova versione di catalogo/embedding: i risultati precedenti non valgono più"""
+        with self._lock:
+            if version != self.version:
+                self._data.clear()
+                self.version = version
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+    def get_or_compute(self, key, compute):
+        """Risultato in cache per `key`, altrimenti compute() (anche None viene salvato)"""
+        if self.max_size <= 0: return compute()
+        with self._lock:
+            value = self._data.get(key, _MISSING)
+            if value is not _MISSING:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return value
+            self.misses += 1
+            version = self.version
+
+        value = compute()
+        with self._lock:
+            # Risultato calcolato su una versione ormai superata: non lo salviamo
+            if version == self.version:
+                self._data[key] = value
+                while len(self._data) > self.max_size:
+                    self._data.popitem(last=False)
+        return value
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'version': self.version,
+            'size': len(self._data),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0,
+        }
@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+
+
+class Recommendation:
+    """Vista leggera su una riga di Recommendations (niente dict né Series per riga)"""
+    __slots__ = ('_result', '_pos')
+
+    def __init__(self, result, pos):
+        self._result = result
+        self._pos = pos
+
+    def __getitem__(self, key):
+        if key not in self._result:
+            raise KeyError(key)
+        return self._result.column(key)[self._pos]
+
+    def __contains__(self, key):
+        return key in self._result
+
+    def get(self, key, default=None):
+        return self[key] if key in self._result else default
+
+    def to_dict(self):
+        return {c: self[c] for c in self._result.columns}
+
+
+class Recommendations:
+    """
+    Risultato compatto di una raccomandazione: indici di riga + punteggi (array numpy).
+    Le colonne da mostrare si leggono solo quando servono, con un unico `take` vettoriale
+    per colonna; la UI può iterare direttamente sugli elementi.
+    """
+    __slots__ = ('indices', 'scores', '_df', '_overviews', '_columns')
+
+    def __init__(self, df, indices, scores, overviews=None):
+        self.indices = np.asarray(indices, dtype=np.int64)
+        self.scores = np.asarray(scores, dtype=np.float32)
+        self._df = df
+        self._overviews = overviews
+        self._columns = {'score': self.scores}
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __iter__(self):
+        for pos in range(len(self.indices)):
+            yield Recommendation(self, pos)
+
+    def __getitem__(self, pos):
+        return Recommendation(self, pos)
+
+    @property
+    def empty(self):
+        return len(self.indices) == 0
+
+    @property
+    def columns(self):
+        cols = list(self._df.columns)
+        if 'overview' not in cols and self._overviews is not None: cols.append('overview')
+        return cols + ['score']
+
+    def __contains__(self, key):
+        return key == 'score' or key in self._df.columns or (key == 'overview' and self._overviews is not None)
+
+    def column(self, name):
+        """Valori della colonna per le sole righe raccomandate (letti una volta e tenuti)"""
+        if name not in self._columns:
+            if name in self._df.columns:
+                self._columns[name] = self._df[name].take(self.indices).to_numpy()
+            elif name == 'overview' and self._overviews is not None:
+                self._columns[name] = self._overviews.take(self.indices)
+            else:
+                raise KeyError(name)
+        return self._columns[name]
+
+    def to_frame(self):
+        """DataFrame classico (per tabelle/debug)"""
+        return pd.DataFrame({c: self.column(c) for c in self.columns}, index=self.indices)
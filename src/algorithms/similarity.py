@@ -0,0 +1,212 @@
+import numpy as np
+import scipy.sparse as sp
+from sklearn.preprocessing import normalize as normalize_rows
+
+
+class SimilarityEngine:
+    """
+    Motore di scoring coseno per il catalogo.
+    Normalizza gli embedding UNA volta sola, li tiene in una matrice contigua
+    (float32 o float16) e seleziona i top-k con argpartition invece di ordinare tutto.
+    Le matrici sparse (TF-IDF) restano CSR: lo scoring è un prodotto sparso-denso.
+    """
+
+    SUPPORTED_DTYPES = (np.float32, np.float16)
+
+    # Righe per blocco quando la matrice è float16 (numpy non ha BLAS in half precision)
+    BLOCK_ROWS = 65536
+
+    # Memoria massima (MB) per il blocco di punteggi query x catalogo in search_many
+    MEMORY_BUDGET_MB = 256
+
+    # Filtri che ammettono almeno questa quota del catalogo: un solo prodotto su tutto il catalogo
+    SUBSET_FULL_SCAN = 0.25
+    # Righe estratte per blocco con i filtri più selettivi (~6 MB a 384 dimensioni)
+    SUBSET_BLOCK_ROWS = 4096
+
+    def __init__(self, embeddings, dtype=np.float32):
+        self.dtype = np.dtype(dtype)
+        if self.dtype not in [np.dtype(d) for d in self.SUPPORTED_DTYPES]:
+            raise ValueError(f"dtype non supportato: {self.dtype} (usa float32 o float16)")
+
+        self.sparse = sp.issparse(embeddings)
+        if self.sparse:
+            # CSR float32 normalizzata riga per riga, senza mai passare al denso
+            self.dtype = np.dtype(np.float32)
+            self.matrix = normalize_rows(sp.csr_matrix(embeddings, dtype=np.float32), norm='l2', copy=True)
+            return
+
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+
+        # Embedding già normalizzati in float32 (es. MiniLM dal memory-map dello store):
+        # li usiamo così come sono, senza copia, e restano condivisi nella page cache
+        if self.dtype == np.float32 and matrix.flags.c_contiguous and np.allclose(norms, 1.0, atol=1e-3):
+            self.matrix = matrix
+            return
+
+        norms[norms == 0] = 1.0  # Righe vuote restano a zero invece di diventare NaN
+        self.matrix = np.ascontiguousarray(matrix / norms, dtype=self.dtype)
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    @property
+    def dim(self):
+        return self.matrix.shape[1]
+
+    @staticmethod
+    def normalize(vec):
+        if sp.issparse(vec): vec = vec.toarray()
+        vec = np.asarray(vec, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm > 0 else vec
+
+    def rows(self, idx):
+        """Righe normalizzate in denso float32 (solo quelle richieste, anche da matrice sparsa)"""
+        if self.sparse: return self.matrix[idx].toarray()
+        return np.asarray(self.matrix[idx], dtype=np.float32)
+
+    def vector(self, idx):
+        """Vettore normalizzato (float32) della riga idx"""
+        return self.rows(idx).ravel()
+
+    def score(self, query):
+        """Similarità coseno tra la query e tutto il catalogo (un solo prodotto matrice-vettore)"""
+        q = self.normalize(query)
+        if self.dtype == np.float32:
+            return self.matrix @ q
+
+        # float16: convertiamo a blocchi per restare su BLAS float32 senza copiare tutta la matrice
+        scores = np.empty(len(self), dtype=np.float32)
+        for start in range(0, len(self), self.BLOCK_ROWS):
+            block = self.matrix[start:start + self.BLOCK_ROWS].astype(np.float32)
+            scores[start:start + self.BLOCK_ROWS] = block @ q
+        return scores
+
+    @staticmethod
+    def top_k(scores, k, exclude=None):
+        """
+        Indici dei k punteggi migliori in ordine decrescente.
+        ATTENZIONE: le righe in `exclude` vengono messe a -inf direttamente in `scores`.
+        """
+        if exclude is not None and len(exclude):
+            scores[np.asarray(exclude, dtype=np.int64)] = -np.inf
+
+        k = min(k, len(scores))
+        if k <= 0: return np.empty(0, dtype=np.int64)
+
+        if k < len(scores):
+            part = np.argpartition(-scores, k - 1)[:k]
+        else:
+            part = np.arange(len(scores))
+
+        top = part[np.argsort(-scores[part], kind='stable')]
+        # Non restituiamo righe escluse se il catalogo è più piccolo di k
+        return top[np.isfinite(scores[top])]
+
+    def search(self, query, k, exclude=None):
+        """Restituisce (indici, punteggi) dei k vicini più simili alla query"""
+        scores = self.score(query)
+        top = self.top_k(scores, k, exclude)
+        return top, scores[top]
+
+    def search_subset(self, query, rows, k, exclude=None):
+        """
+        Top-k ristretto alle righe ammesse `rows` (id ordinati, es. da FilterIndex).
+        - filtro ampio: un solo prodotto sul catalogo (come senza filtri), poi i punteggi delle righe ammesse
+        - filtro selettivo: solo le righe ammesse, estratte a piccoli blocchi tenendo i migliori k
+        In entrambi i casi niente copie proporzionali al catalogo oltre al vettore dei punteggi.
+        """
+        q = self.normalize(query)
+        rows = np.asarray(rows)
+        if len(rows) >= self.SUBSET_FULL_SCAN * len(self):
+            scores = self.score(q)[rows]
+            if exclude is not None and len(exclude):
+                scores[np.isin(rows, exclude)] = -np.inf
+            top = self.top_k(scores, k)
+            return rows[top].astype(np.int64), scores[top]
+
+        best_ids = np.empty(0, dtype=np.int64)
+        best_scores = np.empty(0, dtype=np.float32)
+
+        for start in range(0, len(rows), self.SUBSET_BLOCK_ROWS):
+            block_rows = rows[start:start + self.SUBSET_BLOCK_ROWS]
+            scores = self._block_scores(block_rows, q)
+            if exclude is not None and len(exclude):
+                scores[np.isin(block_rows, exclude)] = -np.inf
+
+            top = self.top_k(scores, k)
+            best_ids = np.concatenate([best_ids, block_rows[top]])
+            best_scores = np.concatenate([best_scores, scores[top]])
+            if len(best_ids) > k:
+                keep = self.top_k(best_scores.copy(), k)
+                best_ids, best_scores = best_ids[keep], best_scores[keep]
+
+        order = np.argsort(-best_scores, kind='stable')
+        return best_ids[order], best_scores[order]
+
+    def _block_scores(self, block_rows, q):
+        """Punteggi delle sole righe indicate (q già normalizzata)"""
+        if self.sparse:
+            # Prodotto sparso-denso sulle righe estratte: niente toarray() di blocchi 65536 x feature
+            return np.asarray(self.matrix[block_rows] @ q, dtype=np.float32).ravel()
+        return self.rows(block_rows) @ q
+
+    def score_many(self, queries):
+        """Similarità tra un blocco di query (q x dim) e tutto il catalogo: un solo GEMM"""
+        q = queries.toarray() if sp.issparse(queries) else np.asarray(queries, dtype=np.float32)
+        norms = np.linalg.norm(q, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        q = q / norms
+        if self.sparse:
+            return np.ascontiguousarray((self.matrix @ q.T).T, dtype=np.float32)
+        if self.dtype == np.float32:
+            return q @ self.matrix.T
+
+        scores = np.empty((len(q), len(self)), dtype=np.float32)
+        for start in range(0, len(self), self.BLOCK_ROWS):
+            block = self.matrix[start:start + self.BLOCK_ROWS].astype(np.float32)
+            scores[:, start:start + self.BLOCK_ROWS] = q @ block.T
+        return scores
+
+    def search_many(self, queries, k, exclude=None, memory_budget_mb=None):
+        """
+        Top-k per molte query insieme, a blocchi di query che rispettano il budget di memoria.
+        `exclude` è una lista (una voce per query) di righe da non restituire.
+        Restituisce (indici int32 q x k, punteggi float32 q x k); -1 / NaN dove mancano risultati.
+        """
+        if not sp.issparse(queries):
+            queries = np.asarray(queries, dtype=np.float32)
+        n_q = queries.shape[0]
+        k = min(k, len(self))
+        ids = np.full((n_q, k), -1, dtype=np.int32)
+        out = np.full((n_q, k), np.nan, dtype=np.float32)
+        if n_q == 0 or k <= 0: return ids, out
+
+        budget = (memory_budget_mb or self.MEMORY_BUDGET_MB) * 1024 ** 2
+        block_q = max(1, int(budget // (len(self) * 4)))
+
+        for start in range(0, n_q, block_q):
+            stop = min(start + block_q, n_q)
+            scores = self.score_many(queries[start:stop])
+
+            if exclude is not None:
+                for r, ex in enumerate(exclude[start:stop]):
+                    if ex is not None and len(ex):
+                        scores[r, np.asarray(ex, dtype=np.int64)] = -np.inf
+
+            if k < len(self):
+                part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            else:
+                part = np.broadcast_to(np.arange(len(self)), scores.shape)
+            part_scores = np.take_along_axis(scores, part, axis=1)
+            order = np.argsort(-part_scores, axis=1, kind='stable')
+            top = np.take_along_axis(part, order, axis=1)
+            top_scores = np.take_along_axis(part_scores, order, axis=1)
+
+            valid = np.isfinite(top_scores)
+            ids[start:stop] = np.where(valid, top, -1)
+            out[start:stop] = np.where(valid, top_scores, np.nan)
+
+        return ids, out
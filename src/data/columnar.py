@@ -0,0 +1,165 @@
+import os
+import json
+import uuid
+import shutil
+import hashlib
+import numpy as np
+import pandas as pd
+
+TEXT_COLUMNS = ['title', 'overview']
+CATEGORICAL_COLUMNS = ['genres', 'type', 'source']
+NUMERIC_COLUMNS = ['vote_average']
+
+
+class LazyTextColumn:
+    """
+    Colonna di testo su disco (blob UTF-8 + offset) aperta in memory-map:
+    le stringhe vengono decodificate solo quando servono (es. trame delle card mostrate).
+    """
+
+    def __init__(self, blob_path, offsets_path):
+        self.blob = np.load(blob_path, mmap_mode='r')
+        self.offsets = np.load(offsets_path, mmap_mode='r')
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        a, b = int(self.offsets[i]), int(self.offsets[i + 1])
+        return bytes(self.blob[a:b]).decode('utf-8')
+
+    def take(self, indices):
+        return [self[i] for i in indices]
+
+    def to_list(self):
+        """Tutta la colonna (un solo decode del blob)"""
+        raw = bytes(self.blob)
+        offs = np.asarray(self.offsets)
+        return [raw[a:b].decode('utf-8') for a, b in zip(offs[:-1], offs[1:])]
+
+
+class ColumnarCatalog:
+    """
+    Catalogo su disco in formato colonnare (cache/catalog/), un file per colonna:
+    - testi (title, overview): blob UTF-8 + offset int64, letti in memory-map
+    - colonne ripetitive (genres, type, source): codici int32 + categorie nel manifest
+    - numeriche (vote_average): float32
+    Così l'app carica solo le colonne che usa e le trame restano su disco.
+    Ogni scrittura va in una cartella nuova (data_*) e diventa valida sostituendo il manifest:
+    i file aperti in memory-map da chi usa il catalogo precedente non vengono mai troncati.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.manifest_path = os.path.join(path, "manifest.json")
+
+    def exists(self):
+        return os.path.exists(self.manifest_path)
+
+    def _file(self, name, manifest=None):
+        # I cataloghi scritti prima delle cartelle versionate hanno i file direttamente in path/
+        manifest = manifest if manifest is not None else self.manifest()
+        return os.path.join(self.path, manifest.get('dir', ''), name)
+
+    def manifest(self):
+        with open(self.manifest_path) as f:
+            return json.load(f)
+
+    @property
+    def version(self):
+        """Impronta di tutte le colonne salvate, cambia a ogni ricostruzione con dati diversi"""
+        return self.manifest()['version']
+
+    @property
+    def text_version(self):
+        """Impronta dei soli testi (titoli + trame): è ciò da cui dipendono gli embedding"""
+        manifest = self.manifest()
+        return manifest.get('text_version', manifest['version'])
+
+    def clear(self):
+        # Il manifest per primo: senza di esso il catalogo non è più valido
+        if self.exists(): os.remove(self.manifest_path)
+
+    def write(self, df):
+        os.makedirs(self.path, exist_ok=True)
+        data_dir = f"data_{uuid.uuid4().hex[:12]}"
+        os.makedirs(os.path.join(self.path, data_dir))
+        manifest = {'dir': data_dir}
+        df = df.reset_index(drop=True)
+        # Impronta di ogni colonna salvata (nome + array), i testi anche a parte per gli embedding
+        version = hashlib.sha1()
+        text_version = hashlib.sha1()
+        categories = {}
+
+        def digest(col, *arrays, text=False):
+            for h in (version, text_version) if text else (version,):
+                h.update(col.encode() + b'\0')
+                for a in arrays:
+                    h.update(a if isinstance(a, bytes) else np.ascontiguousarray(a).tobytes())
+
+        for col in TEXT_COLUMNS:
+            encoded = [str(t).encode('utf-8', 'replace') for t in df[col]]
+            offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+            np.cumsum([len(e) for e in encoded], out=offsets[1:])
+            blob = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+            np.save(self._file(f"{col}_blob.npy", manifest), blob)
+            np.save(self._file(f"{col}_offsets.npy", manifest), offsets)
+            digest(col, blob, offsets, text=True)
+
+        for col in CATEGORICAL_COLUMNS:
+            cat = pd.Categorical(df[col].astype(object).where(df[col].notna(), None))
+            codes = cat.codes.astype(np.int32)
+            np.save(self._file(f"{col}_codes.npy", manifest), codes)
+            categories[col] = [str(c) for c in cat.categories]
+            digest(col, codes, '\0'.join(categories[col]).encode('utf-8', 'replace'))
+
+        for col in NUMERIC_COLUMNS:
+            values = pd.to_numeric(df[col], errors='coerce').fillna(0).to_numpy(np.float32)
+            np.save(self._file(f"{col}.npy", manifest), values)
+            digest(col, values)
+
+        manifest.update({'rows': len(df), 'version': version.hexdigest()[:16],
+                         'text_version': text_version.hexdigest()[:16], 'categories': categories})
+        # Manifest su file temporaneo + rename: il catalogo passa alla nuova cartella in un colpo solo
+        tmp = f"{self.manifest_path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(tmp, self.manifest_path)
+        self._drop_old_data(data_dir)
+
+    def _drop_old_data(self, keep):
+        """
+        Cancella le cartelle dei cataloghi precedenti (e i file del vecchio formato). Chi li ha
+        ancora in memory-map continua a leggerli; dove il sistema lo impedisce (Windows) restano
+        e vengono tolti alla prossima scrittura.
+        """
+        for name in os.listdir(self.path):
+            path = os.path.join(self.path, name)
+            if name.startswith("data_") and name != keep:
+                shutil.rmtree(path, ignore_errors=True)
+            elif name.endswith(".npy"):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def text_column(self, col, manifest=None):
+        manifest = manifest if manifest is not None else self.manifest()
+        return LazyTextColumn(self._file(f"{col}_blob.npy", manifest), self._file(f"{col}_offsets.npy", manifest))
+
+    def read(self, columns=None):
+        """DataFrame con le sole colonne richieste (tutte se None)"""
+        manifest = self.manifest()
+        columns = columns or TEXT_COLUMNS + CATEGORICAL_COLUMNS + NUMERIC_COLUMNS
+        data = {}
+        for col in columns:
+            if col in TEXT_COLUMNS:
+                data[col] = self.text_column(col, manifest).to_list()
+            elif col in CATEGORICAL_COLUMNS:
+                codes = np.load(self._file(f"{col}_codes.npy", manifest))
+                data[col] = pd.Categorical.from_codes(codes, categories=manifest['categories'][col])
+            elif col in NUMERIC_COLUMNS:
+                data[col] = np.load(self._file(f"{col}.npy", manifest))
+            else:
+                raise KeyError(f"Colonna sconosciuta: {col}")
+        return pd.DataFrame(data, columns=columns)
@@ -1,20 +1,60 @@
 import pandas as pd
 import os
 import glob
-import kagglehub
+import json
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+from src.parallel import run_isolated
+from .columnar import ColumnarCatalog
+
+COLUMNS = ['title', 'overview', 'genres', 'type', 'source', 'vote_average']
+
+
+def file_fingerprint(path):
+    """Impronta economica di un file sorgente (dimensione + data di modifica)"""
+    st = os.stat(path)
+    return f"{st.st_size}-{st.st_mtime_ns}"
+
+
+def _build_partition_job(ingestor, kind, arg):
+    """Eseguito nei processi worker: ricostruisce una partizione (Kaggle o custom)"""
+    if kind == 'kaggle':
+        return ingestor._build_kaggle_partition(arg)
+    return ingestor._build_custom_partition(arg)
+
+
+def _build_partitions_pool(ingestor, jobs, workers):
+    """Eseguito nel processo isolato (src.parallel): pool 'spawn' esplicito, uguale su ogni piattaforma"""
+    built = {}
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context('spawn')) as pool:
+        futures = {name: pool.submit(_build_partition_job, ingestor, kind, arg) for name, kind, arg in jobs}
+        for name, fut in futures.items():
+            try:
+                built[name] = fut.result()
+            except Exception as e:
+                print(f"⚠️ Errore {name}: {e}")
+                built[name] = None
+    return built
 
 
 class DataIngestor:
-    def __init__(self):
+    def __init__(self, workers=None):
+        # Processi per leggere/normalizzare le sorgenti in parallelo (1 = seriale, None = tutti i core)
+        self.workers = workers or os.cpu_count() or 1
+
         # Cartelle
         self.cache_dir = "cache"
         self.custom_dir = "custom_datasets"  # Nuova cartella sorgente
+        # Una partizione normalizzata per sorgente (Kaggle o CSV custom)
+        self.partition_dir = os.path.join(self.cache_dir, "partitions")
 
         # Creazione automatica
         os.makedirs(self.cache_dir, exist_ok=True)
         os.makedirs(self.custom_dir, exist_ok=True)
+        os.makedirs(self.partition_dir, exist_ok=True)
 
-        self.cache_path = os.path.join(self.cache_dir, "movies_data.pkl")
+        # Catalogo unito in formato colonnare (categorie + testi in memory-map)
+        self.catalog = ColumnarCatalog(os.path.join(self.cache_dir, "catalog"))
 
         self.datasets = {
             'imdb_mov': "rounakbanik/the-movies-dataset",
@@ -27,160 +67,288 @@ class DataIngestor:
             'wiki': "jrobischon/wikipedia-movie-plots"
         }
 
+        # Nome del CSV da cercare dentro ogni dataset Kaggle
+        self.dataset_files = {
+            'imdb_mov': "movies_metadata.csv",
+            'netflix': "netflix_titles.csv",
+            'imdb_tv': "*.csv",
+            'amazon': "amazon_prime_titles.csv",
+            'rt': "rotten_tomatoes_movies.csv",
+            'disney': "disney_plus_titles.csv",
+            'hulu': "hulu_titles.csv",
+            'wiki': "wiki_movie_plots_deduped.csv"
+        }
+
     def _find_csv(self, path, pattern):
         files = glob.glob(os.path.join(path, "**", pattern), recursive=True)
         return files[0] if files else None
 
-    def load_custom_data(self):
-        """Carica tutti i CSV presenti nella cartella custom_datasets"""
-        custom_frames = []
+    def _custom_files(self):
         if not os.path.exists(self.custom_dir): return []
+        return sorted(glob.glob(os.path.join(self.custom_dir, "*.csv")))
 
-        # Cerca tutti i file .csv
-        csv_files = glob.glob(os.path.join(self.custom_dir, "*.csv"))
+    @staticmethod
+    def _partition_name(f):
+        return f"custom_{os.path.basename(f)}"
 
-        for f in csv_files:
-            try:
-                print(f"📂 Trovato Dataset Custom: {f}")
-                df = pd.read_csv(f)
+    # --- NORMALIZZAZIONE DELLE SINGOLE SORGENTI ---
 
-                # Ci aspettiamo che il file sia già stato normalizzato dalla UI (title, overview, etc.)
-                # Se mancano colonne essenziali, le saltiamo o riempiamo
-                if 'title' not in df.columns:
-                    print(f"⚠️ {f} ignorato: Manca colonna 'title'")
-                    continue
+    def _read_kaggle(self, key, f):
+        """Legge e normalizza il CSV di un dataset Kaggle"""
+        df = None
 
-                if 'overview' not in df.columns: df['overview'] = ''
-                if 'genres' not in df.columns: df['genres'] = 'Custom'
-                if 'vote_average' not in df.columns: df['vote_average'] = 0
+        if key == 'imdb_mov':
+            df = pd.read_csv(f, low_memory=False)
+            df = df[['title', 'overview', 'genres', 'vote_average']].copy()
+            df['type'] = 'Movie';
+            df['source'] = 'IMDb Movie'
+            try:
+                # "[{'id': 16, 'name': 'Animation'}, ...]" -> "Animation|..." con operazioni vettoriali
+                df['genres'] = df['genres'].fillna('').astype(str).str.findall(r"'name': '([^']*)'").str.join("|")
+            except:
+                df['genres'] = "Unknown"
+
+        elif key == 'wiki':
+            df = pd.read_csv(f)
+            df = df.rename(columns={'Title': 'title', 'Plot': 'overview', 'Genre': 'genres'})
+            df['source'] = 'WikiArchive';
+            df['type'] = 'Movie';
+            df['vote_average'] = 0
+
+        elif key == 'netflix':
+            df = pd.read_csv(f)
+            df = df.rename(columns={'description': 'overview', 'listed_in': 'genres'})
+            df['source'] = 'Netflix';
+            df['vote_average'] = 0
+
+        elif key == 'imdb_tv':
+            df = pd.read_csv(f)
+            cols = {c.lower(): c for c in df.columns}
+            df = df.rename(columns={cols.get('title', 'Title'): 'title',
+                                    cols.get('description', 'Description'): 'overview',
+                                    cols.get('genre', 'Genre'): 'genres',
+                                    cols.get('rating', 'Rating'): 'vote_average'})
+            if 'overview' not in df.columns and 'summary' in cols: df = df.rename(
+                columns={cols['summary']: 'overview'})
+            df['type'] = 'TV Show';
+            df['source'] = 'IMDb TV'
+
+        elif key == 'amazon':
+            df = pd.read_csv(f)
+            df = df.rename(columns={'description': 'overview', 'listed_in': 'genres'})
+            df['source'] = 'Amazon';
+            df['vote_average'] = 0
+
+        elif key == 'rt':
+            df = pd.read_csv(f)
+            df = df.rename(columns={'movie_title': 'title', 'movie_info': 'overview',
+                                    'tomatometer_rating': 'vote_average'})
+            df['source'] = 'Rotten Tomatoes';
+            df['type'] = 'Movie'
+
+        elif key == 'disney':
+            df = pd.read_csv(f)
+            df = df.rename(columns={'description': 'overview', 'listed_in': 'genres'})
+            df['source'] = 'Disney+';
+            df['vote_average'] = 0
+
+        elif key == 'hulu':
+            df = pd.read_csv(f)
+            df = df.rename(columns={'description': 'overview', 'listed_in': 'genres'})
+            df['source'] = 'Hulu';
+            df['vote_average'] = 0
+
+        if df is None: return None
+        available = [c for c in COLUMNS if c in df.columns]
+        return df[available]
+
+    def _read_custom(self, f):
+        """Legge un CSV della cartella custom_datasets"""
+        print(f"📂 Trovato Dataset Custom: {f}")
+        df = pd.read_csv(f)
+
+        # Ci aspettiamo che il file sia già stato normalizzato dalla UI (title, overview, etc.)
+        # Se mancano colonne essenziali, le saltiamo o riempiamo
+        if 'title' not in df.columns:
+            print(f"⚠️ {f} ignorato: Manca colonna 'title'")
+            return None
+
+        if 'overview' not in df.columns: df['overview'] = ''
+        if 'genres' not in df.columns: df['genres'] = 'Custom'
+        if 'vote_average' not in df.columns: df['vote_average'] = 0
+
+        df['source'] = f"Custom ({os.path.basename(f)})"
+        df['type'] = 'Custom'
+
+        # Aggiungi colonne mancanti vuote per compatibilità
+        for c in COLUMNS:
+            if c not in df.columns: df[c] = None
+
+        # Seleziona solo colonne utili
+        return df[COLUMNS]
+
+    @staticmethod
+    def _clean(df):
+        """Pulizia riga per riga (fatta per partizione, così il merge resta economico)"""
+        for c in COLUMNS:
+            if c not in df.columns: df[c] = None
+        df = df[COLUMNS].dropna(subset=['title', 'overview']).copy()
+        df['title'] = df['title'].astype(str)
+        df['overview'] = df['overview'].astype(str)
+        df = df[df['overview'].str.len() > 10].copy()
+        df['vote_average'] = pd.to_numeric(df['vote_average'], errors='coerce').fillna(0)
+        return df.reset_index(drop=True)
+
+    # --- PARTIZIONI IN CACHE ---
+
+    def _partition_paths(self, name):
+        base = os.path.join(self.partition_dir, name)
+        return f"{base}.pkl", f"{base}.json"
+
+    def _load_partition(self, name):
+        """Partizione in cache se il file sorgente non è cambiato, altrimenti None"""
+        data_path, manifest_path = self._partition_paths(name)
+        if not (os.path.exists(data_path) and os.path.exists(manifest_path)): return None
+        try:
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+            src = manifest['source_file']
+            if not os.path.exists(src) or file_fingerprint(src) != manifest['fingerprint']: return None
+            return pd.read_pickle(data_path)
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _save_partition(self, name, df, src):
+        data_path, manifest_path = self._partition_paths(name)
+        df.to_pickle(data_path)
+        # Manifest per ultimo: senza di esso la partizione non è valida
+        with open(manifest_path, 'w') as f:
+            json.dump({'source_file': os.path.abspath(src), 'fingerprint': file_fingerprint(src),
+                       'rows': len(df)}, f)
+
+    def _build_kaggle_partition(self, key):
+        # Importato solo quando serve scaricare (i CSV custom non ne hanno bisogno)
+        import kagglehub
+        path = kagglehub.dataset_download(self.datasets[key])
+        f = self._find_csv(path, self.dataset_files[key])
+        df = self._read_kaggle(key, f)
+        if df is None: return None
+        df = self._clean(df)
+        self._save_partition(key, df, f)
+        return df
+
+    def _build_custom_partition(self, f):
+        df = self._read_custom(f)
+        if df is None: return None
+        df = self._clean(df)
+        self._save_partition(self._partition_name(f), df, f)
+        return df
+
+    def _drop_stale_partitions(self, active):
+        """Elimina le partizioni di sorgenti non più presenti (es. CSV custom cancellati)"""
+        for p in glob.glob(os.path.join(self.partition_dir, "*.json")):
+            name = os.path.basename(p)[:-len(".json")]
+            if name not in active:
+                for path in self._partition_paths(name):
+                    if os.path.exists(path): os.remove(path)
+                print(f"🗑️ Partizione rimossa: {name}")
+
+    def _build_partitions(self, jobs):
+        """
+        Ricostruisce le partizioni vecchie, in parallelo su un pool di processi se possibile.
+        jobs: lista di (nome, tipo, argomento). Restituisce {nome: df o None}.
+        """
+        if self.workers > 1 and len(jobs) > 1:
+            workers = min(self.workers, len(jobs))
+            print(f"⚙️ Ricostruzione di {len(jobs)} partizioni su {workers} processi...")
+            # Da un interprete pulito: sotto Streamlit i worker ri-eseguirebbero app.py
+            try:
+                return run_isolated(_build_partitions_pool, self, jobs, workers)
+            except Exception as e:
+                print(f"⚠️ Pool di processi non disponibile ({e}): ricostruzione in serie")
 
-                df['source'] = f"Custom ({os.path.basename(f)})"
-                df['type'] = 'Custom'
+        built = {}
+        for name, kind, arg in jobs:
+            try:
+                built[name] = _build_partition_job(self, kind, arg)
+            except Exception as e:
+                print(f"⚠️ Errore {name}: {e}")
+                built[name] = None
+        return built
 
-                # Seleziona solo colonne utili
-                cols = ['title', 'overview', 'genres', 'type', 'source', 'vote_average']
-                # Aggiungi colonne mancanti vuote per compatibilità
-                for c in cols:
-                    if c not in df.columns: df[c] = None
+    def load_custom_data(self):
+        """Carica tutti i CSV presenti nella cartella custom_datasets (una partizione per file)"""
+        return [df for df in self._load_sources(kaggle=False) if df is not None]
 
-                custom_frames.append(df[cols])
-                print(f"✅ Caricato Custom: {len(df)} righe")
+    def _load_sources(self, kaggle=True):
+        """Partizioni in cache dove valide, le altre ricostruite (in parallelo); ordine stabile"""
+        sources = [(key, 'kaggle', key) for key in self.datasets] if kaggle else []
+        sources += [(self._partition_name(f), 'custom', f) for f in self._custom_files()]
 
+        frames = {}
+        jobs = []
+        for name, kind, arg in sources:
+            try:
+                frames[name] = self._load_partition(name)
             except Exception as e:
-                print(f"❌ Errore caricamento {f}: {e}")
+                print(f"⚠️ Errore {name}: {e}")
+                frames[name] = None
 
-        return custom_frames
+            if frames[name] is None:
+                print(f"⬇️ Partizione {name} assente o vecchia: ricostruzione...")
+                jobs.append((name, kind, arg))
+            else:
+                print(f"⚡ Partizione {name} in cache")
 
-    def load_all(self):
-        # 1. CONTROLLO CACHE
-        if os.path.exists(self.cache_path):
-            print(f"⚡ CACHE TROVATA: Carico dati da {self.cache_path}...")
-            return pd.read_pickle(self.cache_path)
+        frames.update(self._build_partitions(jobs))
 
-        print("⬇️ NESSUNA CACHE. SCARICAMENTO DATASETS...")
-        frames = []
+        for name, df in frames.items():
+            if df is not None: print(f"✅ OK: {name} ({len(df)} righe)")
+        return [frames[name] for name, _, _ in sources]
 
-        # A. Caricamento Dataset Kaggle (Standard)
-        for key, slug in self.datasets.items():
-            try:
-                path = kagglehub.dataset_download(slug)
-                df = None
-
-                if key == 'imdb_mov':
-                    f = self._find_csv(path, "movies_metadata.csv")
-                    df = pd.read_csv(f, low_memory=False)
-                    df = df[['title', 'overview', 'genres', 'vote_average']].copy()
-                    df['type'] = 'Movie';
-                    df['source'] = 'IMDb Movie'
-                    try:
-                        df['genres'] = df['genres'].astype(str).apply(lambda x: "|".join(
-                            [y.split("'name': '")[1].split("'")[0] for y in x.split("},") if "'name': '" in y]))
-                    except:
-                        df['genres'] = "Unknown"
-
-                elif key == 'wiki':
-                    f = self._find_csv(path, "wiki_movie_plots_deduped.csv")
-                    df = pd.read_csv(f)
-                    df = df.rename(columns={'Title': 'title', 'Plot': 'overview', 'Genre': 'genres'})
-                    df['source'] = 'WikiArchive';
-                    df['type'] = 'Movie';
-                    df['vote_average'] = 0
-
-                elif key == 'netflix':
-                    f = self._find_csv(path, "netflix_titles.csv")
-                    df = pd.read_csv(f)
-                    df = df.rename(columns={'description': 'overview', 'listed_in': 'genres'})
-                    df['source'] = 'Netflix';
-                    df['vote_average'] = 0
-
-                elif key == 'imdb_tv':
-                    f = self._find_csv(path, "*.csv")
-                    df = pd.read_csv(f)
-                    cols = {c.lower(): c for c in df.columns}
-                    df = df.rename(columns={cols.get('title', 'Title'): 'title',
-                                            cols.get('description', 'Description'): 'overview',
-                                            cols.get('genre', 'Genre'): 'genres',
-                                            cols.get('rating', 'Rating'): 'vote_average'})
-                    if 'overview' not in df.columns and 'summary' in cols: df = df.rename(
-                        columns={cols['summary']: 'overview'})
-                    df['type'] = 'TV Show';
-                    df['source'] = 'IMDb TV'
-
-                elif key == 'amazon':
-                    f = self._find_csv(path, "amazon_prime_titles.csv")
-                    df = pd.read_csv(f)
-                    df = df.rename(columns={'description': 'overview', 'listed_in': 'genres'})
-                    df['source'] = 'Amazon';
-                    df['vote_average'] = 0
-
-                elif key == 'rt':
-                    f = self._find_csv(path, "rotten_tomatoes_movies.csv")
-                    df = pd.read_csv(f)
-                    df = df.rename(columns={'movie_title': 'title', 'movie_info': 'overview',
-                                            'tomatometer_rating': 'vote_average'})
-                    df['source'] = 'Rotten Tomatoes';
-                    df['type'] = 'Movie'
-
-                elif key == 'disney':
-                    f = self._find_csv(path, "disney_plus_titles.csv")
-                    df = pd.read_csv(f)
-                    df = df.rename(columns={'description': 'overview', 'listed_in': 'genres'})
-                    df['source'] = 'Disney+';
-                    df['vote_average'] = 0
-
-                elif key == 'hulu':
-                    f = self._find_csv(path, "hulu_titles.csv")
-                    df = pd.read_csv(f)
-                    df = df.rename(columns={'description': 'overview', 'listed_in': 'genres'})
-                    df['source'] = 'Hulu';
-                    df['vote_average'] = 0
-
-                if df is not None:
-                    cols = ['title', 'overview', 'genres', 'type', 'source', 'vote_average']
-                    available = [c for c in cols if c in df.columns]
-                    frames.append(df[available])
-                    print(f"✅ OK: {key} ({len(df)} righe)")
+    @staticmethod
+    def merge(frames):
+        """Unione delle partizioni: sono già pulite, resta solo la deduplica globale per titolo"""
+        return pd.concat(frames, ignore_index=True).drop_duplicates(subset=['title'])
 
-            except Exception as e:
-                print(f"⚠️ Errore {key}: {e}")
+    @property
+    def version(self):
+        """Impronta del catalogo unito (None se non ancora costruito)"""
+        return self.catalog.version if self.catalog.exists() else None
 
-        # B. Caricamento Dataset Custom (Utente)
-        custom_frames = self.load_custom_data()
-        frames.extend(custom_frames)
+    @property
+    def text_version(self):
+        """Impronta dei soli titoli + trame (chiave degli embedding), None se non ancora costruito"""
+        return self.catalog.text_version if self.catalog.exists() else None
 
-        print("🔗 Unione Dataset...")
-        df_final = pd.concat(frames, ignore_index=True)
+    def overviews(self):
+        """Trame in lettura pigra (memory-map): si decodificano solo quelle richieste"""
+        return self.catalog.text_column('overview')
+
+    def clear_cache(self):
+        """Invalida il catalogo unito (le partizioni restano e si riusano se ancora valide)"""
+        self.catalog.clear()
+
+    def load_all(self, columns=None):
+        # 1. CONTROLLO CACHE
+        if self.catalog.exists():
+            print(f"⚡ CACHE TROVATA: Carico colonne {columns or 'tutte'} da {self.catalog.path}...")
+            return self.catalog.read(columns)
 
-        # Pulizia Finale
-        df_final = df_final.dropna(subset=['title', 'overview'])
-        df_final['title'] = df_final['title'].astype(str)
-        df_final['overview'] = df_final['overview'].astype(str)
-        df_final = df_final[df_final['overview'].str.len() > 10]
-        df_final = df_final.drop_duplicates(subset=['title'])
-        df_final['vote_average'] = pd.to_numeric(df_final['vote_average'], errors='coerce').fillna(0)
+        print("🧩 NESSUNA CACHE UNITA. CONTROLLO PARTIZIONI...")
+
+        # A + B. Dataset Kaggle (Standard) e Custom (Utente): si riparsa solo ciò che è cambiato
+        frames = [df for df in self._load_sources() if df is not None]
+        if not frames:
+            raise RuntimeError("Nessuna sorgente caricata: controlla la connessione a Kaggle o i CSV custom")
+
+        self._drop_stale_partitions(set(self.datasets) | {self._partition_name(f) for f in self._custom_files()})
+
+        print("🔗 Unione Dataset...")
+        df_final = self.merge(frames)
 
-        print(f"💾 SALVATAGGIO CACHE IN {self.cache_path}...")
-        df_final.to_pickle(self.cache_path)
+        print(f"💾 SALVATAGGIO CACHE IN {self.catalog.path}...")
+        self.catalog.write(df_final)
 
         print(f"🎉 TOTALE: {len(df_final)} titoli.")
-        return df_final
\ No newline at end of file
+        return self.catalog.read(columns)
@@ -1,28 +1,31 @@
-import time
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import accuracy_score
 from .neural_nets import NeuralNetModel
 from .classic_models import RandomForestModel
+from .executor import BenchmarkExecutor
 
 
 class BenchmarkRunner:
-    def __init__(self, X, y):
-        self.X_train, self.X_test, self.y_train, self.y_test = train_test_split(X, y, test_size=0.2)
+    def __init__(self, X, y, rows=None, workers=None):
+        # Split scritto una volta su disco e condiviso dai processi del pool
+        self.executor = BenchmarkExecutor(X, y, rows=rows, workers=workers)
 
-    def run(self):
-        models = [
+    @staticmethod
+    def models():
+        return [
             ("NN (Simple)", NeuralNetModel(hidden_layers=(32,))),
             ("NN (Deep)", NeuralNetModel(hidden_layers=(128, 64))),
             ("Random Forest", RandomForestModel(n_trees=50))
         ]
 
-        results = []
-        for name, model_cls in models:
-            start = time.time()
-            model_cls.train(self.X_train, self.y_train)
-            duration = time.time() - start
+    @staticmethod
+    def _row(r):
+        return {"Model": r['name'], "Accuracy": r['accuracy'], "Time (s)": r['fit_s'],
+                "Predict (ms/sample)": r['predict_ms_per_sample'], "Single predict p50 (ms)": r['single_predict_p50_ms'],
+                "Peak RSS (MB)": r['peak_rss_mb'], "Size (MB)": r['model_size_mb']}
 
-            acc = accuracy_score(self.y_test, model_cls.predict(self.X_test))
-            results.append({"Model": name, "Accuracy": acc, "Time (s)": duration})
+    def iter_run(self):
+        """Risultati man mano che i modelli finiscono (per aggiornare la UI)"""
+        for r in self.executor.iter_results(self.models()):
+            yield self._row(r)
 
-        return results
\ No newline at end of file
+    def run(self):
+        return [self._row(r) for r in self.executor.run(self.models())]
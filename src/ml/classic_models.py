@@ -1,5 +1,7 @@
 from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import SGDClassifier
 from sklearn.tree import DecisionTreeClassifier
+from .streaming import StreamingTrainer
 
 
 class RandomForestModel:
@@ -10,4 +12,25 @@ class RandomForestModel:
         self.model.fit(X, y)
 
     def predict(self, X):
-        return self.model.predict(X)
\ No newline at end of file
+        return self.model.predict(X)
+
+
+class SGDModel:
+    """Classificatore lineare (regressione logistica con SGD): incrementale, adatto al training streaming"""
+
+    def __init__(self, alpha=1e-4):
+        self.model = SGDClassifier(loss='log_loss', alpha=alpha, random_state=42)
+
+    def train(self, X, y):
+        self.model.fit(X, y)
+
+    def partial_fit(self, X, y, classes=None):
+        self.model.partial_fit(X, y, classes=classes)
+
+    def train_stream(self, X, y, rows=None, epochs=5, batch_size=1024, eval_every=50, callback=None):
+        """Training a mini-batch dalle righe `rows` di X (anche memory-map), memoria limitata dal batch"""
+        trainer = StreamingTrainer(self, epochs=epochs, batch_size=batch_size, eval_every=eval_every)
+        return trainer.fit(X, y, rows=rows, callback=callback)
+
+    def predict(self, X):
+        return self.model.predict(X)
@@ -0,0 +1,154 @@
+import os
+import sys
+import time
+import pickle
+import shutil
+import tempfile
+import multiprocessing as mp
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from sklearn.model_selection import train_test_split
+from sklearn.metrics import accuracy_score
+from src.parallel import iter_isolated
+
+# Righe copiate per blocco quando si scrivono gli split su disco
+BLOCK_ROWS = 65536
+
+
+def _load(path):
+    """Split dal disco: memory-map per le matrici dense, CSR per quelle sparse (TF-IDF)"""
+    if path.endswith('.npz'): return sp.load_npz(path).tocsr()
+    return np.load(path, mmap_mode='r')
+
+
+def _peak_rss_mb():
+    """Picco di memoria residente del processo (None dove il modulo resource non esiste, es. Windows)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux restituisce KB, macOS byte
+    return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024
+
+
+def _init_worker(threads):
+    # Ogni processo usa pochi thread BLAS: il parallelismo lo dà il numero di processi
+    from threadpoolctl import threadpool_limits
+    threadpool_limits(threads)
+
+
+def _run_job(job):
+    """Eseguito nei processi worker: addestra un modello sugli split condivisi e lo misura"""
+    name, model, paths, latency_samples = job
+    X_train, X_test = _load(paths['X_train']), _load(paths['X_test'])
+    y_train, y_test = np.load(paths['y_train']), np.load(paths['y_test'])
+
+    # Wrapper del progetto (train/predict) oppure stimatori sklearn (fit/predict)
+    fit = model.train if hasattr(model, 'train') else model.fit
+    start = time.perf_counter()
+    fit(X_train, y_train)
+    fit_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    preds = model.predict(X_test)
+    predict_time = time.perf_counter() - start
+
+    # Latenza di una singola predizione (il caso della UI), non solo il costo medio nel batch
+    single = []
+    for i in range(min(latency_samples, X_test.shape[0])):
+        t = time.perf_counter()
+        model.predict(X_test[i:i + 1])
+        single.append(time.perf_counter() - t)
+
+    return {
+        'name': name,
+        'accuracy': float(accuracy_score(y_test, preds)),
+        'fit_s': fit_time,
+        'predict_ms_per_sample': 1000 * predict_time / max(1, X_test.shape[0]),
+        'single_predict_p50_ms': 1000 * float(np.median(single)) if single else None,
+        'peak_rss_mb': _peak_rss_mb(),
+        'model_size_mb': len(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL)) / 1024 ** 2,
+    }
+
+
+def _run_pool(jobs, workers, threads):
+    """Eseguito nel processo isolato (src.parallel): un worker nuovo per modello, risultati in ordine di arrivo"""
+    ctx = mp.get_context('spawn')
+    with ctx.Pool(workers, initializer=_init_worker, initargs=(threads,), maxtasksperchild=1) as pool:
+        yield from pool.imap_unordered(_run_job, jobs)
+
+
+class BenchmarkExecutor:
+    """
+    Benchmark di più modelli in parallelo su un pool di processi:
+    1. lo split train/test viene scritto UNA volta su disco (memory-map condiviso dai worker)
+    2. ogni modello gira in un processo nuovo (il picco di RSS è solo suo)
+    3. i risultati arrivano man mano che i modelli finiscono (iter_results)
+    Misure: accuratezza, tempo di fit, latenza di predizione per campione, picco RSS, dimensione del modello.
+    `rows` limita il benchmark a un sottoinsieme di righe senza copiare tutta la matrice.
+    """
+
+    def __init__(self, X, y, rows=None, test_size=0.2, workers=None, seed=42, latency_samples=50,
+                 cache_dir="cache"):
+        self.X = X
+        self.y = np.asarray(y)
+        self.rows = np.arange(X.shape[0]) if rows is None else np.asarray(rows, dtype=np.int64)
+        self.test_size = test_size
+        self.workers = workers or max(1, (os.cpu_count() or 2) // 2)
+        self.seed = seed
+        self.latency_samples = latency_samples
+        self.work_dir = os.path.join(cache_dir, "benchmark")
+
+    def _write_matrix(self, path, idx):
+        if sp.issparse(self.X):
+            path += ".npz"
+            sp.save_npz(path, sp.csr_matrix(self.X[idx]))
+            return path
+
+        path += ".npy"
+        out = np.lib.format.open_memmap(path, mode='w+', dtype=np.float32, shape=(len(idx), self.X.shape[1]))
+        for start in range(0, len(idx), BLOCK_ROWS):
+            out[start:start + BLOCK_ROWS] = self.X[idx[start:start + BLOCK_ROWS]]
+        out.flush()
+        return path
+
+    def _write_splits(self, split_dir):
+        """Split su disco (righe lette a blocchi) e etichette come codici interi"""
+        codes, _ = pd.factorize(self.y[self.rows])
+        train_pos, test_pos = train_test_split(np.arange(len(self.rows)), test_size=self.test_size,
+                                               random_state=self.seed)
+        paths = {
+            'X_train': self._write_matrix(os.path.join(split_dir, "X_train"), self.rows[train_pos]),
+            'X_test': self._write_matrix(os.path.join(split_dir, "X_test"), self.rows[test_pos]),
+            'y_train': os.path.join(split_dir, "y_train.npy"),
+            'y_test': os.path.join(split_dir, "y_test.npy"),
+        }
+        np.save(paths['y_train'], codes[train_pos].astype(np.int32))
+        np.save(paths['y_test'], codes[test_pos].astype(np.int32))
+        return paths
+
+    def iter_results(self, models):
+        """models: lista di (nome, modello non addestrato). Restituisce i risultati in ordine di arrivo."""
+        os.makedirs(self.work_dir, exist_ok=True)
+        split_dir = tempfile.mkdtemp(dir=self.work_dir)
+        try:
+            paths = self._write_splits(split_dir)
+            jobs = [(name, model, paths, self.latency_samples) for name, model in models]
+            workers = min(self.workers, len(jobs))
+            threads = max(1, (os.cpu_count() or 1) // max(1, workers))
+            print(f"🏁 BENCHMARK: {len(jobs)} modelli su {workers} processi ({len(self.rows)} righe)...")
+
+            # Pool avviato da un interprete pulito: sotto Streamlit i worker 'spawn' ri-eseguirebbero app.py,
+            # così il picco di RSS misura solo il modello e non un backend completo dell'app
+            for result in iter_isolated(_run_pool, jobs, workers, threads):
+                print(f"✅ {result['name']}: acc {result['accuracy']:.3f} in {result['fit_s']:.1f}s")
+                yield result
+        finally:
+            shutil.rmtree(split_dir, ignore_errors=True)
+
+    def run(self, models):
+        """Tutti i risultati, nell'ordine dei modelli in input"""
+        order = {name: i for i, (name, _) in enumerate(models)}
+        return sorted(self.iter_results(models), key=lambda r: order[r['name']])
@@ -1,4 +1,5 @@
 from sklearn.neural_network import MLPClassifier
+from .streaming import StreamingTrainer
 
 
 class NeuralNetModel:
@@ -14,5 +15,13 @@ class NeuralNetModel:
     def train(self, X, y):
         self.model.fit(X, y)
 
+    def partial_fit(self, X, y, classes=None):
+        self.model.partial_fit(X, y, classes=classes)
+
+    def train_stream(self, X, y, rows=None, epochs=5, batch_size=1024, eval_every=50, callback=None):
+        """Training a mini-batch dalle righe `rows` di X (anche memory-map), memoria limitata dal batch"""
+        trainer = StreamingTrainer(self, epochs=epochs, batch_size=batch_size, eval_every=eval_every)
+        return trainer.fit(X, y, rows=rows, callback=callback)
+
     def predict(self, X):
-        return self.model.predict(X)
\ No newline at end of file
+        return self.model.predict(X)
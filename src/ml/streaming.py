@@ -0,0 +1,94 @@
+import time
+import numpy as np
+
+
+def iter_batches(X, y, rows, batch_size=1024, shuffle=True, rng=None):
+    """
+    Mini-batch (X, y) lette direttamente da X (anche memory-map o CSR): in memoria c'è
+    solo il batch corrente. Dentro ogni batch le righe si leggono in ordine crescente
+    (accesso al file più sequenziale), l'ordine dei batch resta casuale.
+    """
+    rng = rng or np.random.default_rng()
+    order = rng.permutation(rows) if shuffle else rows
+    for start in range(0, len(order), batch_size):
+        ids = np.sort(order[start:start + batch_size])
+        Xb = X[ids]
+        yield (Xb if hasattr(Xb, 'toarray') else np.asarray(Xb, dtype=np.float32)), y[ids]
+
+
+class StreamingTrainer:
+    """
+    Addestramento out-of-core per modelli incrementali (partial_fit: MLP, SGD):
+    - le righe di train e di hold-out sono solo indici, la matrice non viene mai copiata
+    - ogni epoca rimescola l'ordine dei batch
+    - ogni `eval_every` batch si misura l'accuratezza sull'hold-out, anch'esso letto a batch
+    La memoria usata dipende da batch_size, non dalla dimensione del catalogo.
+    """
+
+    def __init__(self, model, epochs=5, batch_size=1024, eval_every=50, holdout=0.1, seed=42):
+        self.model = model
+        self.epochs = epochs
+        self.batch_size = batch_size
+        self.eval_every = eval_every
+        self.holdout = holdout
+        self.seed = seed
+        self.history = []
+
+    def split(self, n_rows, rows=None):
+        """(righe di train, righe di hold-out) come indici ordinati"""
+        rng = np.random.default_rng(self.seed)
+        rows = np.arange(n_rows) if rows is None else np.asarray(rows, dtype=np.int64)
+        perm = rng.permutation(rows)
+        n_holdout = max(1, int(len(rows) * self.holdout))
+        return np.sort(perm[n_holdout:]), np.sort(perm[:n_holdout])
+
+    def evaluate(self, X, y, rows):
+        """Accuratezza sulle righe indicate, calcolata a batch"""
+        correct = 0
+        for Xb, yb in iter_batches(X, y, rows, self.batch_size, shuffle=False):
+            correct += int((self.model.predict(Xb) == yb).sum())
+        return correct / max(1, len(rows))
+
+    def fit(self, X, y, rows=None, callback=None):
+        """
+        X: matrice (anche memory-map o CSR), y: etichette per riga di X, rows: righe da usare.
+        callback(record) riceve ogni valutazione sull'hold-out (es. per aggiornare la UI).
+        """
+        y = np.asarray(y)
+        train_rows, holdout_rows = self.split(X.shape[0], rows)
+        # Così ogni addestramento termina con almeno una valutazione sull'hold-out
+        if self.epochs < 1 or len(train_rows) == 0 or len(holdout_rows) == 0:
+            raise ValueError("Training streaming: servono almeno un'epoca e righe sia di train sia di hold-out")
+        classes = np.unique(y[np.concatenate([train_rows, holdout_rows])])
+        rng = np.random.default_rng(self.seed)
+
+        self.history = []
+        seen = batches = 0
+        start = time.perf_counter()
+        print(f"🌊 TRAINING STREAMING: {len(train_rows)} righe, {self.epochs} epoche, batch da {self.batch_size}")
+        for epoch in range(1, self.epochs + 1):
+            for Xb, yb in iter_batches(X, y, train_rows, self.batch_size, rng=rng):
+                self.model.partial_fit(Xb, yb, classes=classes)
+                seen += len(yb)
+                batches += 1
+
+                if batches % self.eval_every == 0:
+                    self._record(epoch, batches, seen, X, y, holdout_rows, start, callback)
+
+            # Una valutazione anche a fine epoca (se l'ultimo batch non l'ha appena fatta)
+            if not self.history or self.history[-1]['batches'] != batches:
+                self._record(epoch, batches, seen, X, y, holdout_rows, start, callback)
+
+        return self.history
+
+    def _record(self, epoch, batches, seen, X, y, holdout_rows, start, callback):
+        record = {
+            'epoch': epoch,
+            'batches': batches,
+            'samples_seen': seen,
+            'holdout_accuracy': self.evaluate(X, y, holdout_rows),
+            'elapsed_s': time.perf_counter() - start,
+        }
+        self.history.append(record)
+        print(f"   epoca {epoch} - batch {batches}: acc hold-out {record['holdout_accuracy']:.3f}")
+        if callback is not None: callback(record)
@@ -1,19 +1,16 @@
-import time
 from sklearn.neural_network import MLPClassifier
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.neighbors import KNeighborsClassifier
 from sklearn.tree import DecisionTreeClassifier
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import accuracy_score
+from src.ml.executor import BenchmarkExecutor
 
 
 class ModelBenchmark:
-    def __init__(self, embeddings, labels):
+    def __init__(self, embeddings, labels, rows=None, workers=None):
         self.X = embeddings
         self.y = labels
-        self.X_train, self.X_test, self.y_train, self.y_test = train_test_split(
-            self.X, self.y, test_size=0.2, random_state=42
-        )
+        # Stesso esecutore della Lab AI: modelli in parallelo su split condivisi in memory-map
+        self.executor = BenchmarkExecutor(self.X, self.y, rows=rows, workers=workers, seed=42)
 
     def run_benchmark(self):
         """Confronta diverse architetture"""
@@ -37,26 +34,16 @@ class ModelBenchmark:
         ]
 
         results = []
-        for entry in models:
-            name = entry["name"]
-            clf = entry["model"]
-
-            print(f"Testing {name}...")
-
-            # Misura Tempo Training
-            start_time = time.time()
-            clf.fit(self.X_train, self.y_train)
-            train_time = time.time() - start_time
-
-            # Misura Accuratezza
-            preds = clf.predict(self.X_test)
-            acc = accuracy_score(self.y_test, preds)
-
+        for r in self.executor.run([(entry["name"], entry["model"]) for entry in models]):
+            acc, train_time = r['accuracy'], r['fit_s']
             results.append({
-                "Modello": name,
+                "Modello": r['name'],
                 "Accuratezza": round(acc, 4),
                 "Tempo Training (sec)": round(train_time, 4),
-                "Efficienza (Acc/Time)": round(acc / (train_time + 0.001), 2)
+                "Efficienza (Acc/Time)": round(acc / (train_time + 0.001), 2),
+                "Predizione (ms/campione)": round(r['predict_ms_per_sample'], 4),
+                "Picco RSS (MB)": None if r['peak_rss_mb'] is None else round(r['peak_rss_mb'], 1),
+                "Dimensione Modello (MB)": round(r['model_size_mb'], 2)
             })
 
-        return results
\ No newline at end of file
+        return results
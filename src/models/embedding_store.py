@@ -0,0 +1,249 @@
+import os
+import json
+import time
+import uuid
+import hashlib
+import numpy as np
+import scipy.sparse as sp
+
+
+class EmbeddingStore:
+    """
+    Archivio degli embedding in cache/embeddings/, indicizzato per contenuto:
+    la chiave unisce metodo, modello e impronta del catalogo (testi in ordine),
+    quindi un catalogo diverso della stessa lunghezza non riusa vettori vecchi.
+    La matrice si apre in memory-map sola lettura: avvio immediato, pagine caricate
+    su richiesta e condivise (page cache) tra più processi dell'app.
+    Le matrici sparse (TF-IDF) si salvano in CSR (.npz) e non vengono mai densificate.
+    A ogni salvataggio restano solo le MAX_ENTRIES voci più recenti dello stesso metodo/modello.
+    """
+
+    # Cataloghi (impronte) tenuti per metodo/modello: i più vecchi vengono cancellati
+    MAX_ENTRIES = 3
+
+    def __init__(self, cache_dir="cache", method='bert', model_name='all-MiniLM-L6-v2'):
+        self.method = method
+        self.model_name = model_name
+        self.store_dir = os.path.join(cache_dir, "embeddings")
+        os.makedirs(self.store_dir, exist_ok=True)
+
+    @staticmethod
+    def fingerprint(text_list):
+        """Impronta sha1 dei testi in ordine"""
+        h = hashlib.sha1()
+        for t in text_list:
+            h.update(str(t).encode('utf-8', 'replace'))
+            h.update(b'\0')
+        return h.hexdigest()[:16]
+
+    def key(self, fingerprint):
+        model = self.model_name.replace('/', '_') if self.method != 'tfidf' else 'tfidf'
+        return f"{self.method}_{model}_{fingerprint}"
+
+    def paths(self, fingerprint, sparse=False):
+        base = os.path.join(self.store_dir, self.key(fingerprint))
+        return f"{base}.npz" if sparse else f"{base}.npy", f"{base}.json", f"{base}_titles.json"
+
+    def manifest(self, fingerprint):
+        _, manifest_path, _ = self.paths(fingerprint)
+        if not os.path.exists(manifest_path): return None
+        try:
+            with open(manifest_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def load(self, fingerprint):
+        """Matrice in memory-map (sola lettura) oppure None se assente/incoerente col manifest"""
+        manifest = self.manifest(fingerprint)
+        if manifest is None: return None
+        sparse = manifest.get('format') == 'csr'
+        data_path, _, _ = self.paths(fingerprint, sparse)
+        if not os.path.exists(data_path): return None
+
+        try:
+            data = sp.load_npz(data_path).tocsr() if sparse else np.load(data_path, mmap_mode='r')
+        except (OSError, ValueError):
+            return None
+
+        if (list(data.shape) != [manifest['rows'], manifest['dim']]
+                or str(data.dtype) != manifest['dtype']):
+            print(f"⚠️ Embedding store incoerente: {data_path}")
+            return None
+        return data
+
+    def titles(self, fingerprint):
+        """Mappa riga -> titolo salvata insieme agli embedding"""
+        _, _, titles_path = self.paths(fingerprint)
+        if not os.path.exists(titles_path): return None
+        with open(titles_path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def save(self, embeddings, fingerprint, titles=None):
+        sparse = sp.issparse(embeddings)
+        data_path, manifest_path, titles_path = self.paths(fingerprint, sparse)
+        embeddings = sp.csr_matrix(embeddings) if sparse else np.ascontiguousarray(embeddings)
+
+        # File temporaneo + rename: gli altri processi non vedono mai un file a metà
+        with open(data_path + ".tmp", 'wb') as f:
+            if sparse:
+                sp.save_npz(f, embeddings)
+            else:
+                np.save(f, embeddings)
+        os.replace(data_path + ".tmp", data_path)
+
+        if titles is not None:
+            with open(titles_path, 'w', encoding='utf-8') as f:
+                json.dump([str(t) for t in titles], f, ensure_ascii=False)
+
+        # Il manifest si scrive per ultimo: se manca, la voce non è valida
+        with open(manifest_path, 'w') as f:
+            json.dump({
+                'method': self.method,
+                'model': self.model_name,
+                'fingerprint': fingerprint,
+                'format': 'csr' if sparse else 'dense',
+                'dtype': str(embeddings.dtype),
+                'rows': int(embeddings.shape[0]),
+                'dim': int(embeddings.shape[1]),
+                'titles_file': os.path.basename(titles_path) if titles is not None else None,
+            }, f, indent=2)
+
+        self.prune()
+
+    def entries(self):
+        """(istante di salvataggio, impronta, sparsa?) delle voci di questo metodo/modello"""
+        out = []
+        for name in os.listdir(self.store_dir):
+            if not name.endswith('.json') or name.endswith('_titles.json'): continue
+            path = os.path.join(self.store_dir, name)
+            try:
+                with open(path) as f:
+                    manifest = json.load(f)
+                saved = os.path.getmtime(path)
+            except (OSError, ValueError):
+                continue
+            if manifest.get('method') != self.method or manifest.get('model') != self.model_name: continue
+            out.append((saved, manifest['fingerprint'], manifest.get('format') == 'csr'))
+        return sorted(out, reverse=True)
+
+    def prune(self, keep=None):
+        """Cancella le voci oltre le `keep` più recenti (default MAX_ENTRIES); restituisce le impronte tolte"""
+        keep = self.MAX_ENTRIES if keep is None else keep
+        removed = []
+        for _, fingerprint, sparse in self.entries()[keep:]:
+            data_path, manifest_path, titles_path = self.paths(fingerprint, sparse)
+            # Il manifest per primo: senza di esso la voce non è più valida
+            for path in (manifest_path, data_path, titles_path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    # Mai esistito, già rimosso da un altro processo o ancora aperto (Windows)
+                    pass
+            removed.append(fingerprint)
+        if removed: print(f"🧹 Embedding store: rimosse {len(removed)} versioni vecchie ({self.method})")
+        return removed
+
+
+class TextEmbeddingCache:
+    """
+    Cache incrementale per singolo testo: chiave = sha1(modello + testo).
+    Ogni calcolo aggiunge uno "shard" (chiavi + vettori .npy) in cache/embeddings/texts_*/,
+    così dopo un CSV custom si codificano solo i testi nuovi o modificati.
+    """
+
+    # Oltre questo numero di shard li riuniamo in uno solo
+    MAX_SHARDS = 16
+
+    def __init__(self, cache_dir="cache", method='bert', model_name='all-MiniLM-L6-v2'):
+        self.model_key = f"{method}|{model_name}"
+        slug = f"{method}_{model_name.replace('/', '_')}"
+        self.shard_dir = os.path.join(cache_dir, "embeddings", f"texts_{slug}")
+        os.makedirs(self.shard_dir, exist_ok=True)
+        self._load_index()
+
+    def _shard_names(self):
+        names = [f[:-len("_keys.npy")] for f in os.listdir(self.shard_dir) if f.endswith("_keys.npy")]
+        # Uno shard è valido solo se ha anche i vettori
+        return sorted(n for n in names if os.path.exists(os.path.join(self.shard_dir, f"{n}_vecs.npy")))
+
+    def _load_index(self):
+        self.shards = []  # Vettori (memory-map) di ogni shard
+        self.index = {}  # chiave -> (shard, riga)
+        for s, name in enumerate(self._shard_names()):
+            keys = np.load(os.path.join(self.shard_dir, f"{name}_keys.npy"))
+            self.shards.append(np.load(os.path.join(self.shard_dir, f"{name}_vecs.npy"), mmap_mode='r'))
+            for row, k in enumerate(keys):
+                self.index[k] = (s, row)
+
+    @property
+    def dim(self):
+        return self.shards[0].shape[1] if self.shards else None
+
+    def keys(self, text_list):
+        return np.array([hashlib.sha1(f"{self.model_key}\0{t}".encode('utf-8', 'replace')).hexdigest().encode()
+                         for t in text_list], dtype='S40')
+
+    def missing(self, keys):
+        """Posizioni delle chiavi non ancora in cache"""
+        return np.array([i for i, k in enumerate(keys) if k not in self.index], dtype=np.int64)
+
+    @staticmethod
+    def _new_name():
+        # Nome unico anche tra processi e dopo una compattazione (tempo crescente + uuid)
+        return f"shard_{time.time_ns():020d}_{uuid.uuid4().hex[:8]}"
+
+    def _write(self, name, suffix, array):
+        """Scrittura atomica: file temporaneo unico + os.replace, chi legge vede il file intero o niente"""
+        path = os.path.join(self.shard_dir, name + suffix)
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, 'wb') as f:
+            np.save(f, array)
+        os.replace(tmp, path)
+
+    def add(self, keys, vectors):
+        """Salva un nuovo shard con i vettori appena calcolati"""
+        if len(keys) == 0: return
+        name = self._new_name()
+        self._write(name, "_vecs.npy", np.asarray(vectors, dtype=np.float32))
+        # Le chiavi per ultime: senza di esse lo shard viene ignorato
+        self._write(name, "_keys.npy", np.asarray(keys, dtype='S40'))
+
+        if len(self._shard_names()) > self.MAX_SHARDS:
+            self.compact()
+        else:
+            self._load_index()
+
+    def assemble(self, keys):
+        """Matrice (len(keys) x dim) costruita dalla cache; tutte le chiavi devono essere presenti"""
+        out = np.empty((len(keys), self.dim), dtype=np.float32)
+        loc = np.array([self.index[k] for k in keys], dtype=np.int64).reshape(-1, 2)
+        for s, vecs in enumerate(self.shards):
+            sel = np.flatnonzero(loc[:, 0] == s)
+            if len(sel):
+                out[sel] = vecs[loc[sel, 1]]
+        return out
+
+    def compact(self):
+        """Riunisce tutti gli shard in uno solo (togliendo i duplicati)"""
+        self._load_index()
+        if not self.index: return
+        old = self._shard_names()
+        keys = np.array(list(self.index.keys()), dtype='S40')
+        vectors = self.assemble(keys)
+
+        name = self._new_name()
+        self._write(name, "_vecs.npy", vectors)
+        self._write(name, "_keys.npy", keys)
+        # Chiudiamo i nostri memory-map prima di cancellare i vecchi shard
+        self.shards = []
+        self.index = {}
+        for n in old:
+            for suffix in ("_keys.npy", "_vecs.npy"):
+                try:
+                    os.remove(os.path.join(self.shard_dir, n + suffix))
+                except OSError:
+                    # Già rimosso da un altro processo, o ancora aperto altrove (Windows):
+                    # resta un duplicato innocuo, tolto alla prossima compattazione
+                    pass
+        self._load_index()
@@ -2,16 +2,23 @@ import numpy as np
 import torch
 import os
 from sklearn.feature_extraction.text import TfidfVectorizer
+from .embedding_store import EmbeddingStore, TextEmbeddingCache
+from .encoding import CpuEncodingPipeline
 
 
 class EmbeddingGenerator:
-    def __init__(self, method='bert', model_name='all-MiniLM-L6-v2'):
+    # Sotto questa soglia il pool di processi costa più di quanto fa risparmiare
+    MIN_TEXTS_FOR_POOL = 2000
+
+    def __init__(self, method='bert', model_name='all-MiniLM-L6-v2', cpu_workers=None):
+        """method: 'bert', 'bert-int8' (transformer quantizzato int8, solo CPU) oppure 'tfidf'"""
         self.method = method
+        self.model_name = model_name
         self.model = None
         self.vectorizer = None
 
-        # LOGICA GPU AVANZATA
-        if torch.cuda.is_available():
+        # LOGICA GPU AVANZATA (il modello int8 gira solo su CPU)
+        if torch.cuda.is_available() and method != 'bert-int8':
             self.device = 'cuda'
             gpu_name = torch.cuda.get_device_name(0)
             print(f"🚀 GPU RILEVATA: {gpu_name} (Modalità Turbo Attiva)")
@@ -19,46 +26,97 @@ class EmbeddingGenerator:
             self.device = 'cpu'
             print("⚠️ GPU NON RILEVATA: Uso CPU (Più lento)")
 
-        # Creazione cartella Cache
+        # Creazione cartella Cache (archivio indicizzato per catalogo + modello + metodo)
         self.cache_dir = "cache"
         os.makedirs(self.cache_dir, exist_ok=True)
-        self.cache_path = os.path.join(self.cache_dir, f"embeddings_{method}.npy")
+        self.store = EmbeddingStore(self.cache_dir, method=method, model_name=model_name)
+        # Chiave dell'archivio degli embedding caricati (cambia quando vengono ricalcolati)
+        self.version = None
+        # Cache per singolo testo (solo BERT: il TF-IDF dipende dal vocabolario di tutto il corpus)
+        self.text_cache = None
 
-        if self.method == 'bert':
-            from sentence_transformers import SentenceTransformer
-            self.model = SentenceTransformer(model_name, device=self.device)
+        if self.method in ('bert', 'bert-int8'):
+            if self.method == 'bert-int8':
+                from src.nlp.quantization import load_quantized
+                self.model = load_quantized(model_name, self.cache_dir)
+            else:
+                from sentence_transformers import SentenceTransformer
+                self.model = SentenceTransformer(model_name, device=self.device)
+            # Senza GPU: batch per lunghezza in token su più processi (cpu_workers=1 lo disattiva)
+            self.cpu_pipeline = None
+            if self.device == 'cpu' and cpu_workers != 1:
+                self.cpu_pipeline = CpuEncodingPipeline(model_name, workers=cpu_workers,
+                                                        quantize=self.method == 'bert-int8',
+                                                        cache_dir=self.cache_dir)
+            self.text_cache = TextEmbeddingCache(self.cache_dir, method=method, model_name=model_name)
         elif self.method == 'tfidf':
-            self.vectorizer = TfidfVectorizer(stop_words='english', max_features=5000)
-
-    def fit_transform(self, text_list):
-        # 1. CONTROLLO CACHE
-        if os.path.exists(self.cache_path):
-            try:
-                data = np.load(self.cache_path)
-                if len(data) == len(text_list):
-                    print(f"⚡ EMBEDDINGS CACHED: {self.cache_path}")
-                    return data
-            except:
-                pass
+            self.vectorizer = TfidfVectorizer(stop_words='english', max_features=5000, dtype=np.float32)
+
+    def load_cached(self, fingerprint):
+        """Embedding già in archivio per questa impronta di catalogo (memory-map), altrimenti None"""
+        if fingerprint is None: return None
+        data = self.store.load(fingerprint)
+        if data is not None:
+            print(f"⚡ EMBEDDINGS CACHED (memory-map): {self.store.paths(fingerprint)[0]}")
+            self.version = self.store.key(fingerprint)
+        return data
 
+    def fit_transform(self, text_list, titles=None, fingerprint=None):
         if not text_list: return None
-        print(f"🔥 INIZIO CALCOLO SU {self.device.upper()} ({len(text_list)} film)...")
+
+        # 1. CONTROLLO CACHE (stesso catalogo, stesso modello, stesso metodo)
+        # L'impronta può arrivare dal catalogo (DataIngestor.version), altrimenti dai testi
+        fingerprint = fingerprint or self.store.fingerprint(text_list)
+        data = self.load_cached(fingerprint)
+        if data is not None:
+            return data
 
         embeddings = None
-        if self.method == 'bert':
-            # Batch size più alto per la tua RTX (sfrutta la VRAM)
-            embeddings = self.model.encode(
-                text_list,
-                show_progress_bar=True,
-                batch_size=128,  # Aumentato per la tua GPU
-                convert_to_numpy=True
-            )
+        if self.method in ('bert', 'bert-int8'):
+            # Solo i testi mai visti (o modificati) passano dal modello, il resto arriva dalla cache
+            keys = self.text_cache.keys(text_list)
+            missing = self.text_cache.missing(keys)
+            if len(missing):
+                new_keys, first = np.unique(keys[missing], return_index=True)
+                new_texts = [text_list[i] for i in missing[first]]
+                print(f"🔥 INIZIO CALCOLO SU {self.device.upper()} ({len(new_texts)} nuovi su {len(text_list)} film)...")
+                self.text_cache.add(new_keys, self._encode(new_texts))
+            else:
+                print(f"⚡ TUTTI I {len(text_list)} TESTI GIÀ IN CACHE")
+            embeddings = self.text_cache.assemble(keys)
 
         elif self.method == 'tfidf':
-            embeddings = self.vectorizer.fit_transform(text_list).toarray()
+            print(f"🔥 INIZIO CALCOLO SU {self.device.upper()} ({len(text_list)} film)...")
+            # Resta CSR: la versione densa di 5000 feature su tutto il catalogo occupa GB
+            embeddings = self.vectorizer.fit_transform(text_list)
 
-        # 2. SALVATAGGIO
+        # 2. SALVATAGGIO (e riapertura in memory-map, condivisa con gli altri processi)
         if embeddings is not None:
-            np.save(self.cache_path, embeddings)
+            self.store.save(embeddings, fingerprint, titles=titles)
+            self.version = self.store.key(fingerprint)
+            return self.store.load(fingerprint)
+
+        return embeddings
+
+    def drift_report(self, sample_texts, k=10):
+        """Solo 'bert-int8': drift degli embedding e overlap delle raccomandazioni rispetto al float32"""
+        if self.method != 'bert-int8':
+            raise ValueError("drift_report richiede method='bert-int8'")
+        from sentence_transformers import SentenceTransformer
+        from src.nlp.quantization import drift_report
+        reference = SentenceTransformer(self.model_name, device='cpu')
+        return drift_report(reference, self.model, list(sample_texts), k=k)
+
+    def _encode(self, text_list):
+        if self.cpu_pipeline is not None and len(text_list) >= self.MIN_TEXTS_FOR_POOL:
+            return self.cpu_pipeline.encode(text_list, tokenizer=self.model.tokenizer,
+                                            dim=self.model.get_sentence_embedding_dimension(),
+                                            max_length=self.model.max_seq_length)
 
-        return embeddings
\ No newline at end of file
+        # Batch size più alto per la tua RTX (sfrutta la VRAM)
+        return self.model.encode(
+            text_list,
+            show_progress_bar=True,
+            batch_size=128,  # Aumentato per la tua GPU
+            convert_to_numpy=True
+        )
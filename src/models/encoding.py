@@ -0,0 +1,113 @@
+import os
+import time
+import multiprocessing as mp
+import numpy as np
+from src.parallel import run_isolated
+
+# Modello caricato una volta per processo worker
+_worker_model = None
+
+
+def _init_worker(model_name, torch_threads, quantize=False, cache_dir="cache", loader=None):
+    global _worker_model
+    if loader is not None:
+        # Modello alternativo (es. un finto encoder nei test)
+        _worker_model = loader(model_name)
+        return
+
+    import torch
+    from sentence_transformers import SentenceTransformer
+    # Ogni processo usa pochi thread: il parallelismo lo dà il numero di processi
+    torch.set_num_threads(torch_threads)
+    if quantize:
+        from src.nlp.quantization import load_quantized
+        _worker_model = load_quantized(model_name, cache_dir)
+    else:
+        _worker_model = SentenceTransformer(model_name, device='cpu')
+
+
+def _encode_batch(job):
+    ids, texts = job
+    vecs = _worker_model.encode(texts, batch_size=len(texts), show_progress_bar=False, convert_to_numpy=True)
+    return ids, vecs
+
+
+def _encode_jobs(jobs, n_texts, dim, workers, init_args, progress_every):
+    """Eseguito nel processo isolato: pool di worker e matrice dei risultati"""
+    start = time.time()
+    out = None if dim is None else np.empty((n_texts, dim), dtype=np.float32)
+    ctx = mp.get_context('spawn')  # torch non ama fork
+    with ctx.Pool(workers, initializer=_init_worker, initargs=init_args) as pool:
+        done = 0
+        for ids, vecs in pool.imap_unordered(_encode_batch, jobs):
+            if out is None:
+                out = np.empty((n_texts, vecs.shape[1]), dtype=np.float32)
+            out[ids] = vecs
+            done += len(ids)
+            if done % progress_every < len(ids):
+                print(f"   {done}/{n_texts} ({done / (time.time() - start):.0f} testi/s)")
+    return out
+
+
+class CpuEncodingPipeline:
+    """
+    Encoding su CPU senza GPU:
+    1. i testi vengono ordinati per numero di token e divisi in batch di lunghezza simile
+       (poco padding: le trame corte di Netflix non si allungano fino a quelle di Wikipedia)
+    2. i batch vanno a un pool di processi, ognuno con il proprio modello
+    3. i risultati si scrivono al loro posto in un array preallocato
+    Il pool parte da un interprete pulito (src.parallel): i worker non ri-eseguono app.py.
+    `loader(model_name)`: funzione picklable che crea il modello nei worker (default SentenceTransformer).
+    """
+
+    def __init__(self, model_name='all-MiniLM-L6-v2', workers=None, batch_size=64, max_tokens_per_batch=8192,
+                 quantize=False, cache_dir="cache", loader=None):
+        self.model_name = model_name
+        self.loader = loader
+        # Worker con il modello int8 (lo stesso salvato in cache/models/)
+        self.quantize = quantize
+        self.cache_dir = cache_dir
+        self.workers = workers or max(1, (os.cpu_count() or 2) // 2)
+        self.batch_size = batch_size
+        self.max_tokens_per_batch = max_tokens_per_batch
+        self.last_throughput = None
+
+    @staticmethod
+    def token_lengths(text_list, tokenizer=None, max_length=256):
+        """Lunghezza in token di ogni testo (stima da caratteri se manca il tokenizer)"""
+        if tokenizer is None:
+            return np.array([min(max_length, len(t) // 4 + 2) for t in text_list], dtype=np.int32)
+        ids = tokenizer(list(text_list), add_special_tokens=True, truncation=True, max_length=max_length)['input_ids']
+        return np.array([len(i) for i in ids], dtype=np.int32)
+
+    def make_batches(self, lengths):
+        """Batch di indici con lunghezze simili: al massimo batch_size testi o max_tokens_per_batch token"""
+        order = np.argsort(lengths, kind='stable')
+        batches, current, longest = [], [], 0
+        for i in order:
+            longest_if_added = max(longest, lengths[i])
+            # Con il padding ogni testo del batch costa quanto il più lungo
+            if current and (len(current) >= self.batch_size
+                            or longest_if_added * (len(current) + 1) > self.max_tokens_per_batch):
+                batches.append(np.array(current, dtype=np.int64))
+                current, longest_if_added = [], lengths[i]
+            current.append(i)
+            longest = longest_if_added
+        if current: batches.append(np.array(current, dtype=np.int64))
+        return batches
+
+    def encode(self, text_list, tokenizer=None, dim=None, max_length=256):
+        start = time.time()
+        lengths = self.token_lengths(text_list, tokenizer, max_length)
+        batches = self.make_batches(lengths)
+        jobs = [(ids, [text_list[i] for i in ids]) for ids in batches]
+        print(f"🧵 ENCODING CPU: {len(text_list)} testi in {len(batches)} batch su {self.workers} processi...")
+
+        threads = max(1, (os.cpu_count() or 1) // self.workers)
+        init_args = (self.model_name, threads, self.quantize, self.cache_dir, self.loader)
+        out = run_isolated(_encode_jobs, jobs, len(text_list), dim, self.workers, init_args, self.batch_size * 50)
+
+        elapsed = time.time() - start
+        self.last_throughput = len(text_list) / elapsed if elapsed > 0 else float('inf')
+        print(f"✅ ENCODING CPU COMPLETATO: {self.last_throughput:.1f} testi/s ({elapsed:.1f}s)")
+        return out
@@ -1,84 +1,69 @@
 import pandas as pd
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
+from src.algorithms.similarity import SimilarityEngine
+from src.algorithms.evaluation import CatalogEvaluator
+from src.algorithms.filters import FilterIndex
+
+# Filtri della UI -> partizioni precalcolate
+TYPE_FILTERS = {"Movies Only": 'Movie', "TV Shows Only": 'TV Show'}
 
 
 class MovieRecommender:
     def __init__(self, df, embeddings):
         self.df = df.reset_index(drop=True)
         self.embeddings = embeddings
+        self.engine = SimilarityEngine(embeddings)
+        self.filters = FilterIndex(self.df)
         # Mappa titolo -> indice per velocità
         self.indices = pd.Series(self.df.index, index=self.df['title']).drop_duplicates()
 
-    def get_profile_recommendations(self, movie_titles, filter_type="All", top_n=5):
+    def get_profile_recommendations(self, movie_titles, filter_type="All", top_n=5, source=None, genre=None):
         """
         Genera raccomandazioni basate su una LISTA di film (Profilo Utente).
+        I filtri (tipo, piattaforma, genere) restringono le righe candidate prima dello scoring.
         """
         valid_indices = []
+        excluded = []
         for title in movie_titles:
             if title in self.indices:
                 idx = self.indices[title]
-                # Se ci sono duplicati, prende il primo
-                if isinstance(idx, pd.Series): idx = idx.iloc[0]
-                valid_indices.append(idx)
+                # Se ci sono duplicati, prende il primo (ma li esclude tutti)
+                ids = idx.tolist() if isinstance(idx, pd.Series) else [idx]
+                valid_indices.append(ids[0])
+                excluded.extend(ids)
 
         if not valid_indices:
             return None, "Nessun film valido selezionato."
 
         # 1. Calcola il "Vettore Utente" (Media degli embedding dei film scelti)
         selected_embeddings = self.embeddings[valid_indices]
-        user_profile_vector = np.mean(selected_embeddings, axis=0).reshape(1, -1)
-
-        # 2. Calcola similarità tra il profilo utente e TUTTI i film
-        # Nota: usiamo cosine_similarity dinamico qui perché il vettore utente cambia sempre
-        sim_scores = cosine_similarity(user_profile_vector, self.embeddings)[0]
+        user_profile_vector = np.asarray(selected_embeddings.mean(axis=0)).ravel()
 
-        # 3. Crea un DataFrame temporaneo per filtrare
-        temp_df = self.df.copy()
-        temp_df['score'] = sim_scores
+        # 2. Righe ammesse dai filtri (partizioni precalcolate, None = tutto il catalogo)
+        rows = self.filters.rows(type=TYPE_FILTERS.get(filter_type), source=source, genre=genre)
 
-        # 4. Filtra per TIPO (Movie vs TV Show)
-        if filter_type == "Movies Only":
-            temp_df = temp_df[temp_df['type'] == 'Movie']
-        elif filter_type == "TV Shows Only":
-            temp_df = temp_df[temp_df['type'] == 'TV Show']
+        # 3. Top N solo tra le righe ammesse, escludendo i film già nel profilo
+        if rows is None:
+            top_idx, scores = self.engine.search(user_profile_vector, top_n, exclude=excluded)
+        else:
+            top_idx, scores = self.engine.search_subset(user_profile_vector, rows, top_n, exclude=excluded)
 
-        # 5. Rimuovi i film che l'utente ha già inserito nel profilo (non consigliargli ciò che ha già visto)
-        temp_df = temp_df[~temp_df['title'].isin(movie_titles)]
-
-        # 6. Ordina e prendi i Top N
-        results = temp_df.sort_values(by='score', ascending=False).head(top_n)
+        results = self.df.iloc[top_idx].copy()
+        results['score'] = scores
 
         return results, "OK"
 
-    def evaluate_system_quality(self, n_samples=50):
+    def evaluate_system_quality(self, n_samples=50, k=5):
         """
-        Esegue un test automatico su 50 film casuali.
+        Esegue un test automatico su n_samples film casuali (None = tutto il catalogo).
         Controlla se i film raccomandati condividono i generi con il film di input.
         """
-        # Prendi 50 film a caso
-        samples = self.df.sample(n=min(n_samples, len(self.df)), random_state=42)
-
-        total_overlap_score = 0
-        total_recs = 0
-
-        for _, row in samples.iterrows():
-            input_genres = set(str(row['genres']).split('|'))
-
-            # Chiedi raccomandazioni
-            recs, _ = self.recommend(row['title'], top_n=5)
-
-            if recs is None or recs.empty: continue
+        evaluator = CatalogEvaluator(self.engine, self.df['genres'], k=k)
 
-            # Calcola overlap
-            for _, rec_row in recs.iterrows():
-                rec_genres = set(str(rec_row['genres']).split('|'))
-                # Intersezione: quanti generi in comune?
-                common = input_genres.intersection(rec_genres)
-                if len(common) > 0:
-                    total_overlap_score += 1  # Un punto se c'è almeno un genere in comune
-                total_recs += 1
+        sample_idx = None
+        if n_samples is not None:
+            # Prendi n_samples film a caso
+            sample_idx = self.df.sample(n=min(n_samples, len(self.df)), random_state=42).index.values
 
         # Calcola percentuale finale
-        precision = total_overlap_score / total_recs if total_recs > 0 else 0
-        return precision
\ No newline at end of file
+        return evaluator.evaluate(sample_idx)[f'genre_precision@{k}']
@@ -2,10 +2,15 @@ import torch
 from sentence_transformers import SentenceTransformer
 
 class BertHandler:
-    def __init__(self, model_name='all-MiniLM-L6-v2'):
-        self.device = 'cuda' if torch.cuda.is_available() else 'cpu'
-        print(f"🧠 BERT Device: {self.device.upper()}")
-        self.model = SentenceTransformer(model_name, device=self.device)
+    def __init__(self, model_name='all-MiniLM-L6-v2', quantize=False):
+        # quantize=True: transformer int8 (solo CPU), salvato in cache/models/
+        self.device = 'cuda' if torch.cuda.is_available() and not quantize else 'cpu'
+        print(f"🧠 BERT Device: {self.device.upper()}{' (int8)' if quantize else ''}")
+        if quantize:
+            from .quantization import load_quantized
+            self.model = load_quantized(model_name)
+        else:
+            self.model = SentenceTransformer(model_name, device=self.device)
 
     def encode(self, texts):
         return self.model.encode(
@@ -0,0 +1,67 @@
+import os
+import time
+import numpy as np
+import torch
+from sentence_transformers import SentenceTransformer
+from src.algorithms.similarity import SimilarityEngine
+
+
+def quantize_model(model):
+    """Quantizzazione dinamica int8 dei layer Linear del transformer (inferenza su CPU)"""
+    model = model.to('cpu').eval()
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def load_quantized(model_name='all-MiniLM-L6-v2', cache_dir="cache"):
+    """Modello int8 da cache/models/, quantizzato e salvato alla prima richiesta"""
+    model_dir = os.path.join(cache_dir, "models")
+    os.makedirs(model_dir, exist_ok=True)
+    path = os.path.join(model_dir, f"{model_name.replace('/', '_')}_int8.pt")
+
+    if os.path.exists(path):
+        try:
+            print(f"⚡ MODELLO INT8 CACHED: {path}")
+            return torch.load(path, map_location='cpu', weights_only=False)
+        except Exception as e:
+            print(f"⚠️ Modello int8 in cache illeggibile ({e}): lo ricreo")
+
+    print(f"🗜️ QUANTIZZAZIONE INT8 DI {model_name}...")
+    model = quantize_model(SentenceTransformer(model_name, device='cpu'))
+    torch.save(model, path + ".tmp")
+    os.replace(path + ".tmp", path)
+    return model
+
+
+def drift_report(float_model, int8_model, texts, k=10, batch_size=64):
+    """
+    Confronto int8 vs float32 su un campione di testi:
+    - drift degli embedding (similarità coseno tra i due vettori dello stesso testo)
+    - overlap delle top-k raccomandazioni calcolate dentro il campione
+    - velocità di encoding dei due modelli
+    """
+    timings = {}
+    vectors = {}
+    for name, model in (('float32', float_model), ('int8', int8_model)):
+        start = time.time()
+        vectors[name] = model.encode(texts, batch_size=batch_size, show_progress_bar=False, convert_to_numpy=True)
+        timings[name] = len(texts) / max(time.time() - start, 1e-9)
+
+    a = SimilarityEngine(vectors['float32'])
+    b = SimilarityEngine(vectors['int8'])
+    cos = np.einsum('ij,ij->i', a.matrix, b.matrix)
+
+    k = min(k, len(texts) - 1)
+    exclude = [[i] for i in range(len(texts))]
+    ids_a, _ = a.search_many(a.matrix, k, exclude=exclude)
+    ids_b, _ = b.search_many(b.matrix, k, exclude=exclude)
+    overlap = np.mean([len(set(x) & set(y)) / k for x, y in zip(ids_a, ids_b)]) if k > 0 else 1.0
+
+    return {
+        'texts': len(texts),
+        'cosine_mean': float(cos.mean()),
+        'cosine_min': float(cos.min()),
+        f'top{k}_overlap': float(overlap),
+        'float32_texts_per_sec': timings['float32'],
+        'int8_texts_per_sec': timings['int8'],
+        'speedup': timings['int8'] / timings['float32'],
+    }
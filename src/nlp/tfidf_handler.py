@@ -1,3 +1,4 @@
+import numpy as np
 from sklearn.feature_extraction.text import TfidfVectorizer
 
 class TfidfHandler:
@@ -6,16 +7,13 @@ class TfidfHandler:
         self.vectorizer = TfidfVectorizer(
             stop_words='english',
             max_features=max_features,
-            ngram_range=(1, 2) # Considera anche coppie di parole
+            ngram_range=(1, 2), # Considera anche coppie di parole
+            dtype=np.float32
         )
         self.matrix = None
 
     def encode(self, texts):
         print("🚀 TF-IDF Fitting...")
-        self.matrix = self.vectorizer.fit_transform(texts)
-        # Convertiamo in array denso solo se la RAM lo permette, altrimenti gestiamo sparso
-        try:
-            return self.matrix.toarray()
-        except:
-            print("⚠️ RAM insufficiente per array denso, restituisco matrice sparsa.")
-            return self.matrix
\ No newline at end of file
+        # Matrice sparsa CSR: recommender, cache e benchmark la usano senza densificarla
+        self.matrix = self.vectorizer.fit_transform(texts).tocsr()
+        return self.matrix
@@ -0,0 +1,106 @@
+"""
+Pool di processi avviati da un interprete pulito.
+
+Con 'spawn' (e 'forkserver') ogni worker ri-esegue il modulo __main__ del padre. Sotto Streamlit
+__main__ è app.py (con __file__) e resta tale per tutta l'esecuzione: ogni worker ricaricherebbe
+l'intera app (catalogo, modello, grafo) o fallirebbe aprendo a sua volta un pool.
+Qui la funzione che crea il pool gira in `python -m src.parallel`: il suo __main__ è questo
+modulo, che importato dai worker non fa nulla.
+"""
+import os
+import sys
+import pickle
+import subprocess
+import traceback
+
+# Radice del progetto (contiene src/): il sottoprocesso deve poter importare `src.parallel`
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _spawn(func, args, kwargs, stream):
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(p for p in (_ROOT, env.get('PYTHONPATH')) if p)
+    proc = subprocess.Popen([sys.executable, '-m', 'src.parallel'], stdin=subprocess.PIPE,
+                            stdout=subprocess.PIPE, env=env)
+    try:
+        # sys.path per primo: serve per importare i moduli della funzione (come fa 'spawn')
+        pickle.dump(sys.path, proc.stdin, protocol=pickle.HIGHEST_PROTOCOL)
+        pickle.dump((func, args, kwargs, stream), proc.stdin, protocol=pickle.HIGHEST_PROTOCOL)
+        proc.stdin.close()
+    except BrokenPipeError:
+        pass
+    return proc
+
+
+def _messages(proc):
+    while True:
+        try:
+            kind, value = pickle.load(proc.stdout)
+        except EOFError:
+            raise RuntimeError(f"Processo isolato terminato senza risultato (codice {proc.wait()})")
+        if kind == 'error': raise value
+        yield kind, value
+        if kind == 'return': return
+
+
+def _close(proc):
+    if proc.poll() is None:
+        proc.kill()
+    proc.wait()
+    proc.stdout.close()
+
+
+def run_isolated(func, *args, **kwargs):
+    """func(*args, **kwargs) in un interprete pulito; argomenti e risultato devono essere picklable"""
+    proc = _spawn(func, args, kwargs, stream=False)
+    try:
+        for _, value in _messages(proc):
+            return value
+    finally:
+        _close(proc)
+
+
+def iter_isolated(func, *args, **kwargs):
+    """Come run_isolated per un generatore: gli elementi arrivano man mano che vengono prodotti"""
+    proc = _spawn(func, args, kwargs, stream=True)
+    try:
+        for kind, value in _messages(proc):
+            if kind == 'item': yield value
+    finally:
+        # Anche se il chiamante smette di iterare: niente processi orfani
+        _close(proc)
+
+
+def _main():
+    # Il canale dei risultati è lo stdout originale; le print finiscono su stderr
+    out = os.fdopen(os.dup(sys.stdout.fileno()), 'wb')
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    sys.stdout = sys.stderr
+
+    def send(kind, value):
+        pickle.dump((kind, value), out, protocol=pickle.HIGHEST_PROTOCOL)
+        out.flush()
+
+    stdin = sys.stdin.buffer
+    sys.path[:] = list(dict.fromkeys(pickle.load(stdin) + sys.path))
+    try:
+        func, args, kwargs, stream = pickle.load(stdin)
+        result = func(*args, **kwargs)
+        if stream:
+            for item in result:
+                send('item', item)
+            result = None
+        send('return', result)
+    except BaseException as e:
+        try:
+            pickle.dumps(e)
+        except Exception:
+            e = RuntimeError(f"{type(e).__name__}: {e}")
+        traceback.print_exc()
+        send('error', e)
+    finally:
+        out.close()
+
+
+if __name__ == "__main__":
+    _main()
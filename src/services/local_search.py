@@ -1,7 +1,19 @@
+from .title_index import TitleIndex
+
+
 class LocalSearchService:
-    def __init__(self, df):
+    def __init__(self, df, index=None, version=None):
         self.df = df
+        # Indice dei titoli (prefissi + trigrammi), in cache per versione del catalogo
+        self.index = index or TitleIndex.load_or_build(df['title'].tolist(), version)
 
     def search(self, query):
-        # Ricerca parziale nel dataframe
-        return self.df[self.df['title'].str.contains(query, case=False, regex=False)]
\ No newline at end of file
+        # Ricerca parziale tramite l'indice (righe nell'ordine del catalogo)
+        return self.df.iloc[sorted(self.index.substring(query))]
+
+    def suggest(self, query, limit=20):
+        """Autocompletamento ordinato (esatto, prefisso, sottostringa, refusi)"""
+        return self.index.suggest(query, limit)
+
+    def contains(self, title):
+        return self.index.lookup(title) is not None
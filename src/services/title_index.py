@@ -0,0 +1,138 @@
+import os
+import glob
+import bisect
+import pickle
+import numpy as np
+
+
+def _ngrams(text, n=3):
+    # Spazi ai bordi: le iniziali delle parole pesano di più
+    padded = f"  {text} "
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+
+class TitleIndex:
+    """
+    Indice dei titoli costruito una volta e salvato in cache insieme al catalogo:
+    - array ordinato dei titoli minuscoli -> ricerca per prefisso con bisect
+    - indice invertito di trigrammi -> sottostringhe e ricerca tollerante ai refusi
+    """
+
+    def __init__(self, titles, n=3):
+        self.n = n
+        self.titles = [str(t) for t in titles]
+        lower = [t.lower() for t in self.titles]
+
+        # Prefissi: titoli minuscoli ordinati + posizione originale
+        order = sorted(range(len(lower)), key=lower.__getitem__)
+        self.sorted_lower = [lower[i] for i in order]
+        self.sorted_ids = np.array(order, dtype=np.int32)
+
+        # Trigrammi: trigramma -> id dei titoli che lo contengono
+        postings = {}
+        self.gram_counts = np.zeros(len(lower), dtype=np.int32)
+        for i, t in enumerate(lower):
+            grams = _ngrams(t, n)
+            self.gram_counts[i] = len(grams)
+            for g in grams:
+                postings.setdefault(g, []).append(i)
+        self.postings = {g: np.array(ids, dtype=np.int32) for g, ids in postings.items()}
+
+        self.exact = {}
+        for i, t in enumerate(lower):
+            self.exact.setdefault(t, i)
+
+    def __len__(self):
+        return len(self.titles)
+
+    @classmethod
+    def load_or_build(cls, titles, version, cache_dir="cache"):
+        """Indice in cache per questa versione del catalogo, altrimenti lo costruisce"""
+        path = os.path.join(cache_dir, f"title_index_{version}.pkl")
+        if version and os.path.exists(path):
+            with open(path, 'rb') as f:
+                print(f"⚡ INDICE TITOLI CACHED: {path}")
+                return pickle.load(f)
+
+        print(f"🏗️ COSTRUZIONE INDICE TITOLI ({len(titles)} titoli)...")
+        index = cls(titles)
+        if version:
+            os.makedirs(cache_dir, exist_ok=True)
+            # Gli indici di versioni precedenti del catalogo non servono più
+            for old in glob.glob(os.path.join(cache_dir, "title_index_*.pkl")):
+                os.remove(old)
+            with open(path, 'wb') as f:
+                pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+        return index
+
+    def lookup(self, title):
+        """Riga del titolo esatto (senza maiuscole/minuscole) oppure None"""
+        return self.exact.get(str(title).lower())
+
+    def prefix(self, query, limit=20):
+        q = query.lower()
+        start = bisect.bisect_left(self.sorted_lower, q)
+        ids = []
+        for pos in range(start, min(start + limit, len(self.sorted_lower))):
+            if not self.sorted_lower[pos].startswith(q): break
+            ids.append(int(self.sorted_ids[pos]))
+        return ids
+
+    def substring(self, query, limit=None):
+        """Titoli che contengono la query (candidati dai trigrammi, poi verifica esatta)"""
+        q = query.lower()
+        grams = {q[i:i + self.n] for i in range(len(q) - self.n + 1)}
+        if not grams:
+            # Query più corta di un trigramma: scansione (si ferma a `limit`)
+            candidates = range(len(self.titles))
+        else:
+            lists = sorted((self.postings.get(g) for g in grams), key=lambda p: 0 if p is None else len(p))
+            if lists[0] is None: return []
+            candidates = lists[0]
+            for p in lists[1:]:
+                candidates = np.intersect1d(candidates, p, assume_unique=True)
+                if len(candidates) == 0: return []
+
+        ids = []
+        for i in candidates:
+            if q in self.titles[i].lower():
+                ids.append(int(i))
+                if limit is not None and len(ids) >= limit: break
+        return ids
+
+    def fuzzy(self, query, limit=20, min_similarity=0.3):
+        """Titoli più simili per trigrammi in comune (Jaccard): tollera refusi e parole scambiate"""
+        grams = [g for g in _ngrams(query.lower(), self.n) if g in self.postings]
+        if not grams: return []
+        hits = np.bincount(np.concatenate([self.postings[g] for g in grams]), minlength=len(self.titles))
+        cand = np.flatnonzero(hits)
+        sim = hits[cand] / (len(_ngrams(query.lower(), self.n)) + self.gram_counts[cand] - hits[cand])
+        keep = sim >= min_similarity
+        cand, sim = cand[keep], sim[keep]
+        top = np.argsort(-sim, kind='stable')[:limit]
+        return [int(i) for i in cand[top]]
+
+    def search(self, query, limit=20):
+        """Ricerca ordinata: esatto, poi prefisso, poi sottostringa, poi simili (refusi)"""
+        query = query.strip()
+        if not query: return []
+
+        ranked = []
+        seen = set()
+
+        def add(ids):
+            for i in ids:
+                if i not in seen and len(ranked) < limit:
+                    seen.add(i)
+                    ranked.append(i)
+
+        exact = self.lookup(query)
+        add([] if exact is None else [exact])
+        add(self.prefix(query, limit))
+        add(self.substring(query, limit))
+        add(self.fuzzy(query, limit))
+        return ranked
+
+    def suggest(self, query, limit=20):
+        """Titoli suggeriti per l'autocompletamento"""
+        return [self.titles[i] for i in self.search(query, limit)]
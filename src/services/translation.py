@@ -1,18 +1,75 @@
-from deep_translator import GoogleTranslator
+import os
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from .cache import LRUCache, DiskCache
 
 
 class TranslationService:
-    def __init__(self):
-        self.translator = GoogleTranslator(source='auto', target='en')
+    """
+    Traduzioni con cache a due livelli: LRU in memoria + SQLite su disco (cache/translations.db),
+    chiave = (hash del testo, lingua). translate_many traduce tutte le card visibili insieme,
+    con richieste concorrenti su un pool limitato.
+    `translator_factory(source, target)` permette di usare un traduttore locale (es. nei test);
+    di default GoogleTranslator (deep-translator, importato solo se serve).
+    """
 
-    def translate_to_en(self, text):
+    def __init__(self, translator_factory=None, cache_dir="cache", max_workers=4, memory_size=2048):
+        if translator_factory is None:
+            from deep_translator import GoogleTranslator
+            translator_factory = GoogleTranslator
+        self.translator_factory = translator_factory
+        self.max_workers = max_workers
+        self.memory = LRUCache(memory_size)
+        self.disk = DiskCache(os.path.join(cache_dir, "translations.db"))
+        # Un traduttore per (thread, lingua): niente oggetti nuovi a ogni chiamata
+        self._local = threading.local()
+        self.translator = self._translator('auto', 'en')
+
+    def _translator(self, source, target):
+        pool = self._local.__dict__.setdefault('translators', {})
+        if (source, target) not in pool:
+            pool[(source, target)] = self.translator_factory(source=source, target=target)
+        return pool[(source, target)]
+
+    @staticmethod
+    def _key(text, source, target):
+        return f"{hashlib.sha1(text.encode('utf-8', 'replace')).hexdigest()}:{source}>{target}"
+
+    def _remote(self, text, source, target):
         try:
-            return self.translator.translate(text)
-        except:
-            return text
+            return self._translator(source, target).translate(text)
+        except Exception:
+            return None
+
+    def translate_many(self, texts, target, source='en'):
+        """Traduce una lista di testi (nello stesso ordine); in caso di errore resta il testo originale"""
+        texts = [str(t)[:2000] for t in texts]
+        if target == source: return texts
+
+        keys = [self._key(t, source, target) for t in texts]
+        results = {k: self.memory.get(k) for k in keys if k in self.memory}
+
+        # Livello 2: disco (una query per tutte le card)
+        missing = [k for k in dict.fromkeys(keys) if k not in results]
+        if missing:
+            results.update(self.disk.get_many(missing))
+
+        # Livello 3: rete, solo per i testi mai tradotti, in parallelo
+        todo = {k: t for k, t in zip(keys, texts) if k not in results}
+        if todo:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(todo))) as pool:
+                translated = dict(zip(todo, pool.map(lambda t: self._remote(t, source, target), todo.values())))
+            ok = {k: v for k, v in translated.items() if v}
+            self.disk.put_many(ok)
+            results.update(ok)
+
+        for k, v in results.items():
+            self.memory.put(k, v)
+        return [results.get(k) or t for k, t in zip(keys, texts)]
+
+    def translate_to_en(self, text):
+        return self.translate_many([text], 'en', source='auto')[0]
 
     def translate_from_en(self, text, lang_code):
-        try:
-            return GoogleTranslator(source='en', target=lang_code).translate(text[:2000])
-        except:
-            return text
\ No newline at end of file
+        return self.translate_many([text], lang_code)[0]
@@ -1,15 +1,77 @@
-from imdb import Cinemagoer
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from .cache import DiskCache
+
+# Campi del record IMDb che ci servono (il resto dell'oggetto Movie non viene salvato)
+MOVIE_FIELDS = ['title', 'plot outline', 'plot', 'genres', 'rating', 'full-size cover url', 'cover url']
 
 
 class WebSearchService:
-    def __init__(self):
-        self.ia = Cinemagoer()
+    """
+    Ricerca su IMDb (Cinemagoer) con:
+    - cache su disco con scadenza (cache/imdb.db) per ricerche e schede film
+    - deduplica delle richieste identiche già in corso (una sola chiamata di rete)
+    - fetch_many: arricchimento di molti titoli in parallelo con un limite di connessioni
+    `backend` sostituisce Cinemagoer (es. un finto backend nei test); Cinemagoer si importa solo se serve.
+    """
+
+    def __init__(self, backend=None, cache_dir="cache", ttl=7 * 24 * 3600, max_connections=4):
+        if backend is None:
+            from imdb import Cinemagoer
+            backend = Cinemagoer()
+        self.ia = backend
+        self.cache = DiskCache(os.path.join(cache_dir, "imdb.db"), ttl=ttl)
+        self.max_connections = max_connections
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def _once(self, key, fn):
+        """Valore in cache, altrimenti fn() eseguita una sola volta anche con più richieste insieme"""
+        cached = self.cache.get(key)
+        if cached is not None: return cached
+
+        with self._lock:
+            fut = self._inflight.get(key)
+            owner = fut is None
+            if owner:
+                fut = Future()
+                self._inflight[key] = fut
+
+        if not owner:
+            return fut.result()
+
+        try:
+            value = fn()
+            # Gli errori non si salvano: la prossima richiesta riprova
+            if value is not None: self.cache.put(key, value)
+            fut.set_result(value)
+            return value
+        except Exception as e:
+            fut.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def _search(self, query):
+        """[{movieID, title}, ...] per la query (in cache)"""
+        key = f"search:{query.strip().lower()}"
+        return self._once(key, lambda: [{'movieID': r.movieID, 'title': r.get('title')}
+                                        for r in self.ia.search_movie(query)])
+
+    def _movie(self, movie_id):
+        """Scheda film ridotta ai campi usati (in cache)"""
+        def fetch():
+            m = self.ia.get_movie(movie_id)
+            return {f: m.get(f) for f in MOVIE_FIELDS if f in m}
+        return self._once(f"movie:{movie_id}", fetch)
 
     def resolve_title(self, query):
         """Traduce 'Il Trono di Spade' in 'Game of Thrones'"""
         try:
             # Cerca film o serie
-            res = self.ia.search_movie(query)
+            res = self._search(query)
             if res:
                 # Restituisce il titolo del PRIMO risultato (il più rilevante)
                 return res[0]['title']
@@ -21,18 +83,18 @@ class WebSearchService:
     def fetch_full_data(self, query):
         """Scarica metadati completi da IMDb"""
         try:
-            res = self.ia.search_movie(query)
+            res = self._search(query)
             if not res: return None
 
             # Prendi ID
-            movie_id = res[0].movieID
-            m = self.ia.get_movie(movie_id)
+            movie_id = res[0]['movieID']
+            m = self._movie(movie_id)
 
             # Trama (Gestione sicura errori)
             plot = "N/d"
-            if 'plot outline' in m:
+            if m.get('plot outline'):
                 plot = m['plot outline']
-            elif 'plot' in m:
+            elif m.get('plot'):
                 plot = m['plot'][0]
 
             # Poster
@@ -49,4 +111,17 @@ class WebSearchService:
             }
         except Exception as e:
             print(f"Fetch Error: {e}")
-            return None
\ No newline at end of file
+            return None
+
+    def fetch_many(self, queries, max_connections=None):
+        """fetch_full_data per molti titoli in parallelo (stesso ordine, None se non trovato)"""
+        queries = list(queries)
+        if not queries: return []
+        workers = min(max_connections or self.max_connections, len(queries))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(self.fetch_full_data, queries))
+
+    def fetch_posters(self, titles, max_connections=None):
+        """{titolo: url poster} per pre-arricchire le righe del catalogo senza immagine"""
+        data = self.fetch_many(titles, max_connections)
+        return {t: d['custom_poster_url'] for t, d in zip(titles, data) if d and d.get('custom_poster_url')}
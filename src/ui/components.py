@@ -29,4 +29,13 @@ def render_movie_card(row, translation_service=None, target_lang='en'):
             st.write(plot)
 
             if 'score' in row: st.caption(f"Similarity: {row['score']:.1%}")
-    st.divider()
\ No newline at end of file
+    st.divider()
+
+
+def render_movie_cards(rows, translation_service=None, target_lang='en'):
+    """Tutte le card di una lista: le trame vengono tradotte insieme (una richiesta batch)"""
+    rows = list(rows)
+    if translation_service and target_lang != 'en':
+        translation_service.translate_many([str(r['overview']) for r in rows], target_lang)
+    for row in rows:
+        render_movie_card(row, translation_service, target_lang)
@@ -1,15 +1,19 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import os
 import shutil
-from src.ui.components import render_movie_card
+from src.ui.components import render_movie_card, render_movie_cards
 from src.ml.benchmark import BenchmarkRunner
+from src.ml.classic_models import SGDModel
+from src.ml.neural_nets import NeuralNetModel
+from src.data.ingestion import DataIngestor
 
 
-def render_main_page(df, recsys, web_search, translator, embeddings):
+def render_main_page(df, recsys, web_search, translator, embeddings, search):
     st.title("🚀 AI Movie System Enterprise")
 
-    all_titles = sorted(df['title'].unique().tolist())
+    # search: indice dei titoli costruito una volta in init_backend (suggerimenti mentre si scrive)
     lang = st.sidebar.selectbox("Lingua / Language", ["en", "it", "es"])
 
     # 5 Tab
@@ -18,16 +22,22 @@ def render_main_page(df, recsys, web_search, translator, embeddings):
     # --- TAB 1: RICERCA ---
     with t1:
         st.subheader("Trova un film specifico")
-        selected_titles = st.multiselect("Cerca nel Database:", options=all_titles, max_selections=1,
-                                         placeholder="Es. Matrix...")
+        query = st.text_input("Cerca nel Database:", placeholder="Es. Matrix...", key="db_q")
+        target = None
+        if query:
+            options = search.suggest(query)
+            if options:
+                # Nessuna scelta automatica: le raccomandazioni partono solo quando si sceglie un titolo
+                target = st.selectbox("Risultati:", options, index=None, placeholder="Scegli un titolo...",
+                                      key="db_pick")
+            else:
+                st.caption("Nessun titolo trovato nel Database.")
 
-        if selected_titles:
-            target = selected_titles[0]
+        if target:
             st.success(f"Analisi per: **{target}**")
             recs = recsys.recommend_single(target)
             if recs is not None:
-                for _, row in recs.iterrows():
-                    render_movie_card(row, translator, lang)
+                render_movie_cards(recs, translator, lang)
 
         st.markdown("---")
         with st.expander("Non trovi il film? Cerca Online"):
@@ -35,7 +45,7 @@ def render_main_page(df, recsys, web_search, translator, embeddings):
             if st.button("Cerca Web") and web_query:
                 with st.spinner(f"Cerco '{web_query}' su IMDb..."):
                     resolved = web_search.resolve_title(web_query)
-                    if resolved and resolved in all_titles:
+                    if resolved and search.contains(resolved):
                         st.success(f"Trovato nel DB: **{resolved}**! Selezionalo sopra.")
                     else:
                         data = web_search.fetch_full_data(resolved if resolved else web_query)
@@ -47,14 +57,27 @@ def render_main_page(df, recsys, web_search, translator, embeddings):
     # --- TAB 2: PROFILO ---
     with t2:
         st.subheader("Profilo Misto")
-        profile_movies = st.multiselect("I tuoi preferiti:", options=all_titles, max_selections=10)
+        if 'profile' not in st.session_state: st.session_state.profile = []
+
+        profile_query = st.text_input("Aggiungi un preferito:", placeholder="Es. Inception...", key="profile_q")
+        if profile_query:
+            options = search.suggest(profile_query)
+            if options:
+                pick = st.selectbox("Risultati:", options, index=None, placeholder="Scegli un titolo...",
+                                    key="profile_pick")
+                if st.button("➕ Aggiungi") and pick and pick not in st.session_state.profile \
+                        and len(st.session_state.profile) < 10:
+                    st.session_state.profile.append(pick)
+
+        profile_movies = st.multiselect("I tuoi preferiti:", options=st.session_state.profile,
+                                        default=st.session_state.profile, max_selections=10)
+        st.session_state.profile = profile_movies
         if st.button("Genera Mix") and profile_movies:
             with st.spinner("Calcolo media vettoriale..."):
                 recs_profile = recsys.recommend_profile(profile_movies)
             if recs_profile is not None:
                 st.balloons()
-                for _, row in recs_profile.iterrows():
-                    render_movie_card(row, translator, lang)
+                render_movie_cards(recs_profile, translator, lang)
 
     # --- TAB 3: AI LAB ---
     with t3:
@@ -62,8 +85,38 @@ def render_main_page(df, recsys, web_search, translator, embeddings):
             y = df['source']
             valid_sources = y.value_counts()[y.value_counts() > 50].index
             mask = y.isin(valid_sources)
-            runner = BenchmarkRunner(embeddings[mask], y[mask])
-            st.dataframe(runner.run())
+            # Solo gli indici delle righe: gli split si scrivono a blocchi, senza copiare tutta la matrice
+            runner = BenchmarkRunner(embeddings, y.to_numpy(), rows=np.flatnonzero(mask.to_numpy()))
+            table = st.empty()
+            rows = []
+            # I modelli girano in parallelo: la tabella si aggiorna appena ognuno finisce
+            for result in runner.iter_run():
+                rows.append(result)
+                table.dataframe(pd.DataFrame(rows))
+
+        st.markdown("---")
+        st.subheader("Training Streaming (out-of-core)")
+        model_name = st.selectbox("Modello incrementale", ["SGD (Logistic)", "NN (Simple)"], key="stream_model")
+        epochs = st.slider("Epoche", 1, 20, 5, key="stream_epochs")
+        if st.button("Avvia Training Streaming"):
+            y = df['source'].to_numpy()
+            counts = df['source'].value_counts()
+            rows = np.flatnonzero(df['source'].isin(counts[counts > 50].index).to_numpy())
+            model = SGDModel() if model_name.startswith("SGD") else NeuralNetModel(hidden_layers=(32,))
+            # Mini-batch letti dal memory-map degli embedding: la memoria non cresce col catalogo
+            chart = st.empty()
+            history = []
+
+            def on_eval(record):
+                history.append(record)
+                chart.line_chart(pd.DataFrame(history).set_index('samples_seen')['holdout_accuracy'])
+
+            if len(rows) < 2:
+                st.warning("Troppe poche righe per il training streaming.")
+            else:
+                model.train_stream(embeddings, y, rows=rows, epochs=epochs, callback=on_eval)
+                if history:
+                    st.success(f"Accuratezza finale (hold-out): {history[-1]['holdout_accuracy']:.3f}")
 
     # --- TAB 4: STATS ---
     with t4:
@@ -111,8 +164,9 @@ def render_main_page(df, recsys, web_search, translator, embeddings):
                     st.success(f"Salvato in {save_path}!")
 
                     # PULIZIA CACHE PER FORZARE RICARICAMENTO
-                    if os.path.exists("cache/movies_data.pkl"):
-                        os.remove("cache/movies_data.pkl")
+                    DataIngestor().clear_cache()
+                    # Il backend si ricostruisce con la nuova versione (anche la cache dei risultati)
+                    st.cache_resource.clear()
 
                     # Pulsante magico per riavviare
                     st.warning("⚠️ Cache pulita. Ricarica la pagina (F5) o clicca Rerun per processare i nuovi dati.")
@@ -132,7 +186,8 @@ def render_main_page(df, recsys, web_search, translator, embeddings):
                     st.text(f"📄 {f}")
                     if st.button(f"🗑️ Elimina {f}"):
                         os.remove(os.path.join("custom_datasets", f))
-                        os.remove("cache/movies_data.pkl")
+                        DataIngestor().clear_cache()
+                        st.cache_resource.clear()
                         st.rerun()
             else:
                 st.caption("Nessun file custom caricato.")
\ No newline at end of file
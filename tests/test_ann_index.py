@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+
+from src.algorithms.similarity import SimilarityEngine
+from src.algorithms.ann_index import PQIndex, build_index, build_pq_engine, index_recall
+
+
+@pytest.fixture(scope="module")
+def engine():
+    # Embedding raggruppati in cluster, come quelli reali
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((64, 64)).astype(np.float32)
+    data = centers[rng.integers(0, len(centers), size=4000)]
+    data += 0.5 * rng.standard_normal(data.shape).astype(np.float32)
+    return SimilarityEngine(data)
+
+
+def recall(index, engine, k=10):
+    query_idx = np.random.default_rng(1).choice(len(engine), size=100, replace=False)
+    return index_recall(index, engine, query_idx, k=k)['recall@10']
+
+
+def test_pq_recall_with_and_without_rerank(engine):
+    index = PQIndex(engine, n_subspaces=16, n_centroids=64, n_rerank=100, n_iter=10).build()
+    reranked = recall(index, engine)
+
+    # Solo codici: stessa quantizzazione, nessuna lettura delle righe complete
+    index.n_rerank = 0
+    codes_only = recall(index, engine)
+
+    assert reranked >= 0.9
+    assert 0.3 <= codes_only < reranked
+
+
+def test_pq_codes_smaller_than_matrix(engine):
+    index = PQIndex(engine, n_subspaces=16, n_centroids=64, n_iter=5).build()
+    assert index.codes.shape == (16, len(engine))
+    assert index.nbytes < engine.matrix.nbytes / 4
+
+
+def test_build_index_cached(engine, tmp_path):
+    first = build_index('pq', engine, cache_dir=str(tmp_path), n_subspaces=16, n_centroids=64, n_iter=5)
+    again = build_index('pq', engine, cache_dir=str(tmp_path), n_subspaces=16, n_centroids=64, n_iter=5)
+    np.testing.assert_array_equal(first.codes, again.codes)
+
+
+def test_build_index_prunes_old_versions(engine, tmp_path):
+    params = dict(n_subspaces=16, n_centroids=64, n_iter=5)
+    build_index('pq', engine, cache_dir=str(tmp_path), **params)
+    build_index('ivf', engine, cache_dir=str(tmp_path), n_lists=16, n_iter=5)
+
+    # Stesso indice su una matrice diversa: la versione precedente del pq non serve più
+    changed = SimilarityEngine(engine.matrix[::-1].copy())
+    build_index('pq', changed, cache_dir=str(tmp_path), **params)
+
+    files = sorted(p.name for p in tmp_path.glob("ann_*.npz"))
+    assert len(files) == 2
+    assert sum(name.startswith("ann_pq16x64_") for name in files) == 1
+    assert sum(name.startswith("ann_ivf16_") for name in files) == 1
+
+
+def test_codes_only_engine_holds_no_float_matrix(engine, tmp_path):
+    pq = build_pq_engine(engine.matrix, cache_dir=str(tmp_path), fingerprint="v1",
+                         n_subspaces=16, n_centroids=64, n_iter=10)
+    assert pq.matrix is None
+    assert pq.nbytes < engine.matrix.nbytes / 4
+
+    # Righe ricostruite dai codici, vicine agli originali e normalizzate
+    idx = np.arange(0, len(engine), 7)
+    rows = pq.rows(idx)
+    np.testing.assert_allclose(np.linalg.norm(rows, axis=1), 1.0, atol=1e-5)
+    assert np.mean(np.sum(rows * engine.rows(idx), axis=1)) > 0.9
+    np.testing.assert_allclose(pq.vector(7), rows[1])
+
+    # Ricerca ADC sui codici contro la ricerca esatta in float32
+    query_idx = np.random.default_rng(1).choice(len(engine), size=100, replace=False)
+    hits = [len(set(pq.search(engine.vector(i), 10)[0]) & set(engine.search(engine.vector(i), 10)[0]))
+            for i in query_idx]
+    assert np.mean(hits) / 10 >= 0.3
+
+    # Ricaricato da cache/: stessi codici
+    again = build_pq_engine(engine.matrix, cache_dir=str(tmp_path), fingerprint="v1",
+                            n_subspaces=16, n_centroids=64, n_iter=10)
+    np.testing.assert_array_equal(again.codes, pq.codes)
+
+
+def test_codes_only_subset_matches_adc_scores(engine, tmp_path):
+    pq = build_pq_engine(engine.matrix, cache_dir=str(tmp_path), fingerprint="v1",
+                         n_subspaces=16, n_centroids=64, n_iter=5)
+    query = engine.vector(5)
+    scores = pq.score(query)
+    for rows in (np.arange(0, len(pq), 2), np.arange(0, len(pq), 50)):
+        top, sc = pq.search_subset(query, rows, 10, exclude=[5])
+        allowed = rows[rows != 5]
+        expected = allowed[np.argsort(-scores[allowed], kind='stable')[:10]]
+        assert set(top) == set(expected)
+        np.testing.assert_allclose(sc, scores[top], rtol=1e-5)
@@ -0,0 +1,77 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.data.columnar import ColumnarCatalog
+
+
+def make_df(n, genre='Drama'):
+    return pd.DataFrame({
+        'title': [f"Titolo {i} è" for i in range(n)],
+        'overview': [f"trama numero {i} " * (i % 5 + 1) for i in range(n)],
+        'genres': [genre if i % 2 else 'Horror' for i in range(n)],
+        'type': ['Movie' if i % 3 else None for i in range(n)],
+        'source': ['Netflix'] * n,
+        'vote_average': [i / 10 for i in range(n)],
+    })
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    return ColumnarCatalog(str(tmp_path / "catalog"))
+
+
+def test_round_trip(catalog):
+    df = make_df(50)
+    catalog.write(df)
+    out = catalog.read()
+
+    assert out['title'].tolist() == df['title'].tolist()
+    assert out['overview'].tolist() == df['overview'].tolist()
+    assert out['genres'].astype(str).tolist() == df['genres'].tolist()
+    assert out['type'].isna().tolist() == df['type'].isna().tolist()
+    np.testing.assert_allclose(out['vote_average'], df['vote_average'], rtol=1e-6)
+    # Solo le colonne richieste, trame leggibili una alla volta
+    assert list(catalog.read(['title', 'source']).columns) == ['title', 'source']
+    assert catalog.text_column('overview')[7] == df['overview'][7]
+
+
+def test_version_covers_every_column(catalog):
+    df = make_df(20)
+    catalog.write(df)
+    version, text_version = catalog.version, catalog.text_version
+
+    catalog.write(df)
+    assert (catalog.version, catalog.text_version) == (version, text_version)
+
+    catalog.write(make_df(20, genre='Comedy'))
+    assert catalog.version != version
+    assert catalog.text_version == text_version
+
+    changed = df.copy()
+    changed.loc[3, 'vote_average'] = 9.9
+    catalog.write(changed)
+    assert catalog.version != version
+
+
+def test_rebuild_keeps_open_columns_readable(catalog):
+    catalog.write(make_df(200))
+    old = catalog.text_column('overview')
+    expected = old.take(range(150, 200))
+
+    # Catalogo più piccolo: i memory-map già aperti non vengono troncati
+    catalog.write(make_df(10))
+    assert old.take(range(150, 200)) == expected
+    assert len(catalog.text_column('overview')) == 10
+    assert len(catalog.read()) == 10
+    # Resta solo la cartella del catalogo corrente
+    data_dirs = [d for d in os.listdir(catalog.path) if d.startswith("data_")]
+    assert data_dirs == [catalog.manifest()['dir']]
+
+
+def test_clear_invalidates(catalog):
+    catalog.write(make_df(5))
+    catalog.clear()
+    assert not catalog.exists()
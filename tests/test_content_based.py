@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.algorithms.content_based import ContentBasedRecommender
+
+
+@pytest.fixture
+def catalog():
+    rng = np.random.default_rng(0)
+    n = 500
+    emb = rng.standard_normal((n, 16)).astype(np.float32)
+    df = pd.DataFrame({'title': [f"t{i}" for i in range(n)], 'genres': 'Drama', 'type': 'Movie',
+                       'source': 'Netflix', 'vote_average': 5.0})
+    return df, emb
+
+
+def test_profile_cache_keeps_repeated_titles(catalog, tmp_path):
+    df, emb = catalog
+    cached = ContentBasedRecommender(df, emb, cache_dir=str(tmp_path))
+    uncached = ContentBasedRecommender(df, emb, cache_dir=str(tmp_path), result_cache_size=0)
+
+    once = cached.recommend_profile(['t1', 't2'], top_n=10)
+    twice = cached.recommend_profile(['t1', 't1', 't2'], top_n=10)
+    # Il titolo ripetuto conta due volte nel centroide: non deve arrivare il risultato di ['t1', 't2']
+    assert list(twice.indices) == list(uncached.recommend_profile(['t1', 't1', 't2'], top_n=10).indices)
+    assert list(twice.indices) != list(once.indices)
+
+
+def test_profile_cache_ignores_order(catalog, tmp_path):
+    df, emb = catalog
+    recsys = ContentBasedRecommender(df, emb, cache_dir=str(tmp_path))
+    first = recsys.recommend_profile(['t1', 't2', 't3'], top_n=10)
+    assert recsys.recommend_profile(['t3', 't1', 't2'], top_n=10) is first
+
+
+def test_codes_only_recommender(catalog, tmp_path):
+    df, emb = catalog
+    df = df.assign(type=np.where(np.arange(len(df)) % 3, 'Movie', 'TV Show'))
+    params = {'codes_only': True, 'n_subspaces': 8, 'n_centroids': 32, 'n_iter': 5}
+    recsys = ContentBasedRecommender(df, emb, index='pq', index_params=params, cache_dir=str(tmp_path),
+                                     knn_k=10, fingerprint="v1", profile_aggregation='max')
+    assert recsys.engine.matrix is None and recsys.embeddings is None
+
+    single = recsys.recommend_single('t1', top_n=5)
+    assert len(single.indices) == 5 and 1 not in single.indices
+    filtered = recsys.recommend_single('t1', top_n=5, filters={'type': 'TV Show'})
+    assert all(i % 3 == 0 for i in filtered.indices)
+
+    for aggregation in ('max', 'mean'):
+        profile = recsys.recommend_profile(['t1', 't2'], top_n=5, aggregation=aggregation)
+        assert len(profile.indices) == 5 and not {1, 2} & set(profile.indices)
+
+    query_idx, neighbours, _ = recsys.recommend_many(['t1', 'missing'], top_n=5)
+    assert list(query_idx) == [1, -1]
+    assert list(neighbours[0]) == list(recsys.engine.search(recsys.engine.vector(1), 5, exclude=[1])[0])
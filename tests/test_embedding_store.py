@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+from src.models.embedding_store import TextEmbeddingCache
+
+
+def fake_vectors(texts):
+    return np.array([[len(t), t.count(' '), ord(t[0])] for t in texts], dtype=np.float32)
+
+
+def test_only_new_texts_are_missing(tmp_path):
+    cache = TextEmbeddingCache(str(tmp_path))
+    texts = ["a b", "cc", "d e f"]
+    keys = cache.keys(texts)
+    assert list(cache.missing(keys)) == [0, 1, 2]
+    cache.add(keys, fake_vectors(texts))
+
+    # Un testo modificato e uno nuovo: solo quelli vanno ricalcolati
+    changed = ["a b", "cc!", "d e f", "g"]
+    keys = cache.keys(changed)
+    missing = cache.missing(keys)
+    assert list(missing) == [1, 3]
+    cache.add(keys[missing], fake_vectors([changed[i] for i in missing]))
+    np.testing.assert_array_equal(cache.assemble(keys), fake_vectors(changed))
+
+
+def test_keys_depend_on_model(tmp_path):
+    bert = TextEmbeddingCache(str(tmp_path), model_name='a')
+    other = TextEmbeddingCache(str(tmp_path), model_name='b')
+    assert bert.keys(["x"])[0] != other.keys(["x"])[0]
+
+
+def test_shards_are_shared_and_compacted(tmp_path, monkeypatch):
+    monkeypatch.setattr(TextEmbeddingCache, "MAX_SHARDS", 3)
+    cache = TextEmbeddingCache(str(tmp_path))
+    texts = [f"text {i}" for i in range(10)]
+    keys = cache.keys(texts)
+    for i in range(0, 10, 2):
+        cache.add(keys[i:i + 2], fake_vectors(texts[i:i + 2]))
+    # Duplicato: la compattazione tiene una sola copia
+    cache.add(keys[:1], fake_vectors(texts[:1]))
+
+    assert len(cache._shard_names()) <= 3
+    cache.compact()
+    assert len(cache._shard_names()) == 1
+
+    # Un'altra istanza (es. un altro processo) trova tutto senza ricalcolare
+    other = TextEmbeddingCache(str(tmp_path))
+    assert other.missing(keys).size == 0
+    np.testing.assert_array_equal(other.assemble(keys), fake_vectors(texts))
+
+
+class CountingModel:
+    """Modello finto: registra i testi codificati"""
+    max_seq_length = 128
+
+    def __init__(self, *args, **kwargs):
+        self.encoded = []
+
+    def get_sentence_embedding_dimension(self):
+        return 3
+
+    def encode(self, texts, **kwargs):
+        self.encoded.extend(texts)
+        return fake_vectors(texts)
+
+
+def test_generator_encodes_only_missing_texts(tmp_path, monkeypatch):
+    pytest.importorskip("torch")
+    sentence_transformers = pytest.importorskip("sentence_transformers")
+    from src.models.embeddings import EmbeddingGenerator
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(sentence_transformers, "SentenceTransformer", CountingModel)
+    embedder = EmbeddingGenerator(method='bert', cpu_workers=1)
+    embedder.fit_transform(["a b", "cc", "d e f"])
+
+    embedder.model.encoded.clear()
+    texts = ["a b", "cc!", "d e f", "g", "g"]
+    embeddings = embedder.fit_transform(texts)
+    assert sorted(embedder.model.encoded) == ["cc!", "g"]
+    np.testing.assert_array_equal(np.asarray(embeddings), fake_vectors(texts))
@@ -0,0 +1,40 @@
+import sys
+import types
+
+import numpy as np
+
+from src.models.encoding import CpuEncodingPipeline
+
+
+class FakeModel:
+    """Encoder finto: vettore = (lunghezza, numero di spazi, primo carattere)"""
+
+    def encode(self, texts, **kwargs):
+        return np.array([[len(t), t.count(' '), ord(t[0])] for t in texts], dtype=np.float32)
+
+
+def load_fake(model_name):
+    return FakeModel()
+
+
+def test_pool_encoding_matches_inline_and_keeps_order():
+    texts = [f"{'word ' * (i % 7)}text {i}" for i in range(300)]
+    pipeline = CpuEncodingPipeline('fake', workers=2, batch_size=16, loader=load_fake)
+    out = pipeline.encode(texts)
+    np.testing.assert_array_equal(out, FakeModel().encode(texts))
+    assert pipeline.last_throughput > 0
+
+
+def test_workers_do_not_rerun_streamlit_main(tmp_path, monkeypatch):
+    # Come Streamlit: __main__ è lo script dell'app, con __file__ e codice al livello del modulo
+    marker = tmp_path / "app_ran"
+    script = tmp_path / "fake_app.py"
+    script.write_text(f"open({str(marker)!r}, 'a').write('x')\n")
+    fake_main = types.ModuleType("__main__")
+    fake_main.__file__ = str(script)
+    monkeypatch.setitem(sys.modules, "__main__", fake_main)
+
+    texts = ["a b", "ccc", "d e f"]
+    out = CpuEncodingPipeline('fake', workers=2, batch_size=1, loader=load_fake).encode(texts, dim=3)
+    np.testing.assert_array_equal(out, FakeModel().encode(texts))
+    assert not marker.exists()
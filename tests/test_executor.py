@@ -0,0 +1,30 @@
+import sys
+import types
+
+import numpy as np
+from sklearn.linear_model import LogisticRegression
+from sklearn.tree import DecisionTreeClassifier
+
+from src.ml.executor import BenchmarkExecutor
+
+
+def test_models_run_in_clean_workers(tmp_path, monkeypatch):
+    # Come Streamlit: __main__ è lo script dell'app, con codice al livello del modulo
+    marker = tmp_path / "app_ran"
+    script = tmp_path / "fake_app.py"
+    script.write_text(f"open({str(marker)!r}, 'a').write('x')\n")
+    fake_main = types.ModuleType("__main__")
+    fake_main.__file__ = str(script)
+    monkeypatch.setitem(sys.modules, "__main__", fake_main)
+
+    rng = np.random.default_rng(0)
+    X = rng.standard_normal((400, 8)).astype(np.float32)
+    y = np.where(X[:, 0] > 0, 'a', 'b')
+    executor = BenchmarkExecutor(X, y, workers=2, latency_samples=5, cache_dir=str(tmp_path))
+    results = executor.run([("logreg", LogisticRegression()), ("tree", DecisionTreeClassifier(max_depth=3))])
+
+    assert [r['name'] for r in results] == ["logreg", "tree"]
+    assert all(r['accuracy'] > 0.8 for r in results)
+    assert not marker.exists()
+    # Gli split temporanei vengono rimossi
+    assert list((tmp_path / "benchmark").iterdir()) == []
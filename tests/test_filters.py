@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.algorithms.filters import FilterIndex
+from src.algorithms.content_based import ContentBasedRecommender
+
+DF = pd.DataFrame({
+    'title': ['a', 'b', 'c', 'd', 'e', 'f'],
+    'genres': ['Horror|Thriller', 'Drama', 'Horror', 'Comedy, Drama', None, 'Thriller'],
+    'type': ['Movie', 'Movie', 'TV Show', 'Movie', 'TV Show', 'Movie'],
+    'source': ['Netflix', 'Hulu', 'Netflix', 'Netflix', 'Hulu', 'Hulu'],
+})
+
+
+def test_values_of_one_column_are_or():
+    index = FilterIndex(DF)
+    assert list(index.rows(genre=['Horror', 'Comedy'])) == [0, 2, 3]
+    assert list(index.rows(source=['Netflix', 'Hulu'])) == list(range(6))
+
+
+def test_different_columns_are_and():
+    index = FilterIndex(DF)
+    assert list(index.rows(type='Movie', source='Netflix')) == [0, 3]
+    assert list(index.rows(type='Movie', genre=['Horror', 'Thriller'])) == [0, 5]
+    assert list(index.rows(type='TV Show', genre='Comedy')) == []
+
+
+def test_no_filters_and_unknown_values():
+    index = FilterIndex(DF)
+    assert index.rows() is None
+    assert index.rows(type=None) is None
+    assert list(index.rows(genre='Western')) == []
+    with pytest.raises(KeyError):
+        index.rows(year='1999')
+
+
+def test_cached_combinations_ignore_order():
+    index = FilterIndex(DF)
+    first = index.rows(type='Movie', genre=['Thriller', 'Horror'])
+    assert index.rows(genre=('Thriller', 'Horror'), type='Movie') is first
+
+
+@pytest.fixture(scope="module")
+def catalog():
+    rng = np.random.default_rng(0)
+    n = 4000
+    centers = rng.standard_normal((32, 32)).astype(np.float32)
+    emb = centers[rng.integers(0, 32, size=n)] + 0.3 * rng.standard_normal((n, 32)).astype(np.float32)
+    df = pd.DataFrame({
+        'title': [f"t{i}" for i in range(n)],
+        'genres': rng.choice(['Drama', 'Horror', 'Comedy|Drama'], size=n),
+        'type': np.where(rng.random(n) < 0.7, 'Movie', 'TV Show'),
+        'source': rng.choice(['Netflix', 'Hulu'], size=n),
+        'vote_average': 5.0,
+    })
+    return df, emb
+
+
+@pytest.mark.parametrize("filters", [{'type': 'Movie'}, {'type': 'TV Show', 'source': 'Hulu', 'genre': 'Horror'}])
+def test_filters_compose_with_ann_index(catalog, tmp_path, filters):
+    df, emb = catalog
+    exact = ContentBasedRecommender(df, emb, cache_dir=str(tmp_path), result_cache_size=0)
+    ivf = ContentBasedRecommender(df, emb, index='ivf', cache_dir=str(tmp_path), result_cache_size=0)
+    allowed = set(exact.filters.rows(**filters))
+
+    for title in ['t1', 't2', 't3']:
+        truth = exact.recommend_single(title, top_n=10, filters=filters)
+        found = ivf.recommend_single(title, top_n=10, filters=filters)
+        assert len(found.indices) == 10
+        assert set(found.indices) <= allowed
+        assert len(set(found.indices) & set(truth.indices)) >= 7
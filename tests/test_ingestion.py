@@ -0,0 +1,50 @@
+import sys
+import types
+
+import pandas as pd
+import pytest
+
+from src.data.ingestion import DataIngestor
+
+
+def write_csv(path, titles):
+    pd.DataFrame({
+        'title': titles,
+        'overview': [f"A long enough plot for {t}" for t in titles],
+        'genres': ['Drama'] * len(titles),
+        'vote_average': [7.0] * len(titles),
+    }).to_csv(path, index=False)
+
+
+@pytest.fixture
+def ingestor(tmp_path, monkeypatch):
+    # Le cartelle di DataIngestor sono relative alla directory corrente
+    monkeypatch.chdir(tmp_path)
+    ingestor = DataIngestor(workers=2)
+    ingestor.datasets = {}
+    return ingestor
+
+
+def test_custom_partitions_built_in_clean_pool(ingestor, tmp_path, monkeypatch):
+    # Come Streamlit: __main__ è lo script dell'app, con codice al livello del modulo
+    marker = tmp_path / "app_ran"
+    script = tmp_path / "fake_app.py"
+    script.write_text(f"open({str(marker)!r}, 'a').write('x')\n")
+    fake_main = types.ModuleType("__main__")
+    fake_main.__file__ = str(script)
+    monkeypatch.setitem(sys.modules, "__main__", fake_main)
+
+    write_csv(tmp_path / "custom_datasets" / "one.csv", ["Alpha", "Beta"])
+    write_csv(tmp_path / "custom_datasets" / "two.csv", ["Beta", "Gamma"])
+    df = ingestor.load_all()
+
+    assert sorted(df['title']) == ["Alpha", "Beta", "Gamma"]
+    assert not marker.exists()
+    # Seconda volta: partizioni dalla cache, nessuna ricostruzione
+    monkeypatch.setattr(DataIngestor, '_build_partitions', lambda self, jobs: jobs and pytest.fail("ricostruzione") or {})
+    assert len(DataIngestor(workers=2).load_custom_data()) == 2
+
+
+def test_no_sources_is_a_clear_error(ingestor):
+    with pytest.raises(RuntimeError):
+        ingestor.load_all()
@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+
+from src.algorithms.similarity import SimilarityEngine
+from src.algorithms.profile import ProfileScorer
+
+
+@pytest.fixture(scope="module")
+def engine():
+    rng = np.random.default_rng(0)
+    return SimilarityEngine(rng.standard_normal((1000, 24)).astype(np.float32))
+
+
+def brute_force(engine, ids, weights, aggregation):
+    """Punteggi del profilo ricalcolati da zero, senza cache"""
+    sims = engine.matrix @ engine.matrix[np.asarray(ids)].T
+    if aggregation == 'max':
+        return sims.max(axis=1)
+    w = np.asarray(weights if aggregation == 'weighted' else [1.0] * len(ids), dtype=np.float32)
+    return sims @ w / w.sum()
+
+
+# Sequenza di profili che passa da aggiunte, rimozioni e cambi di peso
+STEPS = [
+    ([1, 2], [1.0, 1.0]),
+    ([1, 2, 3], [1.0, 1.0, 2.0]),
+    ([1, 2, 3, 4, 5], [1.0, 1.0, 2.0, 0.5, 3.0]),
+    ([2, 3, 5], [1.0, 2.0, 3.0]),
+    ([2, 3, 5], [4.0, 2.0, 0.5]),
+    ([5, 6], [0.5, 1.0]),
+]
+
+
+@pytest.mark.parametrize("aggregation", ['max', 'mean', 'weighted'])
+def test_incremental_update_matches_full_recompute(engine, aggregation):
+    scorer = ProfileScorer(engine, aggregation=aggregation)
+    full = scorer._full
+    calls = []
+    scorer._full = lambda *args: calls.append(1) or full(*args)
+    for ids, weights in STEPS:
+        got = scorer.scores(ids, weights=weights)
+        np.testing.assert_allclose(got, brute_force(engine, ids, weights, aggregation), atol=1e-5)
+
+    # Ricalcolo completo solo al primo profilo (e per 'max' quando si toglie un preferito)
+    assert len(calls) == (3 if aggregation == 'max' else 1)
+
+
+def test_switching_aggregation_recomputes(engine):
+    scorer = ProfileScorer(engine, aggregation='max')
+    ids, weights = STEPS[2]
+    for aggregation in ['max', 'weighted', 'mean', 'max']:
+        got = scorer.scores(ids, weights=weights, aggregation=aggregation)
+        np.testing.assert_allclose(got, brute_force(engine, ids, weights, aggregation), atol=1e-5)
+
+
+def test_updates_after_eviction_and_clear(engine):
+    scorer = ProfileScorer(engine, aggregation='mean')
+    scorer.scores([1, 2, 3])
+    # Il titolo da togliere non è più in cache: si ricalcola dai rimasti
+    del scorer._items[1]
+    np.testing.assert_allclose(scorer.scores([2, 3]), brute_force(engine, [2, 3], None, 'mean'), atol=1e-5)
+
+    scorer.clear()
+    assert not scorer._items and scorer._state is None
+    np.testing.assert_allclose(scorer.scores([4]), brute_force(engine, [4], None, 'mean'), atol=1e-5)
+
+
+def test_returned_scores_do_not_touch_the_cache(engine):
+    scorer = ProfileScorer(engine, aggregation='max')
+    first = scorer.scores([1, 2])
+    first[:] = 0
+    np.testing.assert_allclose(scorer.scores([1, 2, 3]), brute_force(engine, [1, 2, 3], None, 'max'), atol=1e-5)
+
+
+def test_search_with_exclude_and_rows(engine):
+    scorer = ProfileScorer(engine, aggregation='max')
+    truth = brute_force(engine, [1, 2], None, 'max')
+
+    top, scores = scorer.search([1, 2], 5, exclude=[1, 2])
+    expected = [i for i in np.argsort(-truth) if i not in (1, 2)][:5]
+    assert list(top) == expected
+    np.testing.assert_allclose(scores, truth[expected], atol=1e-5)
+
+    rows = np.arange(0, len(engine), 3)
+    top, _ = scorer.search([1, 2], 5, exclude=[3], rows=rows)
+    allowed = [i for i in rows[np.argsort(-truth[rows])] if i != 3][:5]
+    assert list(top) == allowed
+    assert scorer.search([], 5)[0].size == 0
@@ -0,0 +1,42 @@
+import numpy as np
+import scipy.sparse as sp
+
+from src.algorithms.similarity import SimilarityEngine
+
+
+def brute_force_subset(engine, query, rows, k, exclude=()):
+    scores = np.full(len(engine), -np.inf, dtype=np.float32)
+    scores[rows] = engine.score(query)[rows]
+    scores[list(exclude)] = -np.inf
+    top = np.argsort(-scores, kind='stable')[:k]
+    return top[np.isfinite(scores[top])]
+
+
+def test_sparse_subset_matches_brute_force():
+    X = sp.random(3000, 400, density=0.02, format='csr', dtype=np.float32, random_state=0)
+    engine = SimilarityEngine(X)
+    rows = np.sort(np.random.default_rng(0).choice(3000, 1200, replace=False))
+    query = engine.vector(int(rows[0]))
+
+    ids, scores = engine.search_subset(query, rows, 10, exclude=[int(rows[0])])
+    assert set(ids) == set(brute_force_subset(engine, query, rows, 10, exclude=[int(rows[0])]))
+    assert np.all(np.diff(scores) <= 0)
+    assert sp.issparse(engine.matrix)
+
+
+def test_dense_subset_both_paths_match_brute_force():
+    rng = np.random.default_rng(1)
+    engine = SimilarityEngine(rng.standard_normal((5000, 32)).astype(np.float32))
+    query = engine.vector(0)
+    # Filtro ampio (un solo prodotto) e filtro selettivo (blocchi di righe ammesse)
+    for fraction in (0.7, 0.02):
+        rows = np.flatnonzero(rng.random(5000) < fraction).astype(np.int32)
+        ids, scores = engine.search_subset(query, rows, 10, exclude=[int(rows[1])])
+        assert list(ids) == list(brute_force_subset(engine, query, rows, 10, exclude=[int(rows[1])]))
+        np.testing.assert_allclose(scores, engine.score(query)[ids], rtol=1e-5)
+
+
+def test_subset_smaller_than_k():
+    engine = SimilarityEngine(np.eye(6, dtype=np.float32))
+    ids, _ = engine.search_subset(engine.vector(0), np.array([0, 2, 4]), 5, exclude=[0])
+    assert sorted(ids) == [2, 4]
@@ -0,0 +1,73 @@
+import threading
+
+from src.services.translation import TranslationService
+
+
+class FakeTranslator:
+    """Traduttore locale: conta le chiamate (condivise tra istanze) e può fallire a comando"""
+    calls = []
+    fail = False
+    _lock = threading.Lock()
+
+    def __init__(self, source, target):
+        self.source = source
+        self.target = target
+
+    def translate(self, text):
+        with self._lock:
+            FakeTranslator.calls.append((text, self.target))
+        if FakeTranslator.fail:
+            raise ConnectionError("offline")
+        return f"[{self.target}] {text}"
+
+
+def make_service(tmp_path, **kwargs):
+    FakeTranslator.calls = []
+    FakeTranslator.fail = False
+    return TranslationService(translator_factory=FakeTranslator, cache_dir=str(tmp_path), **kwargs)
+
+
+def test_translate_many_keeps_order_and_dedupes(tmp_path):
+    service = make_service(tmp_path)
+    out = service.translate_many(["a", "b", "a"], 'it')
+    assert out == ["[it] a", "[it] b", "[it] a"]
+    assert sorted(FakeTranslator.calls) == [("a", 'it'), ("b", 'it')]
+
+
+def test_memory_cache_avoids_backend(tmp_path):
+    service = make_service(tmp_path)
+    service.translate_from_en("hello", 'it')
+    service.translate_from_en("hello", 'it')
+    assert len(FakeTranslator.calls) == 1
+    # Lingua diversa: voce diversa
+    assert service.translate_from_en("hello", 'fr') == "[fr] hello"
+    assert len(FakeTranslator.calls) == 2
+
+
+def test_disk_cache_shared_between_instances(tmp_path):
+    make_service(tmp_path).translate_many(["one", "two"], 'de')
+    FakeTranslator.calls = []
+    again = TranslationService(translator_factory=FakeTranslator, cache_dir=str(tmp_path))
+    assert again.translate_many(["two", "one"], 'de') == ["[de] two", "[de] one"]
+    assert FakeTranslator.calls == []
+
+
+def test_memory_cache_is_bounded(tmp_path):
+    service = make_service(tmp_path, memory_size=2)
+    service.translate_many(["a", "b", "c"], 'it')
+    assert len(service.memory) == 2
+
+
+def test_errors_fall_back_to_original_and_are_not_cached(tmp_path):
+    service = make_service(tmp_path)
+    FakeTranslator.fail = True
+    assert service.translate_from_en("ciao", 'es') == "ciao"
+    FakeTranslator.fail = False
+    assert service.translate_from_en("ciao", 'es') == "[es] ciao"
+    assert len(FakeTranslator.calls) == 2
+
+
+def test_same_language_skips_backend(tmp_path):
+    service = make_service(tmp_path)
+    assert service.translate_many(["x"], 'en') == ["x"]
+    assert FakeTranslator.calls == []
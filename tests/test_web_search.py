@@ -0,0 +1,128 @@
+import time
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from src.services import cache as cache_module
+from src.services.web_search import WebSearchService
+
+
+class FakeResult(dict):
+    def __init__(self, movie_id, title):
+        super().__init__(title=title)
+        self.movieID = movie_id
+
+
+class FakeCinemagoer:
+    """Finto IMDb: conta le chiamate e può tenerle ferme finché il test non le sblocca"""
+
+    def __init__(self, block=False):
+        self.search_calls = []
+        self.movie_calls = []
+        self.fail = False
+        self.started = threading.Event()
+        self.release = threading.Event()
+        if not block: self.release.set()
+        self._lock = threading.Lock()
+
+    def search_movie(self, query):
+        with self._lock:
+            self.search_calls.append(query)
+        if self.fail: raise ConnectionError("offline")
+        self.started.set()
+        self.release.wait(5)
+        return [FakeResult(f"id-{query.lower()}", query.title())]
+
+    def get_movie(self, movie_id):
+        with self._lock:
+            self.movie_calls.append(movie_id)
+        return {'title': movie_id, 'plot outline': f"plot of {movie_id}", 'genres': ['Drama'], 'rating': 7.5,
+                'cover url': f"http://img/{movie_id}.jpg", 'unused': object()}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Orologio controllato dal test per le scadenze della cache su disco"""
+    now = [1000.0]
+    monkeypatch.setattr(cache_module, 'time', SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+def test_search_and_movie_are_cached(tmp_path):
+    backend = FakeCinemagoer()
+    service = WebSearchService(backend=backend, cache_dir=str(tmp_path))
+
+    first = service.fetch_full_data("Dune")
+    assert first['title'] == "id-dune"
+    assert first['overview'] == "plot of id-dune"
+    assert first['custom_poster_url'] == "http://img/id-dune.jpg"
+    # Maiuscole e spazi non cambiano la chiave della ricerca
+    assert service.fetch_full_data("  dune ") == first
+    assert service.resolve_title("DUNE") == "Dune"
+    assert backend.search_calls == ["Dune"]
+    assert backend.movie_calls == ["id-dune"]
+
+
+def test_disk_cache_shared_between_instances(tmp_path):
+    WebSearchService(backend=FakeCinemagoer(), cache_dir=str(tmp_path)).fetch_full_data("Alien")
+    backend = FakeCinemagoer()
+    assert WebSearchService(backend=backend, cache_dir=str(tmp_path)).fetch_full_data("Alien") is not None
+    assert backend.search_calls == [] and backend.movie_calls == []
+
+
+def test_ttl_expiry_refetches(tmp_path, clock):
+    backend = FakeCinemagoer()
+    service = WebSearchService(backend=backend, cache_dir=str(tmp_path), ttl=60)
+
+    service.resolve_title("Heat")
+    clock[0] += 59
+    service.resolve_title("Heat")
+    assert len(backend.search_calls) == 1
+
+    clock[0] += 2
+    service.resolve_title("Heat")
+    assert len(backend.search_calls) == 2
+
+
+def test_concurrent_identical_lookups_share_one_call(tmp_path):
+    backend = FakeCinemagoer(block=True)
+    service = WebSearchService(backend=backend, cache_dir=str(tmp_path))
+    results = []
+
+    def lookup():
+        results.append(service.resolve_title("Matrix"))
+
+    threads = [threading.Thread(target=lookup) for _ in range(8)]
+    threads[0].start()
+    assert backend.started.wait(5)
+    for t in threads[1:]:
+        t.start()
+    # Gli altri thread trovano la richiesta già in corso e la aspettano
+    time.sleep(0.2)
+    backend.release.set()
+    for t in threads:
+        t.join(5)
+
+    assert results == ["Matrix"] * 8
+    assert backend.search_calls == ["Matrix"]
+
+
+def test_errors_are_not_cached(tmp_path):
+    backend = FakeCinemagoer()
+    service = WebSearchService(backend=backend, cache_dir=str(tmp_path))
+    backend.fail = True
+    assert service.resolve_title("Up") is None
+
+    backend.fail = False
+    assert service.resolve_title("Up") == "Up"
+    assert service.resolve_title("Up") == "Up"
+    assert backend.search_calls == ["Up", "Up"]
+
+
+def test_fetch_many_keeps_order(tmp_path):
+    backend = FakeCinemagoer()
+    service = WebSearchService(backend=backend, cache_dir=str(tmp_path), max_connections=3)
+    out = service.fetch_many(["A", "B", "C", "A"])
+    assert [d['title'] for d in out] == ["id-a", "id-b", "id-c", "id-a"]
+    assert service.fetch_posters(["B"]) == {"B": "http://img/id-b.jpg"}